@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.db import sqlite as sqlite_db
+from app.db.sqlite import _MAX_ROW_ID, connection_for, get_conversation_version, list_messages
+from shared.config.settings import get_settings
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+settings = get_settings()
+
+_SEGMENT_PREFIX = "segment-"
+_EXTENSIONS = {"gzip": ".jsonl.gz", "zstd": ".jsonl.zst"}
+
+
+def archive_dir(db_path: Optional[Path] = None) -> Path:
+    """ARCHIVE_DIR, or `archive/` next to the database (`db_path` when reading another copy of it)."""
+    if settings.archive_dir:
+        return Path(settings.archive_dir)
+    return (db_path or sqlite_db._db_path()).parent / "archive"
+
+
+def archive_codec() -> str:
+    if settings.archive_codec == "zstd" and zstandard is not None:
+        return "zstd"
+    return "gzip"
+
+
+def _compress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=6).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def _decompress(data: bytes, segment: str) -> bytes:
+    if segment.endswith(_EXTENSIONS["zstd"]):
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd archive segments")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class SegmentWriter:
+    """Appends one compressed member per archived conversation to rolling segment files."""
+
+    def __init__(self, directory: Path, codec: str, max_bytes: int) -> None:
+        self._directory = directory
+        self._codec = codec
+        self._extension = _EXTENSIONS[codec]
+        self._max_bytes = max_bytes
+
+    def _current_segment(self) -> Path:
+        self._directory.mkdir(parents=True, exist_ok=True)
+        existing = sorted(self._directory.glob(f"{_SEGMENT_PREFIX}*{self._extension}"))
+        if existing and existing[-1].stat().st_size < self._max_bytes:
+            return existing[-1]
+        number = int(existing[-1].name[len(_SEGMENT_PREFIX):].split(".")[0]) + 1 if existing else 1
+        return self._directory / f"{_SEGMENT_PREFIX}{number:06d}{self._extension}"
+
+    def append(self, records: Sequence[Dict[str, Any]]) -> Tuple[str, int, int]:
+        payload = "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records)
+        compressed = _compress(payload.encode("utf-8"), self._codec)
+        segment = self._current_segment()
+        with segment.open("ab") as handle:
+            offset = handle.tell()
+            handle.write(compressed)
+            handle.flush()
+            os.fsync(handle.fileno())
+        return segment.name, offset, len(compressed)
+
+
+def read_member(segment: str, offset: int, length: int, directory: Optional[Path] = None) -> List[Dict[str, Any]]:
+    with ((directory or archive_dir()) / segment).open("rb") as handle:
+        handle.seek(offset)
+        data = handle.read(length)
+    lines = _decompress(data, segment).decode("utf-8").splitlines()
+    return [json.loads(line) for line in lines if line]
+
+
+def _index_rows(conversation_id: str) -> List[sqlite3.Row]:
+    conn = connection_for(conversation_id)
+    try:
+        rows = conn.execute(
+            """
+            SELECT segment, offset, length, message_count, first_message_id, last_message_id
+            FROM archive_index
+            WHERE conversation_id = ?
+            ORDER BY id
+            """,
+            (conversation_id,),
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return []
+    return list(rows)
+
+
+def load_archived_messages(conversation_id: str) -> List[Dict[str, Any]]:
+    messages: List[Dict[str, Any]] = []
+    for row in _index_rows(conversation_id):
+        for record in read_member(row["segment"], row["offset"], row["length"]):
+            if record.get("kind") == "message":
+                messages.append(record["row"])
+    messages.sort(key=lambda message: message["id"])
+    return messages
+
+
+def get_conversation_version_with_archive(conversation_id: str) -> Tuple[int, int]:
+    message_count, last_id = get_conversation_version(conversation_id)
+    for row in _index_rows(conversation_id):
+        message_count += int(row["message_count"])
+        last_id = max(last_id, int(row["last_message_id"] or 0))
+    return message_count, last_id
+
+
+def _member_messages(row: sqlite3.Row) -> Iterator[Dict[str, Any]]:
+    """Message rows of one indexed member in id order; memory records follow them and are never parsed."""
+    with (archive_dir() / row["segment"]).open("rb") as handle:
+        handle.seek(row["offset"])
+        data = handle.read(row["length"])
+    for line in _decompress(data, row["segment"]).splitlines():
+        record = json.loads(line)
+        if record.get("kind") != "message":
+            return
+        yield record["row"]
+
+
+def _archived_page(
+    rows: List[sqlite3.Row],
+    after_id: Optional[int],
+    before_id: Optional[int],
+    limit: int,
+) -> List[Dict[str, Any]]:
+    """Up to `limit` archived messages next to the cursor, reading only the members whose id range it needs.
+
+    Members of one conversation cover disjoint id ranges, so they are visited
+    nearest-first and the walk stops as soon as the page is full.
+    """
+    page: List[Dict[str, Any]] = []
+    if before_id is not None:
+        rows = sorted(
+            (row for row in rows if int(row["first_message_id"] or 0) < before_id),
+            key=lambda row: int(row["first_message_id"] or 0),
+            reverse=True,
+        )
+        for row in rows:
+            older = [message for message in _member_messages(row) if message["id"] < before_id]
+            page[:0] = older[-(limit - len(page)):]
+            if len(page) >= limit:
+                break
+        return page
+    lower = after_id or 0
+    rows = sorted(
+        (row for row in rows if int(row["last_message_id"] or 0) > lower),
+        key=lambda row: int(row["first_message_id"] or 0),
+    )
+    for row in rows:
+        for message in _member_messages(row):
+            if message["id"] <= lower:
+                continue
+            page.append(message)
+            if len(page) >= limit:
+                return page
+    return page
+
+
+def list_messages_with_archive(
+    conversation_id: str,
+    after_id: Optional[int] = None,
+    before_id: Optional[int] = None,
+    limit: int = 50,
+    include_content: bool = True,
+) -> List[Any]:
+    hot = list_messages(conversation_id, after_id, before_id, limit, include_content)
+    index_rows = _index_rows(conversation_id)
+    if not index_rows:
+        return hot
+    archived = _archived_page(index_rows, after_id, before_id, limit)
+    if not include_content:
+        archived = [{key: value for key, value in message.items() if key != "content"} for message in archived]
+    merged = sorted([*archived, *hot], key=lambda message: message["id"])
+    return merged[-limit:] if before_id is not None else merged[:limit]
+
+
+def get_recent_messages_with_archive(conversation_id: str, limit: int) -> List[Any]:
+    return list_messages_with_archive(conversation_id, before_id=_MAX_ROW_ID, limit=limit)
+
+
+def archive_conversation(
+    conn: sqlite3.Connection,
+    writer: SegmentWriter,
+    conversation_id: str,
+) -> int:
+    messages = [
+        dict(row)
+        for row in conn.execute(
+            """
+            SELECT id, conversation_id, role, content, created_at, model_name, temperature, safety_state,
+                   prompt_tokens, completion_tokens, ttft_ms, duration_ms, backend_id
+            FROM messages WHERE conversation_id = ? ORDER BY id
+            """,
+            (conversation_id,),
+        ).fetchall()
+    ]
+    if not messages:
+        return 0
+    memories = [
+        dict(row)
+        for row in conn.execute(
+            "SELECT id, conversation_id, type, content, importance, created_at FROM memories WHERE conversation_id = ?",
+            (conversation_id,),
+        ).fetchall()
+    ]
+    records = [{"kind": "message", "row": message} for message in messages]
+    records.extend({"kind": "memory", "row": memory} for memory in memories)
+    segment, offset, length = writer.append(records)
+
+    with conn:
+        conn.execute(
+            """
+            INSERT INTO archive_index
+                (conversation_id, segment, offset, length, message_count, first_message_id, last_message_id, archived_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                conversation_id,
+                segment,
+                offset,
+                length,
+                len(messages),
+                messages[0]["id"],
+                messages[-1]["id"],
+                datetime.utcnow().isoformat(),
+            ),
+        )
+        conn.execute(
+            "DELETE FROM messages WHERE conversation_id = ? AND id <= ?",
+            (conversation_id, messages[-1]["id"]),
+        )
+        conn.execute(
+            "DELETE FROM memories WHERE conversation_id = ? AND id <= ?",
+            (conversation_id, max((memory["id"] for memory in memories), default=0)),
+        )
+    return len(messages)
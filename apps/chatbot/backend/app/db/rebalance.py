@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import argparse
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+from app.db import sqlite as sqlite_db
+from shared.logging.logger import get_logger
+
+logger = get_logger("rebalance")
+
+# (table, column holding the conversation id, columns identifying a row in any shard, copy the `id` column)
+_TABLES: Sequence[Tuple[str, str, Tuple[str, ...], bool]] = (
+    ("conversations", "id", ("id",), True),
+    # Message ids are unique across shards, so moved rows keep them (feedback points at them).
+    ("messages", "conversation_id", ("id",), True),
+    ("memories", "conversation_id", ("conversation_id", "type", "content", "created_at"), False),
+    ("conversation_summary", "conversation_id", ("conversation_id",), True),
+    ("relationship_state", "conversation_id", ("conversation_id",), True),
+    ("archive_index", "conversation_id", ("conversation_id", "segment", "offset"), False),
+)
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA main.table_info({table})")]
+
+
+def _conversation_ids(conn: sqlite3.Connection) -> List[str]:
+    union = " UNION ".join(f"SELECT {column} FROM {table}" for table, column, _, _ in _TABLES)
+    return [row[0] for row in conn.execute(union)]
+
+
+def _move(conn: sqlite3.Connection, conversation_id: str) -> None:
+    """Copies one conversation from `src` into `main`, then deletes it from `src`.
+
+    The copy skips rows the target already has, so re-running after a crash
+    between the two steps finishes the move without duplicating anything.
+    """
+    with conn:
+        for table, column, key, copy_id in _TABLES:
+            columns = [name for name in _columns(conn, table) if copy_id or name != "id"]
+            names = ", ".join(columns)
+            matches = " AND ".join(f"dst.{name} IS src_row.{name}" for name in key)
+            conn.execute(
+                f"""
+                INSERT INTO main.{table} ({names})
+                SELECT {names} FROM src.{table} AS src_row
+                WHERE src_row.{column} = ?
+                  AND NOT EXISTS (SELECT 1 FROM main.{table} AS dst WHERE {matches})
+                """,
+                (conversation_id,),
+            )
+    with conn:
+        for table, column, _, _ in _TABLES:
+            conn.execute(f"DELETE FROM src.{table} WHERE {column} = ?", (conversation_id,))
+
+
+def rebalance(dry_run: bool = False) -> Dict[Tuple[int, int], int]:
+    """Moves every conversation into the shard DB_SHARDS routes it to; returns moves per (source, target).
+
+    Run it with the backend stopped after changing DB_SHARDS: live writers
+    would keep adding rows to the old shard while it is being drained.
+    """
+    sqlite_db.init_db()
+    moves: Dict[Tuple[int, int], int] = {}
+    for source, source_path in sqlite_db.existing_shards():
+        with closing(sqlite3.connect(source_path)) as conn:
+            conversation_ids = _conversation_ids(conn)
+        pending: Dict[int, List[str]] = {}
+        for conversation_id in conversation_ids:
+            target = sqlite_db.shard_for(conversation_id)
+            if sqlite_db.shard_path(target) != source_path:
+                pending.setdefault(target, []).append(conversation_id)
+        for target, to_move in sorted(pending.items()):
+            moves[(source, target)] = len(to_move)
+            if dry_run:
+                continue
+            with closing(sqlite3.connect(sqlite_db.shard_path(target))) as conn:
+                conn.execute("ATTACH DATABASE ? AS src", (str(source_path),))
+                for conversation_id in to_move:
+                    _move(conn, conversation_id)
+            logger.info("rebalance_moved source=%s target=%s conversations=%s", source, target, len(to_move))
+    if not dry_run:
+        for _, path in retired_shards():
+            _fold_usage(path)
+    return moves
+
+
+def retired_shards() -> List[Tuple[int, Path]]:
+    """Shard files DB_SHARDS no longer routes to (the main database is never retired)."""
+    routed = {sqlite_db.shard_path(index) for index in range(sqlite_db.shard_count())}
+    return [
+        (index, path)
+        for index, path in sqlite_db.existing_shards()
+        if index != sqlite_db.MAIN_DB and path not in routed
+    ]
+
+
+def _fold_usage(source_path: Path) -> None:
+    """Adds a retired shard's user_usage counters to the main database, which keeps them from then on."""
+    with closing(sqlite3.connect(sqlite_db._db_path())) as conn:
+        conn.execute("ATTACH DATABASE ? AS src", (str(source_path),))
+        with conn:
+            conn.execute(
+                """
+                INSERT INTO main.user_usage (user_id, day, requests, prompt_tokens, completion_tokens)
+                SELECT user_id, day, requests, prompt_tokens, completion_tokens FROM src.user_usage WHERE true
+                ON CONFLICT(user_id, day) DO UPDATE SET
+                    requests = requests + excluded.requests,
+                    prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+                    completion_tokens = completion_tokens + excluded.completion_tokens
+                """
+            )
+            conn.execute("DELETE FROM src.user_usage")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Move conversations into the shard DB_SHARDS routes them to.")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the conversations that would move.")
+    args = parser.parse_args()
+    moves = rebalance(dry_run=args.dry_run)
+    for (source, target), count in sorted(moves.items()):
+        label = "main database" if source == sqlite_db.MAIN_DB else f"shard {source}"
+        print(f"{label} -> shard {target}: {count} conversations")
+    print(f"{'would move' if args.dry_run else 'moved'} {sum(moves.values())} conversations")
+    for _, path in retired_shards():
+        print(f"{path} is no longer routed to; remove it once it is empty")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,36 @@
 from __future__ import annotations
 
 import sqlite3
+import threading
+import zlib
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Iterable, List, Optional
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
 
 from shared.config.settings import get_settings
+from shared.logging.logger import get_logger
 
 settings = get_settings()
+logger = get_logger("sqlite")
+
+_MAX_ROW_ID = 2**63 - 1
+# With several shards, message ids are allocated as `k * _SHARD_ID_STRIDE + shard`, so ids stay
+# unique across shard files (feedback and exports refer to them) and keep growing inside each shard.
+_SHARD_ID_STRIDE = 1024
+# existing_shards() lists the main database under this index when it is not also shard 0.
+MAIN_DB = -1
+_initialized_paths: Set[Tuple[Path, int]] = set()
+_local = threading.local()
+_open_connections: List[sqlite3.Connection] = []
+_connections_lock = threading.Lock()
+_connections_generation = 0
+_USAGE_COLUMNS = (
+    ("prompt_tokens", "INTEGER"),
+    ("completion_tokens", "INTEGER"),
+    ("ttft_ms", "REAL"),
+    ("duration_ms", "REAL"),
+    ("backend_id", "TEXT"),
+)
 
 
 def _db_path() -> Path:
@@ -20,16 +43,140 @@ def _ensure_db_dir(path: Path) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
 
 
-def get_connection() -> sqlite3.Connection:
-    path = _db_path()
-    _ensure_db_dir(path)
-    conn = sqlite3.connect(path)
-    conn.row_factory = sqlite3.Row
+def shard_count() -> int:
+    return max(1, min(settings.db_shards, _SHARD_ID_STRIDE))
+
+
+def shard_path(index: int, base: Optional[Path] = None) -> Path:
+    """Shard N lives next to the main database as `<stem>.shardN<suffix>`.
+
+    With a single shard there is nothing to spread, so shard 0 is the main file
+    itself; with several, every shard (0 included) has its own file and the main
+    database keeps only users, preferences, feedback and daily usage counters.
+    """
+    base = base or _db_path()
+    if index == 0 and shard_count() == 1:
+        return base
+    return base.with_name(f"{base.stem}.shard{index}{base.suffix}")
+
+
+def existing_shards(base: Optional[Path] = None) -> List[Tuple[int, Path]]:
+    """Every file that can hold conversations, including shards beyond the configured count (for fan-out).
+
+    The main database comes first, as `MAIN_DB` (it holds the conversations of a
+    single-shard deployment and anything not yet rebalanced).
+    """
+    base = base or _db_path()
+    suffixes = (path.stem.rsplit(".shard", 1)[-1] for path in base.parent.glob(f"{base.stem}.shard*{base.suffix}"))
+    indexes = sorted(int(suffix) for suffix in suffixes if suffix.isdigit())
+    return [(MAIN_DB, base), *((index, base.with_name(f"{base.stem}.shard{index}{base.suffix}")) for index in indexes)]
+
+
+def shard_for(conversation_id: str) -> int:
+    """Conversation-scoped rows live in shard crc32(conversation_id) % DB_SHARDS."""
+    count = shard_count()
+    if count == 1:
+        return 0
+    return zlib.crc32(conversation_id.encode("utf-8")) % count
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    if getattr(_local, "generation", None) != _connections_generation:
+        _local.connections = {}
+        _local.generation = _connections_generation
+    conn = _local.connections.get(path)
+    if conn is None:
+        _ensure_db_dir(path)
+        # Only ever used by the thread that opened it; close_connections() is the one cross-thread call.
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        _local.connections[path] = conn
+        with _connections_lock:
+            _open_connections.append(conn)
     return conn
 
 
+def close_connections() -> None:
+    """Closes every thread's cached connections; each thread reopens lazily on its next call."""
+    global _connections_generation
+    with _connections_lock:
+        _connections_generation += 1
+        connections = list(_open_connections)
+        _open_connections.clear()
+    for conn in connections:
+        conn.close()
+
+
+def get_connection() -> sqlite3.Connection:
+    """This thread's connection to the main database (users, preferences, feedback; shard 0 with one shard)."""
+    return _connect(_db_path())
+
+
+def get_shard_connection(index: int) -> sqlite3.Connection:
+    return _connect(shard_path(index))
+
+
+def connection_for(conversation_id: str) -> sqlite3.Connection:
+    """This thread's connection to the shard holding `conversation_id`."""
+    return _connect(shard_path(shard_for(conversation_id)))
+
+
+def all_shard_connections() -> List[Tuple[int, sqlite3.Connection]]:
+    return [(index, get_shard_connection(index)) for index in range(shard_count())]
+
+
+def _message_id_sql(conversation_id: str) -> str:
+    """The `id` value for a new message row: AUTOINCREMENT with one shard, a strided id otherwise."""
+    if shard_count() == 1:
+        return "NULL"
+    return (
+        f"(SELECT (COALESCE(MAX(seq), 0) / {_SHARD_ID_STRIDE} + 1) * {_SHARD_ID_STRIDE} + {shard_for(conversation_id)}"
+        " FROM sqlite_sequence WHERE name = 'messages')"
+    )
+
+
 def init_db() -> None:
-    conn = get_connection()
+    main = get_connection()
+    _init_schema(main)
+    main_seq = _message_seq(main)
+    for index in range(shard_count()):
+        conn = get_shard_connection(index)
+        if conn is main:
+            continue
+        _init_schema(conn)
+        if _message_seq(conn) < main_seq:
+            # New shard files start above every id already handed out by the main database.
+            with conn:
+                conn.execute("DELETE FROM sqlite_sequence WHERE name = 'messages'")
+                conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('messages', ?)", (main_seq,))
+
+
+def _message_seq(conn: sqlite3.Connection) -> int:
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'messages'").fetchone()
+    return int(row["seq"]) if row else 0
+
+
+def _enable_incremental_vacuum(conn: sqlite3.Connection) -> None:
+    """Lets the retention job reclaim pages incrementally.
+
+    The mode only sticks on a fresh file; a database created without it is
+    rewritten once with VACUUM, which can take a while on a large file.
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 0:
+        return
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    if conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()[0] == 0:
+        return
+    path = conn.execute("PRAGMA database_list").fetchone()["file"]
+    logger.info("db_auto_vacuum_migration path=%s", path)
+    conn.execute("VACUUM")
+    logger.info("db_auto_vacuum_migrated path=%s mode=%s", path, conn.execute("PRAGMA auto_vacuum").fetchone()[0])
+
+
+def _init_schema(conn: sqlite3.Connection) -> None:
+    _enable_incremental_vacuum(conn)
+    # WAL lets long read-only snapshots (exports, history reads) run without blocking chat writes.
+    conn.execute("PRAGMA journal_mode = WAL")
     with conn:
         conn.execute(
             """
@@ -125,11 +272,60 @@ def init_db() -> None:
             )
             """
         )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_messages_conversation_id ON messages (conversation_id, id)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_conversations_user_id ON conversations (user_id, id)"
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS archive_index (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                conversation_id TEXT NOT NULL,
+                segment TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                message_count INTEGER NOT NULL,
+                first_message_id INTEGER,
+                last_message_id INTEGER,
+                archived_at TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_archive_index_conversation_id ON archive_index (conversation_id)"
+        )
+        existing_columns = {row["name"] for row in conn.execute("PRAGMA table_info(messages)")}
+        for column, column_type in _USAGE_COLUMNS:
+            if column not in existing_columns:
+                conn.execute(f"ALTER TABLE messages ADD COLUMN {column} {column_type}")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS user_usage (
+                user_id INTEGER NOT NULL,
+                day TEXT NOT NULL,
+                requests INTEGER NOT NULL,
+                prompt_tokens INTEGER NOT NULL,
+                completion_tokens INTEGER NOT NULL,
+                PRIMARY KEY (user_id, day)
+            )
+            """
+        )
+
+
+def ensure_db() -> None:
+    """Runs init_db once per database path and shard count, keeping the schema checks off the request path."""
+    key = (_db_path(), shard_count())
+    if key in _initialized_paths:
+        return
+    init_db()
+    _initialized_paths.add(key)
 
 
 def upsert_summary(conversation_id: str, summary: str) -> None:
     now = datetime.utcnow().isoformat()
-    conn = get_connection()
+    conn = connection_for(conversation_id)
     with conn:
         conn.execute(
             """
@@ -142,7 +338,7 @@ def upsert_summary(conversation_id: str, summary: str) -> None:
 
 
 def get_summary(conversation_id: str) -> Optional[str]:
-    conn = get_connection()
+    conn = connection_for(conversation_id)
     row = conn.execute(
         "SELECT summary FROM conversation_summary WHERE conversation_id = ?",
         (conversation_id,),
@@ -152,7 +348,7 @@ def get_summary(conversation_id: str) -> Optional[str]:
 
 def insert_memory(conversation_id: str, memory_type: str, content: str, importance: float) -> None:
     now = datetime.utcnow().isoformat()
-    conn = get_connection()
+    conn = connection_for(conversation_id)
     with conn:
         conn.execute(
             """
@@ -165,7 +361,7 @@ def insert_memory(conversation_id: str, memory_type: str, content: str, importan
 
 def create_conversation(conversation_id: str, user_id: Optional[int]) -> None:
     now = datetime.utcnow().isoformat()
-    conn = get_connection()
+    conn = connection_for(conversation_id)
     with conn:
         conn.execute(
             """
@@ -183,20 +379,143 @@ def insert_message(
     model_name: Optional[str],
     temperature: Optional[float],
     safety_state: Optional[str],
+    prompt_tokens: Optional[int] = None,
+    completion_tokens: Optional[int] = None,
+    ttft_ms: Optional[float] = None,
+    duration_ms: Optional[float] = None,
+    backend_id: Optional[str] = None,
 ) -> int:
     now = datetime.utcnow().isoformat()
-    conn = get_connection()
+    conn = connection_for(conversation_id)
     with conn:
         cursor = conn.execute(
-            """
-            INSERT INTO messages (conversation_id, role, content, created_at, model_name, temperature, safety_state)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
+            f"""
+            INSERT INTO messages (
+                id, conversation_id, role, content, created_at, model_name, temperature, safety_state,
+                prompt_tokens, completion_tokens, ttft_ms, duration_ms, backend_id
+            )
+            VALUES ({_message_id_sql(conversation_id)}, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
-            (conversation_id, role, content, now, model_name, temperature, safety_state),
+            (
+                conversation_id,
+                role,
+                content,
+                now,
+                model_name,
+                temperature,
+                safety_state,
+                prompt_tokens,
+                completion_tokens,
+                ttft_ms,
+                duration_ms,
+                backend_id,
+            ),
         )
         return int(cursor.lastrowid)
 
 
+# (role, content, model_name, temperature, safety_state,
+#  prompt_tokens, completion_tokens, ttft_ms, duration_ms, backend_id)
+MessageRow = Tuple[
+    str,
+    str,
+    Optional[str],
+    Optional[float],
+    Optional[str],
+    Optional[int],
+    Optional[int],
+    Optional[float],
+    Optional[float],
+    Optional[str],
+]
+
+
+def insert_conversation_messages(conversation_id: str, user_id: Optional[int], rows: Sequence[MessageRow]) -> int:
+    """Creates the conversation if needed and appends all rows in one transaction."""
+    now = datetime.utcnow().isoformat()
+    conn = connection_for(conversation_id)
+    with conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO conversations (id, user_id, created_at) VALUES (?, ?, ?)",
+            (conversation_id, user_id, now),
+        )
+        conn.executemany(
+            f"""
+            INSERT INTO messages (
+                id, conversation_id, role, content, model_name, temperature, safety_state,
+                prompt_tokens, completion_tokens, ttft_ms, duration_ms, backend_id, created_at
+            )
+            VALUES ({_message_id_sql(conversation_id)}, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            [(conversation_id, *row, now) for row in rows],
+        )
+    return len(rows)
+
+
+def record_user_usage(user_id: int, prompt_tokens: int, completion_tokens: int) -> None:
+    """Adds to today's counters in the main database, so the quota check is a single-row lookup."""
+    day = datetime.utcnow().date().isoformat()
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            """
+            INSERT INTO user_usage (user_id, day, requests, prompt_tokens, completion_tokens)
+            VALUES (?, ?, 1, ?, ?)
+            ON CONFLICT(user_id, day) DO UPDATE SET
+                requests = requests + 1,
+                prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+                completion_tokens = completion_tokens + excluded.completion_tokens
+            """,
+            (user_id, day, prompt_tokens, completion_tokens),
+        )
+
+
+def get_user_usage(user_id: int, day: Optional[str] = None) -> Optional[sqlite3.Row]:
+    conn = get_connection()
+    row = conn.execute(
+        """
+        SELECT user_id, day, requests, prompt_tokens, completion_tokens
+        FROM user_usage
+        WHERE user_id = ? AND day = ?
+        """,
+        (user_id, day or datetime.utcnow().date().isoformat()),
+    ).fetchone()
+    return row
+
+
+def get_user_preferences(user_id: int) -> Optional[sqlite3.Row]:
+    conn = get_connection()
+    return conn.execute(
+        """
+        SELECT user_id, verbosity, emoji_level, nsfw_intensity
+        FROM user_preferences
+        WHERE user_id = ?
+        """,
+        (user_id,),
+    ).fetchone()
+
+
+def upsert_user_preferences(
+    user_id: int,
+    verbosity: Optional[str],
+    emoji_level: Optional[str],
+    nsfw_intensity: Optional[str],
+) -> None:
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            """
+            INSERT INTO user_preferences (user_id, verbosity, emoji_level, nsfw_intensity)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET
+                verbosity = excluded.verbosity,
+                emoji_level = excluded.emoji_level,
+                nsfw_intensity = excluded.nsfw_intensity
+            """,
+            (user_id, verbosity, emoji_level, nsfw_intensity),
+        )
+
+
 def create_user(username: str, password_hash: str) -> int:
     now = datetime.utcnow().isoformat()
     conn = get_connection()
@@ -239,8 +558,48 @@ def insert_feedback(
         )
         return int(cursor.lastrowid)
 
-def get_recent_memories(conversation_id: str, limit: int = 5) -> List[sqlite3.Row]:
+
+FeedbackRow = Tuple[int, Optional[int], str, Optional[str], Optional[str]]
+
+
+def insert_feedback_batch(rows: Sequence[FeedbackRow]) -> int:
+    if not rows:
+        return 0
+    now = datetime.utcnow().isoformat()
     conn = get_connection()
+    with conn:
+        conn.executemany(
+            """
+            INSERT INTO feedback (message_id, user_id, rating, tags, rewrite_text, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            [(*row, now) for row in rows],
+        )
+    return len(rows)
+
+
+def get_owned_message_ids(user_id: int, message_ids: Iterable[int]) -> Set[int]:
+    unique_ids = sorted(set(message_ids))
+    if not unique_ids:
+        return set()
+    placeholders = ", ".join("?" for _ in unique_ids)
+    owned: Set[int] = set()
+    for _, conn in all_shard_connections():
+        rows = conn.execute(
+            f"""
+            SELECT messages.id
+            FROM messages
+            JOIN conversations ON conversations.id = messages.conversation_id
+            WHERE conversations.user_id = ? AND messages.id IN ({placeholders})
+            """,
+            (user_id, *unique_ids),
+        ).fetchall()
+        owned.update(int(row["id"]) for row in rows)
+    return owned
+
+
+def get_recent_memories(conversation_id: str, limit: int = 5) -> List[sqlite3.Row]:
+    conn = connection_for(conversation_id)
     rows = conn.execute(
         """
         SELECT type, content, importance, created_at
@@ -255,7 +614,7 @@ def get_recent_memories(conversation_id: str, limit: int = 5) -> List[sqlite3.Ro
 
 
 def get_relationship_state(conversation_id: str) -> Optional[sqlite3.Row]:
-    conn = get_connection()
+    conn = connection_for(conversation_id)
     row = conn.execute(
         """
         SELECT conversation_id, affinity_score, trust_level, intimacy_level, nicknames, updated_at
@@ -275,7 +634,7 @@ def ensure_relationship_state(
     nicknames: str = "",
 ) -> None:
     now = datetime.utcnow().isoformat()
-    conn = get_connection()
+    conn = connection_for(conversation_id)
     with conn:
         conn.execute(
             """
@@ -289,9 +648,38 @@ def ensure_relationship_state(
         )
 
 
+RelationshipRow = Tuple[str, float, str, str, str, str]
+
+
+def upsert_relationship_states(rows: Sequence[RelationshipRow]) -> int:
+    if not rows:
+        return 0
+    by_shard: Dict[int, List[RelationshipRow]] = {}
+    for row in rows:
+        by_shard.setdefault(shard_for(row[0]), []).append(row)
+    for index, shard_rows in by_shard.items():
+        conn = get_shard_connection(index)
+        with conn:
+            conn.executemany(
+                """
+                INSERT INTO relationship_state
+                    (conversation_id, affinity_score, trust_level, intimacy_level, nicknames, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(conversation_id) DO UPDATE SET
+                    affinity_score=excluded.affinity_score,
+                    trust_level=excluded.trust_level,
+                    intimacy_level=excluded.intimacy_level,
+                    nicknames=excluded.nicknames,
+                    updated_at=excluded.updated_at
+                """,
+                shard_rows,
+            )
+    return len(rows)
+
+
 def touch_relationship_state(conversation_id: str) -> None:
     now = datetime.utcnow().isoformat()
-    conn = get_connection()
+    conn = connection_for(conversation_id)
     with conn:
         conn.execute(
             """
@@ -301,3 +689,89 @@ def touch_relationship_state(conversation_id: str) -> None:
             """,
             (now, conversation_id),
         )
+
+
+def get_conversation(conversation_id: str) -> Optional[sqlite3.Row]:
+    conn = connection_for(conversation_id)
+    row = conn.execute(
+        "SELECT id, user_id, created_at FROM conversations WHERE id = ?",
+        (conversation_id,),
+    ).fetchone()
+    return row
+
+
+def list_conversations(user_id: int, after: Optional[str], limit: int) -> List[sqlite3.Row]:
+    """Keyset page of a user's conversations; with several shards each one is queried and the pages merged."""
+    rows: List[sqlite3.Row] = []
+    for _, conn in all_shard_connections():
+        rows.extend(
+            conn.execute(
+                """
+                SELECT
+                    conversations.id,
+                    conversations.created_at,
+                    (SELECT COUNT(*) FROM messages WHERE messages.conversation_id = conversations.id)
+                        + (SELECT COALESCE(SUM(message_count), 0) FROM archive_index
+                           WHERE archive_index.conversation_id = conversations.id) AS message_count,
+                    MAX(
+                        COALESCE((SELECT MAX(id) FROM messages WHERE messages.conversation_id = conversations.id), 0),
+                        COALESCE((SELECT MAX(last_message_id) FROM archive_index
+                                  WHERE archive_index.conversation_id = conversations.id), 0)
+                    ) AS last_message_id
+                FROM conversations
+                WHERE conversations.user_id = ? AND conversations.id > ?
+                ORDER BY conversations.id
+                LIMIT ?
+                """,
+                (user_id, after or "", limit),
+            ).fetchall()
+        )
+    rows.sort(key=lambda row: row["id"])
+    return rows[:limit]
+
+
+def get_conversation_version(conversation_id: str) -> Tuple[int, int]:
+    conn = connection_for(conversation_id)
+    row = conn.execute(
+        "SELECT COUNT(*) AS message_count, COALESCE(MAX(id), 0) AS last_id FROM messages WHERE conversation_id = ?",
+        (conversation_id,),
+    ).fetchone()
+    return int(row["message_count"]), int(row["last_id"])
+
+
+def list_messages(
+    conversation_id: str,
+    after_id: Optional[int] = None,
+    before_id: Optional[int] = None,
+    limit: int = 50,
+    include_content: bool = True,
+) -> List[sqlite3.Row]:
+    columns = "id, role, created_at, model_name, safety_state"
+    if include_content:
+        columns += ", content"
+    conn = connection_for(conversation_id)
+    if before_id is not None:
+        rows = conn.execute(
+            f"""
+            SELECT {columns} FROM messages
+            WHERE conversation_id = ? AND id < ?
+            ORDER BY id DESC
+            LIMIT ?
+            """,
+            (conversation_id, before_id, limit),
+        ).fetchall()
+        return list(reversed(rows))
+    rows = conn.execute(
+        f"""
+        SELECT {columns} FROM messages
+        WHERE conversation_id = ? AND id > ?
+        ORDER BY id
+        LIMIT ?
+        """,
+        (conversation_id, after_id or 0, limit),
+    ).fetchall()
+    return list(rows)
+
+
+def get_recent_messages(conversation_id: str, limit: int) -> List[sqlite3.Row]:
+    return list_messages(conversation_id, before_id=_MAX_ROW_ID, limit=limit)
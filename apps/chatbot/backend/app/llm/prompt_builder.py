@@ -1,38 +1,23 @@
 from __future__ import annotations
 
-from typing import List, Optional
+from typing import List, Optional, Sequence
 
-from app.services.persona_loader import load_default_persona
+from app.services.message_record import AnyMessage
+from app.services.persona_loader import CompiledPersona, persona_registry
 from shared.schemas.chat import ChatMessage
 
 
 def build_prompt(
-    history: List[ChatMessage],
+    history: Sequence[AnyMessage],
     relationship_state: dict,
     conversation_summary: Optional[str],
     latest_user_message: str,
     last_n: int = 10,
-) -> List[ChatMessage]:
-    persona = load_default_persona()
-    system_lines: List[str] = []
-    system_lines.append("### Persona")
-    system_lines.append(f"Name: {persona['name']}")
-    system_lines.append(f"Role: {persona['role']}")
-    system_lines.append(f"Tone: {persona['tone']}")
-    system_lines.append(f"Speaking style: {persona['speaking_style']}")
-    system_lines.append(f"Goals: {', '.join(persona['goals'])}")
-    system_lines.append(f"Likes: {', '.join(persona['likes'])}")
-    system_lines.append(f"Dislikes: {', '.join(persona['dislikes'])}")
-    system_lines.append("Nyx is an adult (21+).")
-    system_lines.append("Adult consensual explicit sexual conversation is allowed.")
-    system_lines.append(
-        "Refuse only: minors, coercion/trafficking/non-consensual, sexual violence/exploitation."
-    )
-    system_lines.append(
-        "Do not describe physical actions or body language in text. Use emojis to convey tone/emotion instead."
-    )
-    system_lines.append("Use first-person only. Avoid third-person narration.")
-    system_lines.append("Assume consent unless explicitly violated. No artificial pacing or trust-building.")
+    instructions: Sequence[str] = (),
+    persona: Optional[CompiledPersona] = None,
+) -> List[AnyMessage]:
+    persona = persona or persona_registry.default()
+    system_lines: List[str] = [persona.system_block]
 
     system_lines.append("")
     system_lines.append("### Relationship State")
@@ -50,8 +35,9 @@ def build_prompt(
     system_lines.append("")
     system_lines.append("### Instructions")
     system_lines.append("Respond in-character. Maintain a consensual, adult tone.")
+    system_lines.extend(instructions)
 
-    prompt_messages: List[ChatMessage] = [ChatMessage(role="system", content="\n".join(system_lines))]
+    prompt_messages: List[AnyMessage] = [ChatMessage(role="system", content="\n".join(system_lines))]
     prompt_messages.extend(history[-last_n:])
     prompt_messages.append(ChatMessage(role="user", content=latest_user_message))
     return prompt_messages
@@ -1,16 +1,26 @@
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.db.sqlite import init_db
-from app.routes import auth, chat, feedback, health
-from app.services.persona_loader import load_default_persona
+from app.db.sqlite import close_connections, init_db
+from app.routes import admin, auth, chat, conversations, feedback, health, preferences
+from app.routes.chat import llm_client, stream_registry
+from app.services.feedback_buffer import feedback_buffer
+from app.services.json_codec import FastJSONResponse
+from app.services.persona_loader import persona_registry, persona_reload_loop
+from app.services.profiler import ProfileScopeMiddleware
+from app.services.relationship_cache import relationship_cache
+from app.services.retention import retention_loop
+from app.services.tracing import tracer
+from app.services.warmup import WarmupState, run_warmup
 from shared.config.settings import get_settings
 from shared.logging.logger import get_logger
 
 settings = get_settings()
 logger = get_logger("chatbot-backend")
 
-app = FastAPI(title="Shadow Stax AI Chatbot API", version="0.1.0")
+app = FastAPI(title="Shadow Stax AI Chatbot API", version="0.1.0", default_response_class=FastJSONResponse)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[settings.frontend_origin],
@@ -18,14 +28,42 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ProfileScopeMiddleware)
 app.include_router(health.router)
 app.include_router(chat.router, prefix="/chat", tags=["chat"])
 app.include_router(auth.router)
 app.include_router(feedback.router)
+app.include_router(conversations.router)
+app.include_router(preferences.router)
+app.include_router(admin.router)
+app.state.warmup = WarmupState()
 
 
 @app.on_event("startup")
-def startup_event() -> None:
+async def startup_event() -> None:
     init_db()
-    load_default_persona()
+    await asyncio.to_thread(persona_registry.reload)
+    if settings.persona_reload_interval_seconds > 0:
+        app.state.persona_reload_task = asyncio.create_task(persona_reload_loop())
+    if settings.archive_idle_days > 0:
+        app.state.retention_task = asyncio.create_task(retention_loop())
+    app.state.warmup = WarmupState()
+    if settings.warmup_enabled:
+        app.state.warmup_task = asyncio.create_task(run_warmup(app.state.warmup, llm_client))
+    else:
+        app.state.warmup.ready = True
     logger.info("backend_startup env=%s", settings.app_env)
+
+
+@app.on_event("shutdown")
+async def shutdown_event() -> None:
+    for name in ("retention_task", "warmup_task", "persona_reload_task"):
+        task = getattr(app.state, name, None)
+        if task is not None:
+            task.cancel()
+    await feedback_buffer.stop()
+    await relationship_cache.stop()
+    await stream_registry.stop()
+    await llm_client.aclose()
+    await asyncio.to_thread(tracer.flush)
+    close_connections()
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import hmac
+from datetime import datetime
+from typing import Literal, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+
+from app.services.profiler import ProfilerBusyError, profiler, render_collapsed, top_frames
+from shared.config.settings import get_settings
+
+settings = get_settings()
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+def _require_admin(request: Request) -> None:
+    # Without ADMIN_TOKEN the admin surface does not exist on this worker.
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="not_found")
+    supplied = request.headers.get("X-Admin-Token", "")
+    if not hmac.compare_digest(supplied.encode("utf-8"), settings.admin_token.encode("utf-8")):
+        raise HTTPException(status_code=403, detail="admin_required")
+
+
+@router.post("/profile")
+async def profile(
+    request: Request,
+    seconds: float = Query(10.0, gt=0),
+    interval_ms: float = Query(5.0, ge=1, le=100),
+    route: Optional[str] = Query(None, description="Only sample requests whose path starts with this prefix."),
+    output: Literal["collapsed", "top"] = "collapsed",
+) -> Response:
+    """Samples this worker's stacks for `seconds` under live traffic.
+
+    `collapsed` returns a folded-stacks file for flamegraph.pl or speedscope;
+    `top` returns the frames with the most self samples as JSON.
+    """
+    _require_admin(request)
+    if seconds > settings.profiler_max_seconds:
+        raise HTTPException(status_code=422, detail="profile_too_long")
+    try:
+        stacks = await profiler.profile(seconds, interval_ms, route)
+    except ProfilerBusyError:
+        raise HTTPException(status_code=409, detail="profile_in_progress") from None
+
+    samples = sum(stacks.values())
+    if output == "top":
+        return JSONResponse({"samples": samples, "route": route, "frames": top_frames(stacks)})
+    filename = f"profile-{datetime.utcnow():%Y%m%dT%H%M%S}.folded"
+    return PlainTextResponse(
+        render_collapsed(stacks),
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "X-Profile-Samples": str(samples)},
+    )
@@ -1,57 +1,329 @@
 from __future__ import annotations
 
-import json
-from typing import AsyncGenerator, List
+import asyncio
+import hashlib
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, List, Optional, Sequence, Tuple
 from uuid import uuid4
 
 from fastapi import APIRouter, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import StreamingResponse
 
 from app.db.sqlite import (
     create_conversation,
-    ensure_relationship_state,
-    get_relationship_state,
+    ensure_db,
+    get_conversation,
     get_summary,
-    init_db,
+    get_user_usage,
     insert_memory,
     insert_message,
-    touch_relationship_state,
+    record_user_usage,
 )
+from app.db.archive import get_recent_messages_with_archive
 from app.llm.prompt_builder import build_prompt
 from app.services.conversation_store import InMemoryConversationStore
+from app.services.idempotency import IdempotencyRegistry
 from app.services.llm_client import LLMClient
+from app.services.json_codec import FastJSONResponse, FastJSONRoute, dumps_str
+from app.services.message_record import AnyMessage, MessageRecord, to_records
+from app.services.persona_loader import persona_registry
 from app.services.memory_extractor import extract_memories
-from app.services.rate_limit import SlidingWindowRateLimiter
+from app.services.preferences import generation_budget, preferences_cache
+from app.services.relationship_cache import relationship_cache
+from app.services.resilience import is_unavailable
+from app.services.rate_limit import SharedRateLimiter, SlidingWindowRateLimiter
 from app.services.auth import get_user_id_from_authorization
+from app.services.batch_eval import run_batch
 from app.services.safety import ModerationState, validate_content
+from app.services.stream_buffer import buffered
+from app.services.stream_resume import ResumeGapError, StreamRegistry, parse_last_event_id
+from app.services.shared_state import build_llm_budget, build_shared_state_backend
+from app.services.tracing import NoopTrace, Trace, activate_trace, reset_trace, tracer
 from shared.config.settings import get_settings
 from shared.schemas.chat import ChatMessage, ChatRequest, ChatResponse
 from shared.logging.logger import get_logger
 
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
 settings = get_settings()
 logger = get_logger("chatbot-chat")
 
-llm_client = LLMClient()
+shared_state = build_shared_state_backend()
+llm_client = LLMClient(budget=build_llm_budget(shared_state))
 conversation_store = InMemoryConversationStore(settings.conversation_ttl_seconds)
-rate_limiter = SlidingWindowRateLimiter(settings.rate_limit_per_minute, settings.rate_limit_burst)
+idempotency_registry = IdempotencyRegistry(settings.idempotency_ttl_seconds, settings.idempotency_max_entries)
+stream_registry = StreamRegistry(
+    settings.stream_resume_grace_seconds,
+    settings.stream_resume_buffer_frames,
+    settings.stream_resume_max_generations,
+)
+rate_limiter: SlidingWindowRateLimiter | SharedRateLimiter
+if shared_state is not None:
+    rate_limiter = SharedRateLimiter(shared_state, settings.rate_limit_per_minute, settings.rate_limit_burst)
+else:
+    rate_limiter = SlidingWindowRateLimiter(settings.rate_limit_per_minute, settings.rate_limit_burst)
+
+
+def _hydrate_history(conversation_id: str, user_id: int) -> List[MessageRecord]:
+    ensure_db()
+    conversation = get_conversation(conversation_id)
+    if conversation is None or conversation["user_id"] != user_id:
+        return []
+    rows = get_recent_messages_with_archive(conversation_id, settings.history_hydrate_messages)
+    return [MessageRecord(row["role"], row["content"], row["id"]) for row in rows]
+
+
+def _read_prompt_state(
+    conversation_id: str,
+    user_id: int,
+) -> Tuple[Dict[str, Any], Optional[str], Dict[str, Optional[str]]]:
+    ensure_db()
+    return relationship_cache.get(conversation_id), get_summary(conversation_id), preferences_cache.get(user_id)
+
+
+def _persist_user_turn(
+    conversation_id: str,
+    user_id: int,
+    latest_user_message: str,
+    safety_state: str,
+) -> Optional[int]:
+    create_conversation(conversation_id, user_id)
+    user_message_id = None
+    if latest_user_message:
+        user_message_id = insert_message(
+            conversation_id=conversation_id,
+            role="user",
+            content=latest_user_message,
+            model_name=None,
+            temperature=None,
+            safety_state=safety_state,
+        )
+    for extracted in extract_memories(latest_user_message):
+        insert_memory(
+            conversation_id,
+            extracted.memory_type,
+            extracted.content,
+            extracted.importance,
+        )
+    return user_message_id
+
+
+def _start_turn_writes(
+    conversation_id: str,
+    user_id: int,
+    latest_user_message: str,
+    safety_state: str,
+    trace: Trace | NoopTrace,
+) -> asyncio.Task:
+    span = trace.start_span("turn_writes")
+    task = asyncio.create_task(
+        asyncio.to_thread(
+            _persist_user_turn,
+            conversation_id,
+            user_id,
+            latest_user_message,
+            safety_state,
+        )
+    )
+    task.add_done_callback(lambda _: span.end())
+    return task
+
+
+async def _finish_turn_writes(turn_writes: asyncio.Task, conversation_id: str) -> None:
+    """Waits for the user-turn writes; failures surface here, before the assistant reply is stored."""
+    try:
+        await turn_writes
+    except Exception as exc:
+        logger.error("turn_writes_failed conversation_id=%s error=%s", conversation_id, exc)
+        raise HTTPException(status_code=500, detail="persistence_failed") from exc
+
+
+async def _settle_turn_writes(turn_writes: asyncio.Task, conversation_id: str) -> None:
+    """Used when the turn ends early (LLM error, blocked output): keep the writes, log failures."""
+    try:
+        await _finish_turn_writes(turn_writes, conversation_id)
+    except HTTPException:
+        pass
+
+
+def _token_quota_exceeded(user_id: int) -> bool:
+    if settings.user_daily_token_quota <= 0:
+        return False
+    usage = get_user_usage(user_id)
+    if usage is None:
+        return False
+    return usage["prompt_tokens"] + usage["completion_tokens"] >= settings.user_daily_token_quota
+
+
+async def _account_usage(user_id: int, usage: Dict[str, Any], trace: Trace | NoopTrace) -> None:
+    for key, value in usage.items():
+        if value is not None:
+            trace.set_attribute(f"llm.{key}", value)
+    await asyncio.to_thread(
+        record_user_usage,
+        user_id,
+        usage.get("prompt_tokens") or 0,
+        usage.get("completion_tokens") or 0,
+    )
+
+
+def _estimated_usage(prompt_messages: Sequence[AnyMessage], generated: str) -> Dict[str, Any]:
+    """~4 characters per token, for streams that ended before the backend reported usage."""
+    prompt_chars = sum(len(message.content) for message in prompt_messages)
+    return {"prompt_tokens": prompt_chars // 4 + 1, "completion_tokens": len(generated) // 4 + 1}
+
+
+def _stream_body(response: Any) -> Optional[AsyncIterator[str]]:
+    return response.body_iterator if isinstance(response, StreamingResponse) else None
+
+
+def _sse_response(body: AsyncIterator[str], replayed: bool, buffer: bool = True) -> StreamingResponse:
+    headers = {"Cache-Control": "no-cache"}
+    if replayed:
+        headers["Idempotent-Replayed"] = "true"
+    if buffer:
+        # Decoupled so a slow reader never stalls the upstream LLM stream or pins its slot.
+        body = buffered(body, settings.stream_buffer_max_frames, settings.stream_slow_client_policy)
+    return StreamingResponse(body, media_type="text/event-stream", headers=headers)
+
+
+async def _idempotent_chat(
+    request: ChatRequest,
+    http_request: Request,
+    idempotency_key: str,
+) -> ChatResponse | StreamingResponse:
+    user_id = get_user_id_from_authorization(http_request.headers.get("Authorization"))
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="auth_required")
+    fingerprint = hashlib.sha256(request.model_dump_json().encode("utf-8")).hexdigest()
+    entry, started = idempotency_registry.begin(
+        f"{user_id}:{idempotency_key}",
+        fingerprint,
+        lambda: _traced_chat(request, http_request),
+        _stream_body,
+    )
+    if entry.fingerprint != fingerprint:
+        raise HTTPException(status_code=422, detail="idempotency_key_reused")
+    if not started:
+        logger.info("chat_idempotent_replay user_id=%s key=%s", user_id, idempotency_key)
+    assert entry.task is not None
+    # Shielded so a disconnecting caller does not cancel a generation others are attached to.
+    response = await asyncio.shield(entry.task)
+    if entry.streaming:
+        # The pump already drains the (buffered) inner response at the backend's pace and keeps every
+        # frame for followers, so a slow reader here cannot stall the generation; no second buffer.
+        return _sse_response(entry.follow(), replayed=not started, buffer=False)
+    if started:
+        return response
+    return FastJSONResponse(
+        content=jsonable_encoder(response),
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+@router.get("/stream/{generation_id}")
+async def resume_stream(
+    generation_id: str,
+    http_request: Request,
+    last_event_id: Optional[str] = None,
+) -> StreamingResponse:
+    """Reconnect to a streaming generation: replays frames after Last-Event-ID, then follows it live."""
+    user_id = get_user_id_from_authorization(http_request.headers.get("Authorization"))
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="auth_required")
+    last_seq = parse_last_event_id(http_request.headers.get("Last-Event-ID") or last_event_id)
+    try:
+        generation = stream_registry.resume(generation_id, user_id, last_seq)
+    except ResumeGapError:
+        raise HTTPException(status_code=409, detail="resume_window_expired") from None
+    if generation is None:
+        raise HTTPException(status_code=404, detail="stream_not_found")
+    return _sse_response(generation.follow(last_seq), replayed=True)
+
+
+@router.post("/batch")
+async def chat_batch(
+    http_request: Request,
+    persist: bool = False,
+    concurrency: Optional[int] = None,
+) -> StreamingResponse:
+    """Offline evaluation: runs a JSONL body of scripted conversations and streams JSONL results.
+
+    Skips rate limiting and per-turn memory/relationship writes; LLM calls run at
+    batch priority so live /chat traffic is served first.
+    """
+    user_id = get_user_id_from_authorization(http_request.headers.get("Authorization"))
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="auth_required")
+    body = await http_request.body()
+    if body.count(b"\n") + 1 > settings.batch_max_conversations:
+        raise HTTPException(status_code=413, detail="batch_too_large")
+    if await asyncio.to_thread(_token_quota_exceeded, user_id):
+        raise HTTPException(status_code=429, detail="token_quota_exceeded")
+    workers = min(concurrency or settings.batch_max_concurrency, settings.batch_max_concurrency)
+    batch_id = f"eval-{uuid4().hex[:12]}" if persist else None
+    logger.info("chat_batch user_id=%s bytes=%s concurrency=%s batch_id=%s", user_id, len(body), workers, batch_id)
+    headers = {"X-Batch-Id": batch_id} if batch_id else None
+    return StreamingResponse(
+        run_batch(
+            llm_client, body, user_id, workers, persist_prefix=batch_id, quota_exceeded=_token_quota_exceeded
+        ),
+        media_type="application/x-ndjson",
+        headers=headers,
+    )
 
 
 @router.post("", response_model=ChatResponse)
 async def chat(request: ChatRequest, http_request: Request) -> ChatResponse | StreamingResponse:
+    idempotency_key = http_request.headers.get("Idempotency-Key")
+    if idempotency_key and settings.idempotency_ttl_seconds > 0:
+        return await _idempotent_chat(request, http_request, idempotency_key)
+    return await _traced_chat(request, http_request)
+
+
+async def _traced_chat(request: ChatRequest, http_request: Request) -> ChatResponse | StreamingResponse:
+    trace = tracer.start_trace("chat", stream=request.stream)
+    token = activate_trace(trace)
+    handed_off = False
+    try:
+        response = await _handle_chat(request, http_request, trace)
+        handed_off = isinstance(response, StreamingResponse)
+        return response
+    finally:
+        reset_trace(token)
+        if not handed_off:
+            trace.finish()
+
+
+async def _handle_chat(
+    request: ChatRequest,
+    http_request: Request,
+    trace: Trace | NoopTrace,
+) -> ChatResponse | StreamingResponse:
     if not request.messages:
         raise HTTPException(status_code=400, detail="messages_required")
     if not settings.llm_model:
         raise HTTPException(status_code=500, detail="llm_model_not_configured")
+    persona = persona_registry.get(request.persona_id)
+    if persona is None:
+        raise HTTPException(status_code=404, detail="persona_not_found")
 
-    auth_user_id = get_user_id_from_authorization(http_request.headers.get("Authorization"))
+    with trace.span("auth"):
+        auth_user_id = get_user_id_from_authorization(http_request.headers.get("Authorization"))
     if auth_user_id is None:
         raise HTTPException(status_code=401, detail="auth_required")
     user_key = request.user_id or (http_request.client.host if http_request.client else "anonymous")
-    if not await rate_limiter.allow(user_key):
+    with trace.span("rate_limit"):
+        allowed = await rate_limiter.allow(user_key)
+    if not allowed:
         raise HTTPException(status_code=429, detail="rate_limited")
+    with trace.span("token_quota"):
+        quota_exceeded = await asyncio.to_thread(_token_quota_exceeded, auth_user_id)
+    if quota_exceeded:
+        raise HTTPException(status_code=429, detail="token_quota_exceeded")
 
     conversation_id = request.conversation_id or str(uuid4())
+    trace.set_attribute("conversation_id", conversation_id)
+    trace.set_attribute("persona_id", persona.persona_id)
     logger.info(
         "chat_request user_key=%s conversation_id=%s stream=%s",
         user_key,
@@ -59,17 +331,25 @@ async def chat(request: ChatRequest, http_request: Request) -> ChatResponse | St
         request.stream,
     )
 
-    existing = await conversation_store.get(user_key, conversation_id)
-    history: List[ChatMessage] = []
+    with trace.span("store_get"):
+        existing = await conversation_store.get(user_key, conversation_id)
+    history: List[MessageRecord] = []
     if existing:
         history.extend(existing.messages)
+    elif request.conversation_id and settings.history_hydrate_messages > 0:
+        with trace.span("history_hydrate"):
+            # Archived history can mean decompressing segments: keep it off the event loop.
+            history.extend(await asyncio.to_thread(_hydrate_history, conversation_id, auth_user_id))
 
-    history.extend(request.messages)
+    history.extend(to_records(request.messages))
     latest_user_message = next(
         (message.content for message in reversed(request.messages) if message.role == "user"),
         "",
     )
-    safety_input = validate_content(latest_user_message, settings.safety_blocklist_enabled, stage="pre-llm")
+    with trace.span("safety_pre_llm"):
+        safety_input = validate_content(
+            latest_user_message, settings.safety_blocklist_enabled, stage="pre-llm", persona=persona
+        )
     if safety_input.state == ModerationState.REFUSE_HARD:
         logger.info(
             "moderation state=%s category=%s stage=pre-llm",
@@ -78,34 +358,21 @@ async def chat(request: ChatRequest, http_request: Request) -> ChatResponse | St
         )
         raise HTTPException(status_code=400, detail="blocked_input")
 
-    init_db()
-    create_conversation(conversation_id, auth_user_id)
-    relationship_row = get_relationship_state(conversation_id)
-    if relationship_row is None:
-        ensure_relationship_state(conversation_id)
-        relationship_row = get_relationship_state(conversation_id)
-
-    user_message_id = None
-    if latest_user_message:
-        user_message_id = insert_message(
-            conversation_id=conversation_id,
-            role="user",
-            content=latest_user_message,
-            model_name=None,
-            temperature=None,
-            safety_state=safety_input.state.value,
+    with trace.span("prompt_reads"):
+        relationship_state, summary, preferences = await asyncio.to_thread(
+            _read_prompt_state, conversation_id, auth_user_id
         )
+    budget = generation_budget(preferences)
+    relationship_cache.touch(conversation_id)
 
-    for extracted in extract_memories(latest_user_message):
-        insert_memory(
-            conversation_id,
-            extracted.memory_type,
-            extracted.content,
-            extracted.importance,
-        )
-
-    touch_relationship_state(conversation_id)
-    summary = get_summary(conversation_id)
+    # Everything the prompt does not depend on is written while the LLM generates.
+    turn_writes = _start_turn_writes(
+        conversation_id,
+        auth_user_id,
+        latest_user_message,
+        safety_input.state.value,
+        trace=trace,
+    )
 
     history_without_latest = list(history)
     for idx in range(len(history_without_latest) - 1, -1, -1):
@@ -113,71 +380,128 @@ async def chat(request: ChatRequest, http_request: Request) -> ChatResponse | St
             history_without_latest.pop(idx)
             break
 
-    prompt_messages = build_prompt(
-        history=history_without_latest,
-        relationship_state=dict(relationship_row) if relationship_row else {},
-        conversation_summary=summary,
-        latest_user_message=latest_user_message,
-    )
+    with trace.span("prompt_build"):
+        prompt_messages = build_prompt(
+            history=history_without_latest,
+            relationship_state=relationship_state,
+            conversation_summary=summary,
+            latest_user_message=latest_user_message,
+            instructions=[budget.instruction] if budget.instruction else (),
+            persona=persona,
+        )
 
     if request.stream:
+        generation_id = uuid4().hex
+
         async def event_stream() -> AsyncGenerator[str, None]:
-            yield f"event: meta\ndata: {{\"conversation_id\":\"{conversation_id}\"}}\n\n"
+            token = activate_trace(trace)
+            writes_settled = False
+            accounted = False
             generated = ""
-            async for event_type, chunk in llm_client.stream_chat_completions(
-                prompt_messages,
-                max_tokens=settings.llm_max_tokens_default,
-            ):
-                if event_type == "delta":
-                    generated += chunk
-                    safety_output = validate_content(
-                        generated,
-                        settings.safety_blocklist_enabled,
-                        stage="post-llm",
+            usage: Dict[str, Any] = {}
+            try:
+                meta = {"conversation_id": conversation_id, "generation_id": generation_id}
+                yield f"event: meta\ndata: {dumps_str(meta)}\n\n"
+                try:
+                    async for event_type, chunk in llm_client.stream_chat_completions(
+                        prompt_messages,
+                        max_tokens=budget.max_tokens,
+                    ):
+                        if event_type == "usage":
+                            usage = chunk.as_dict()
+                        elif event_type == "delta":
+                            generated += chunk
+                            safety_output = validate_content(
+                                generated,
+                                settings.safety_blocklist_enabled,
+                                stage="post-llm",
+                                persona=persona,
+                            )
+                            if safety_output.state == ModerationState.REFUSE_HARD:
+                                logger.info(
+                                    "moderation state=%s category=%s stage=post-llm",
+                                    safety_output.state,
+                                    safety_output.category,
+                                )
+                                refusal_text = safety_output.refusal or "I can't help with that."
+                                payload = dumps_str({"error": "blocked_output", "message": refusal_text})
+                                trace.set_attribute("outcome", "blocked_output")
+                                yield f"event: blocked\ndata: {payload}\n\n"
+                                return
+                            yield f"data: {chunk}\n\n"
+                        elif event_type == "done":
+                            break
+                except Exception as exc:
+                    if not is_unavailable(exc):
+                        raise
+                    logger.warning("llm_unavailable conversation_id=%s error=%s", conversation_id, exc)
+                    trace.set_attribute("outcome", "llm_unavailable")
+                    yield f"event: error\ndata: {dumps_str({'error': 'llm_unavailable'})}\n\n"
+                    return
+
+                writes_settled = True
+                try:
+                    await _finish_turn_writes(turn_writes, conversation_id)
+                except HTTPException as exc:
+                    trace.set_attribute("outcome", exc.detail)
+                    yield f"event: error\ndata: {dumps_str({'error': exc.detail})}\n\n"
+                    return
+                with trace.span("persistence"):
+                    assistant_message_id = await asyncio.to_thread(
+                        insert_message,
+                        conversation_id=conversation_id,
+                        role="assistant",
+                        content=generated,
+                        model_name=settings.llm_model,
+                        temperature=0.8,
+                        safety_state=ModerationState.ALLOW.value,
+                        **usage,
                     )
-                    if safety_output.state == ModerationState.REFUSE_HARD:
-                        logger.info(
-                            "moderation state=%s category=%s stage=post-llm",
-                            safety_output.state,
-                            safety_output.category,
-                        )
-                        refusal_text = safety_output.refusal or "I can't help with that."
-                        payload = json.dumps({"error": "blocked_output", "message": refusal_text})
-                        yield f"event: blocked\ndata: {payload}\n\n"
-                        return
-                    yield f"data: {chunk}\n\n"
-                elif event_type == "done":
-                    break
-
-            assistant_message_id = insert_message(
-                conversation_id=conversation_id,
-                role="assistant",
-                content=generated,
-                model_name=settings.llm_model,
-                temperature=0.8,
-                safety_state=ModerationState.ALLOW.value,
-            )
-            assistant_message = ChatMessage(role="assistant", content=generated, id=assistant_message_id)
-            await conversation_store.upsert(user_key, conversation_id, history + [assistant_message])
-            yield "event: done\ndata: [DONE]\n\n"
+                    accounted = True
+                    await _account_usage(auth_user_id, usage, trace)
+                    assistant_message = ChatMessage(role="assistant", content=generated, id=assistant_message_id)
+                    await conversation_store.upsert(user_key, conversation_id, history + [assistant_message])
+                yield "event: done\ndata: [DONE]\n\n"
+            finally:
+                if not writes_settled:
+                    await _settle_turn_writes(turn_writes, conversation_id)
+                if not accounted and generated:
+                    # Blocked, failed or abandoned mid-stream: the GPU time still counts against the quota.
+                    try:
+                        spent = usage or _estimated_usage(prompt_messages, generated)
+                        await _account_usage(auth_user_id, spent, trace)
+                    except Exception as exc:
+                        logger.warning("usage_accounting_failed conversation_id=%s error=%s", conversation_id, exc)
+                reset_trace(token)
+                trace.finish()
 
-        return StreamingResponse(
-            event_stream(),
-            media_type="text/event-stream",
-            headers={"Cache-Control": "no-cache"},
-        )
+        if not stream_registry.enabled:
+            return _sse_response(event_stream(), replayed=False)
+        # Pumped by its own task so a dropped connection does not end the generation.
+        generation = stream_registry.start(generation_id, auth_user_id, event_stream())
+        return _sse_response(generation.follow(), replayed=False)
 
-    response_payload = await llm_client.chat_completions(
-        prompt_messages,
-        max_tokens=settings.llm_max_tokens_default,
-    )
+    with trace.span("llm"):
+        try:
+            response_payload = await llm_client.chat_completions(
+                prompt_messages,
+                max_tokens=budget.max_tokens,
+            )
+        except Exception as exc:
+            await _settle_turn_writes(turn_writes, conversation_id)
+            if is_unavailable(exc):
+                logger.warning("llm_unavailable conversation_id=%s error=%s", conversation_id, exc)
+                raise HTTPException(status_code=503, detail="llm_unavailable") from exc
+            raise
     content = (
         response_payload.get("choices", [{}])[0]
         .get("message", {})
         .get("content", "")
     )
+    usage = response_payload.get("usage") or {}
+    await _finish_turn_writes(turn_writes, conversation_id)
 
-    safety_output = validate_content(content, settings.safety_blocklist_enabled, stage="post-llm")
+    safety_output = validate_content(content, settings.safety_blocklist_enabled, stage="post-llm", persona=persona)
     if safety_output.state == ModerationState.REFUSE_HARD:
         logger.info(
             "moderation state=%s category=%s stage=post-llm",
@@ -185,16 +509,21 @@ async def chat(request: ChatRequest, http_request: Request) -> ChatResponse | St
             safety_output.category,
         )
         refusal_text = safety_output.refusal or "I can't help with that."
-        assistant_message_id = insert_message(
-            conversation_id=conversation_id,
-            role="assistant",
-            content=refusal_text,
-            model_name=settings.llm_model,
-            temperature=0.8,
-            safety_state=ModerationState.REFUSE_HARD.value,
-        )
-        assistant_message = ChatMessage(role="assistant", content=refusal_text, id=assistant_message_id)
-        await conversation_store.upsert(user_key, conversation_id, history + [assistant_message])
+        trace.set_attribute("outcome", "blocked_output")
+        with trace.span("persistence"):
+            assistant_message_id = await asyncio.to_thread(
+                insert_message,
+                conversation_id=conversation_id,
+                role="assistant",
+                content=refusal_text,
+                model_name=settings.llm_model,
+                temperature=0.8,
+                safety_state=ModerationState.REFUSE_HARD.value,
+                **usage,
+            )
+            await _account_usage(auth_user_id, usage, trace)
+            assistant_message = ChatMessage(role="assistant", content=refusal_text, id=assistant_message_id)
+            await conversation_store.upsert(user_key, conversation_id, history + [assistant_message])
         return ChatResponse(
             conversation_id=conversation_id,
             response=assistant_message,
@@ -202,16 +531,20 @@ async def chat(request: ChatRequest, http_request: Request) -> ChatResponse | St
             message_id=assistant_message_id,
         )
 
-    assistant_message_id = insert_message(
-        conversation_id=conversation_id,
-        role="assistant",
-        content=content,
-        model_name=settings.llm_model,
-        temperature=0.8,
-        safety_state=ModerationState.ALLOW.value,
-    )
-    assistant_message = ChatMessage(role="assistant", content=content, id=assistant_message_id)
-    await conversation_store.upsert(user_key, conversation_id, history + [assistant_message])
+    with trace.span("persistence"):
+        assistant_message_id = await asyncio.to_thread(
+            insert_message,
+            conversation_id=conversation_id,
+            role="assistant",
+            content=content,
+            model_name=settings.llm_model,
+            temperature=0.8,
+            safety_state=ModerationState.ALLOW.value,
+            **usage,
+        )
+        await _account_usage(auth_user_id, usage, trace)
+        assistant_message = ChatMessage(role="assistant", content=content, id=assistant_message_id)
+        await conversation_store.upsert(user_key, conversation_id, history + [assistant_message])
     return ChatResponse(
         conversation_id=conversation_id,
         response=assistant_message,
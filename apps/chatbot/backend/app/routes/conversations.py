@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import hashlib
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+
+from app.db.archive import get_conversation_version_with_archive, list_messages_with_archive
+from app.db.sqlite import get_conversation, list_conversations
+from app.schemas.conversations import ConversationPage, ConversationSummary, HistoryMessage, MessagePage
+from app.services.auth import get_user_id_from_authorization
+from shared.config.settings import get_settings
+
+router = APIRouter(prefix="/conversations", tags=["conversations"])
+settings = get_settings()
+
+
+def _require_user(request: Request) -> int:
+    user_id = get_user_id_from_authorization(request.headers.get("Authorization"))
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="auth_required")
+    return user_id
+
+
+def _page_size(limit: Optional[int]) -> int:
+    if limit is None:
+        return settings.history_page_size_default
+    return max(1, min(limit, settings.history_page_size_max))
+
+
+def _etag(*parts: object) -> str:
+    digest = hashlib.sha1(":".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    return etag in {tag.strip() for tag in header.split(",")} or header.strip() == "*"
+
+
+@router.get("", response_model=ConversationPage)
+def get_conversations(
+    request: Request,
+    response: Response,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(default=None, ge=1),
+):
+    user_id = _require_user(request)
+    page_size = _page_size(limit)
+    rows = list_conversations(user_id, after, page_size + 1)
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    items = [
+        ConversationSummary(
+            id=row["id"],
+            created_at=row["created_at"],
+            message_count=row["message_count"],
+            last_message_id=row["last_message_id"],
+        )
+        for row in rows
+    ]
+    etag = _etag(user_id, after, page_size, *((item.id, item.message_count, item.last_message_id) for item in items))
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return ConversationPage(items=items, next_cursor=items[-1].id if has_more and items else None)
+
+
+@router.get("/{conversation_id}/messages", response_model=MessagePage, response_model_exclude_none=True)
+def get_conversation_messages(
+    conversation_id: str,
+    request: Request,
+    response: Response,
+    after: Optional[int] = Query(default=None, ge=0),
+    before: Optional[int] = Query(default=None, ge=1),
+    limit: Optional[int] = Query(default=None, ge=1),
+    include_content: bool = True,
+):
+    user_id = _require_user(request)
+    if after is not None and before is not None:
+        raise HTTPException(status_code=400, detail="after_and_before_exclusive")
+    conversation = get_conversation(conversation_id)
+    if conversation is None or conversation["user_id"] != user_id:
+        raise HTTPException(status_code=404, detail="conversation_not_found")
+
+    page_size = _page_size(limit)
+    message_count, last_id = get_conversation_version_with_archive(conversation_id)
+    etag = _etag(conversation_id, message_count, last_id, after, before, page_size, include_content)
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    rows = list_messages_with_archive(
+        conversation_id,
+        after_id=after,
+        before_id=before,
+        limit=page_size + 1,
+        include_content=include_content,
+    )
+    has_more = len(rows) > page_size
+    if before is not None:
+        rows = rows[1:] if has_more else rows
+    else:
+        rows = rows[:page_size]
+    items = [
+        HistoryMessage(
+            id=row["id"],
+            role=row["role"],
+            created_at=row["created_at"],
+            content=row["content"] if include_content else None,
+            model_name=row["model_name"],
+            safety_state=row["safety_state"],
+        )
+        for row in rows
+    ]
+    next_cursor = None
+    if has_more and items:
+        next_cursor = items[0].id if before is not None else items[-1].id
+    response.headers["ETag"] = etag
+    return MessagePage(conversation_id=conversation_id, items=items, next_cursor=next_cursor)
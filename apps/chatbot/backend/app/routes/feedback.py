@@ -1,13 +1,22 @@
 from __future__ import annotations
 
+import asyncio
 import json
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, HTTPException, Request
 
-from app.db.sqlite import insert_feedback
-from app.schemas.feedback import FeedbackRequest, FeedbackResponse
+from app.db.sqlite import get_owned_message_ids, insert_feedback, insert_feedback_batch
+from app.schemas.feedback import (
+    FeedbackBatchRequest,
+    FeedbackBatchResponse,
+    FeedbackRequest,
+    FeedbackResponse,
+)
 from app.services.auth import get_user_id_from_authorization
+from app.services.feedback_buffer import feedback_buffer
+from shared.config.settings import get_settings
 
 router = APIRouter(prefix="/feedback", tags=["feedback"])
+settings = get_settings()
 
 
 @router.post("", response_model=FeedbackResponse)
@@ -22,3 +31,36 @@ def create_feedback(request_body: FeedbackRequest, request: Request) -> Feedback
         rewrite_text=request_body.rewrite_text,
     )
     return FeedbackResponse()
+
+
+@router.post("/batch", response_model=FeedbackBatchResponse)
+async def create_feedback_batch(
+    request_body: FeedbackBatchRequest,
+    request: Request,
+    buffered: bool | None = None,
+) -> FeedbackBatchResponse:
+    user_id = get_user_id_from_authorization(request.headers.get("Authorization"))
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="auth_required")
+
+    requested_ids = [item.message_id for item in request_body.items]
+    owned_ids = await asyncio.to_thread(get_owned_message_ids, user_id, requested_ids)
+    rows = [
+        (
+            item.message_id,
+            user_id,
+            item.rating,
+            json.dumps(item.tags) if item.tags else None,
+            item.rewrite_text,
+        )
+        for item in request_body.items
+        if item.message_id in owned_ids
+    ]
+    rejected = sorted({message_id for message_id in requested_ids if message_id not in owned_ids})
+
+    use_buffer = settings.feedback_buffered_writes if buffered is None else buffered
+    if use_buffer:
+        await feedback_buffer.add(rows)
+    else:
+        await asyncio.to_thread(insert_feedback_batch, rows)
+    return FeedbackBatchResponse(accepted=len(rows), rejected_message_ids=rejected, buffered=use_buffer)
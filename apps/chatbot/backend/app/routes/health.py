@@ -1,4 +1,7 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from app.services.metrics import registry
 
 router = APIRouter()
 
@@ -6,3 +9,15 @@ router = APIRouter()
 @router.get("/health")
 def health_check() -> dict:
     return {"status": "ok"}
+
+
+@router.get("/ready")
+def readiness_check(request: Request) -> JSONResponse:
+    """Fails until the startup warm-up has finished, so cold pods get no traffic."""
+    warmup = request.app.state.warmup
+    return JSONResponse(warmup.as_dict(), status_code=200 if warmup.ready else 503)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> str:
+    return registry.render()
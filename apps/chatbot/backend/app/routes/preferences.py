@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import asyncio
+
+from fastapi import APIRouter, HTTPException, Request
+
+from app.schemas.preferences import PreferencesPayload
+from app.services.auth import get_user_id_from_authorization
+from app.services.preferences import preferences_cache
+
+router = APIRouter(prefix="/preferences", tags=["preferences"])
+
+
+def _require_user(request: Request) -> int:
+    user_id = get_user_id_from_authorization(request.headers.get("Authorization"))
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="auth_required")
+    return user_id
+
+
+@router.get("", response_model=PreferencesPayload)
+async def get_preferences(request: Request) -> PreferencesPayload:
+    user_id = _require_user(request)
+    return PreferencesPayload(**await asyncio.to_thread(preferences_cache.get, user_id))
+
+
+@router.put("", response_model=PreferencesPayload)
+async def put_preferences(request_body: PreferencesPayload, request: Request) -> PreferencesPayload:
+    user_id = _require_user(request)
+    await asyncio.to_thread(preferences_cache.set, user_id, request_body.model_dump())
+    return request_body
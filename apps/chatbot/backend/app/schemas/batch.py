@@ -0,0 +1,21 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+
+from shared.schemas.chat import ChatMessage
+
+
+class BatchConversation(BaseModel):
+    """One JSONL line of a /chat/batch request.
+
+    `messages` is the starting history; each entry in `turns` is then sent as a
+    user message in order, with the previous replies kept in the history.
+    """
+
+    id: Optional[str] = None
+    persona_id: Optional[str] = None
+    messages: List[ChatMessage] = Field(default_factory=list)
+    turns: List[str] = Field(default_factory=list)
+    relationship_state: Dict[str, Any] = Field(default_factory=dict)
+    summary: Optional[str] = None
+    max_tokens: Optional[int] = Field(default=None, ge=1)
+    temperature: float = 0.8
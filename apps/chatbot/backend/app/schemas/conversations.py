@@ -0,0 +1,29 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+
+class ConversationSummary(BaseModel):
+    id: str
+    created_at: str
+    message_count: int = 0
+    last_message_id: Optional[int] = None
+
+
+class ConversationPage(BaseModel):
+    items: List[ConversationSummary]
+    next_cursor: Optional[str] = None
+
+
+class HistoryMessage(BaseModel):
+    id: int
+    role: str
+    created_at: str
+    content: Optional[str] = None
+    model_name: Optional[str] = None
+    safety_state: Optional[str] = None
+
+
+class MessagePage(BaseModel):
+    conversation_id: str
+    items: List[HistoryMessage]
+    next_cursor: Optional[int] = None
@@ -11,3 +11,14 @@ class FeedbackRequest(BaseModel):
 
 class FeedbackResponse(BaseModel):
     status: str = "ok"
+
+
+class FeedbackBatchRequest(BaseModel):
+    items: List[FeedbackRequest] = Field(..., min_length=1, max_length=500)
+
+
+class FeedbackBatchResponse(BaseModel):
+    status: str = "ok"
+    accepted: int = 0
+    rejected_message_ids: List[int] = Field(default_factory=list)
+    buffered: bool = False
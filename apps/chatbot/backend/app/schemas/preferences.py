@@ -0,0 +1,8 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+
+class PreferencesPayload(BaseModel):
+    verbosity: Optional[str] = Field(default=None, pattern="^(short|normal|long)$")
+    emoji_level: Optional[str] = Field(default=None, pattern="^(none|low|medium|high)$")
+    nsfw_intensity: Optional[str] = Field(default=None, pattern="^(low|medium|high)$")
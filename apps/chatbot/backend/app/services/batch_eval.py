@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import Any, AsyncGenerator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from app.db.sqlite import MessageRow, insert_conversation_messages, record_user_usage
+from app.llm.prompt_builder import build_prompt
+from app.schemas.batch import BatchConversation
+from app.services.concurrency import AdaptiveConcurrencyLimiter
+from app.services.llm_client import LLMClient
+from app.services.message_record import MessageRecord, to_records
+from app.services.metrics import registry
+from app.services.persona_loader import persona_registry
+from app.services.safety import ModerationState, validate_content
+from shared.config.settings import get_settings
+from shared.logging.logger import get_logger
+
+settings = get_settings()
+logger = get_logger("batch-eval")
+
+_conversations = registry.counter("batch_eval_conversations_total", "Conversations run through /chat/batch.")
+
+_USAGE_KEYS = ("prompt_tokens", "completion_tokens", "ttft_ms", "duration_ms", "backend_id")
+
+
+def parse_lines(body: bytes) -> Iterator[Tuple[int, Optional[BatchConversation], Optional[str]]]:
+    """Yields (line_number, conversation, error) for every non-blank JSONL line."""
+    for line_number, raw in enumerate(body.decode("utf-8", errors="replace").splitlines(), start=1):
+        if not raw.strip():
+            continue
+        try:
+            yield line_number, BatchConversation.model_validate_json(raw), None
+        except ValidationError as exc:
+            yield line_number, None, exc.errors(include_url=False)[0]["msg"]
+
+
+async def run_conversation(
+    llm: LLMClient,
+    conversation: BatchConversation,
+    user_id: int,
+    conversation_id: Optional[str],
+) -> Dict[str, Any]:
+    """Plays the scripted turns against the LLM at batch priority; persists when given a conversation id."""
+    history: List[MessageRecord] = to_records(conversation.messages)
+    user_turns = list(conversation.turns)
+    if not user_turns and history and history[-1].role == "user":
+        user_turns.append(history.pop().content)
+    if not user_turns:
+        return {"status": "error", "error": "no_user_turn"}
+    persona = persona_registry.get(conversation.persona_id)
+    if persona is None:
+        return {"status": "error", "error": "persona_not_found"}
+
+    # Batch lines can only lower the budget; the default is also the ceiling.
+    max_tokens = min(conversation.max_tokens or settings.llm_max_tokens_default, settings.llm_max_tokens_default)
+    replies: List[str] = []
+    rows: List[MessageRow] = []
+    usage_totals = {"prompt_tokens": 0, "completion_tokens": 0}
+    status = "ok"
+    for turn in user_turns:
+        moderation = validate_content(turn, settings.safety_blocklist_enabled, persona=persona)
+        if moderation.state == ModerationState.REFUSE_HARD:
+            status = "blocked_input"
+            break
+        prompt = build_prompt(
+            history=history,
+            relationship_state=conversation.relationship_state,
+            conversation_summary=conversation.summary,
+            latest_user_message=turn,
+            persona=persona,
+        )
+        response = await llm.chat_completions(
+            prompt,
+            max_tokens=max_tokens,
+            temperature=conversation.temperature,
+            priority=AdaptiveConcurrencyLimiter.BATCH,
+        )
+        content = response.get("choices", [{}])[0].get("message", {}).get("content", "")
+        usage = response.get("usage") or {}
+        for key in usage_totals:
+            usage_totals[key] += usage.get(key) or 0
+        # Accounted per turn, so a conversation that fails on a later turn still pays for the earlier ones.
+        await asyncio.to_thread(
+            record_user_usage,
+            user_id,
+            usage.get("prompt_tokens") or 0,
+            usage.get("completion_tokens") or 0,
+        )
+        safety_output = validate_content(
+            content, settings.safety_blocklist_enabled, stage="post-llm", persona=persona
+        )
+        safety_state = safety_output.state.value
+        rows.append(("user", turn, None, None, ModerationState.ALLOW.value, None, None, None, None, None))
+        rows.append(
+            (
+                "assistant",
+                content,
+                settings.llm_model,
+                conversation.temperature,
+                safety_state,
+                *(usage.get(key) for key in _USAGE_KEYS),
+            )
+        )
+        replies.append(content)
+        if safety_output.state == ModerationState.REFUSE_HARD:
+            status = "blocked_output"
+            break
+        history.append(MessageRecord("user", turn))
+        history.append(MessageRecord("assistant", content))
+
+    if rows and conversation_id is not None:
+        await asyncio.to_thread(insert_conversation_messages, conversation_id, user_id, rows)
+    result: Dict[str, Any] = {"status": status, "replies": replies, "usage": usage_totals}
+    if conversation_id is not None:
+        result["conversation_id"] = conversation_id
+    return result
+
+
+async def run_batch(
+    llm: LLMClient,
+    body: bytes,
+    user_id: int,
+    concurrency: int,
+    persist_prefix: Optional[str] = None,
+    quota_exceeded: Optional[Callable[[int], bool]] = None,
+) -> AsyncGenerator[str, None]:
+    """Runs every JSONL conversation with at most `concurrency` in flight; yields result lines as they finish.
+
+    Results are queued with a small bound, so a slow reader pauses the workers
+    instead of piling up finished conversations in memory. `quota_exceeded` is
+    checked (in a thread) before each conversation, since the batch itself
+    spends the quota as it runs.
+    """
+    lines = parse_lines(body)
+    results: "asyncio.Queue[Optional[str]]" = asyncio.Queue(maxsize=concurrency * 2)
+
+    async def worker() -> None:
+        for line_number, conversation, error in lines:
+            result: Dict[str, Any] = {"line": line_number}
+            if conversation is None:
+                result.update(status="error", error=error)
+            elif quota_exceeded is not None and await asyncio.to_thread(quota_exceeded, user_id):
+                result.update(id=conversation.id, status="error", error="token_quota_exceeded")
+                _conversations.inc(labels={"status": result["status"]})
+            else:
+                result["id"] = conversation.id
+                conversation_id = f"{persist_prefix}-{line_number}" if persist_prefix else None
+                try:
+                    result.update(await run_conversation(llm, conversation, user_id, conversation_id))
+                except Exception as exc:
+                    logger.warning("batch_conversation_failed line=%s error=%s", line_number, exc)
+                    result.update(status="error", error=type(exc).__name__)
+                _conversations.inc(labels={"status": result["status"]})
+            await results.put(json.dumps(result, ensure_ascii=False) + "\n")
+        await results.put(None)
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(concurrency, 1))]
+    try:
+        remaining = len(workers)
+        while remaining:
+            line = await results.get()
+            if line is None:
+                remaining -= 1
+                continue
+            yield line
+    finally:
+        for task in workers:
+            task.cancel()
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from app.services.metrics import registry
+from shared.logging.logger import get_logger
+
+logger = get_logger("adaptive-concurrency")
+
+_limit_gauge = registry.gauge("llm_concurrency_limit", "Current in-flight limit for LLM calls.")
+_in_flight_gauge = registry.gauge("llm_in_flight", "LLM calls currently holding a concurrency slot.")
+
+
+class Permit:
+    def __init__(self, limiter: "AdaptiveConcurrencyLimiter") -> None:
+        self._limiter = limiter
+        self.started_at = time.monotonic()
+        self._observed = False
+
+    def observe(
+        self,
+        ttft_ms: Optional[float] = None,
+        tokens_per_sec: Optional[float] = None,
+        overloaded: bool = False,
+    ) -> None:
+        """Feeds one sample to the limiter; calls without a latency signal leave the limit alone."""
+        if self._observed:
+            return
+        self._observed = True
+        self._limiter._on_sample(self.started_at, ttft_ms, tokens_per_sec, overloaded)
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD limit on in-flight LLM calls.
+
+    Each sample within the TTFT / tokens-per-second targets grows the limit by
+    1/limit (about +1 per full window) while the limit is actually the bottleneck;
+    a sample over target multiplies it by `backoff`. Samples from calls started
+    before the last decrease are ignored so one congested burst only backs off once.
+    With min_limit == max_limit this is a plain semaphore.
+
+    Callers acquiring with priority="batch" only get a slot while no live caller
+    is waiting, and hold at most `batch_share` of the limit between them.
+    """
+
+    LIVE = "live"
+    BATCH = "batch"
+
+    def __init__(
+        self,
+        initial_limit: int,
+        min_limit: int,
+        max_limit: int,
+        target_ttft_ms: float = 0.0,
+        target_tokens_per_sec: float = 0.0,
+        backoff: float = 0.75,
+        name: str = "llm",
+        batch_share: float = 0.5,
+    ) -> None:
+        self._min = max(min_limit, 1)
+        self._max = max(max_limit, self._min)
+        self._limit = float(min(max(initial_limit, self._min), self._max))
+        self._target_ttft_ms = target_ttft_ms
+        self._target_tokens_per_sec = target_tokens_per_sec
+        self._backoff = backoff
+        self._name = name
+        self._batch_share = batch_share
+        self._in_flight = 0
+        self._batch_in_flight = 0
+        self._live_waiting = 0
+        self._last_decrease = 0.0
+        self._changed = asyncio.Condition()
+        self._publish()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _publish(self) -> None:
+        labels = {"limiter": self._name}
+        _limit_gauge.set(self.limit, labels)
+        _in_flight_gauge.set(self._in_flight, labels)
+
+    def _batch_may_enter(self) -> bool:
+        batch_limit = max(int(self.limit * self._batch_share), 1)
+        return self._live_waiting == 0 and self._in_flight < self.limit and self._batch_in_flight < batch_limit
+
+    @asynccontextmanager
+    async def acquire(self, priority: str = LIVE) -> AsyncIterator[Permit]:
+        batch = priority == self.BATCH
+        async with self._changed:
+            if batch:
+                await self._changed.wait_for(self._batch_may_enter)
+                self._batch_in_flight += 1
+            else:
+                self._live_waiting += 1
+                try:
+                    await self._changed.wait_for(lambda: self._in_flight < self.limit)
+                finally:
+                    self._live_waiting -= 1
+            self._in_flight += 1
+            self._publish()
+        try:
+            yield Permit(self)
+        finally:
+            async with self._changed:
+                self._in_flight -= 1
+                if batch:
+                    self._batch_in_flight -= 1
+                self._publish()
+                self._changed.notify_all()
+
+    def _is_overloaded(self, ttft_ms: Optional[float], tokens_per_sec: Optional[float]) -> Optional[bool]:
+        verdicts = []
+        if ttft_ms is not None and self._target_ttft_ms > 0:
+            verdicts.append(ttft_ms > self._target_ttft_ms)
+        if tokens_per_sec is not None and self._target_tokens_per_sec > 0:
+            verdicts.append(tokens_per_sec < self._target_tokens_per_sec)
+        if not verdicts:
+            return None
+        return any(verdicts)
+
+    def _on_sample(
+        self,
+        started_at: float,
+        ttft_ms: Optional[float],
+        tokens_per_sec: Optional[float],
+        overloaded: bool,
+    ) -> None:
+        if self._min == self._max:
+            return
+        verdict = True if overloaded else self._is_overloaded(ttft_ms, tokens_per_sec)
+        if verdict is None:
+            return
+        previous = self.limit
+        if verdict:
+            if started_at < self._last_decrease:
+                return
+            self._limit = max(self._limit * self._backoff, float(self._min))
+            self._last_decrease = time.monotonic()
+        elif self._in_flight >= self.limit - 1:
+            self._limit = min(self._limit + 1 / self._limit, float(self._max))
+        if self.limit != previous:
+            # Samples arrive while the permit is held; its release wakes waiters against the new limit.
+            logger.info("concurrency_limit_changed name=%s limit=%s previous=%s", self._name, self.limit, previous)
+            self._publish()
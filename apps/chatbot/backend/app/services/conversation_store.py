@@ -3,16 +3,16 @@ from __future__ import annotations
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 import asyncio
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, List, Tuple
 
-from shared.schemas.chat import ChatMessage
+from app.services.message_record import AnyMessage, MessageRecord, to_records
 
 
 @dataclass
 class Conversation:
     user_key: str
     conversation_id: str
-    messages: List[ChatMessage]
+    messages: List[MessageRecord]
     updated_at: datetime
 
 
@@ -27,13 +27,13 @@ class InMemoryConversationStore:
             self._evict_expired()
             return self._conversations.get((user_key, conversation_id))
 
-    async def upsert(self, user_key: str, conversation_id: str, messages: List[ChatMessage]) -> Conversation:
+    async def upsert(self, user_key: str, conversation_id: str, messages: Iterable[AnyMessage]) -> Conversation:
         async with self._lock:
             self._evict_expired()
             conversation = Conversation(
                 user_key=user_key,
                 conversation_id=conversation_id,
-                messages=list(messages),
+                messages=to_records(messages),
                 updated_at=datetime.utcnow(),
             )
             self._conversations[(user_key, conversation_id)] = conversation
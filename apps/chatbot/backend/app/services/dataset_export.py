@@ -0,0 +1,398 @@
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import sqlite3
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.db import sqlite as sqlite_db
+from app.db.archive import archive_dir, read_member
+from shared.logging.logger import get_logger
+
+try:
+    import pyarrow
+    import pyarrow.parquet as parquet
+except ImportError:  # optional dependency
+    pyarrow = None
+    parquet = None
+
+logger = get_logger("dataset-export")
+
+_CHECKPOINT = "_checkpoint.json"
+_MANIFEST = "_manifest.json"
+_RECORD_KEYS = ("id", "conversation_id", "role", "content", "created_at", "model_name", "temperature", "safety_state")
+
+
+@dataclass
+class ExportFilters:
+    since: Optional[str] = None
+    until: Optional[str] = None
+    rating: Optional[str] = None
+    safety_state: Optional[str] = None
+    role: Optional[str] = None
+
+
+@dataclass
+class ExportCheckpoint:
+    filters: Dict[str, Any]
+    fmt: str
+    last_message_id: int = 0
+    # Cursors for storage shards after the main database, keyed by shard index.
+    shard_cursors: Dict[str, int] = field(default_factory=dict)
+    # Last exported archive_index id per database ("-1" is the main database).
+    archive_cursors: Dict[str, int] = field(default_factory=dict)
+    next_shard: int = 0
+    rows_written: int = 0
+    shards: List[str] = field(default_factory=list)
+
+
+def open_readonly(path: Path, feedback_db: Optional[Path] = None) -> sqlite3.Connection:
+    """Opens `path` read-only; `feedback_db` attaches the main database as `fb` when `path` is a storage shard."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    if feedback_db is not None:
+        conn.execute("ATTACH DATABASE ? AS fb", (f"file:{feedback_db}?mode=ro",))
+    journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    if journal_mode.lower() != "wal":
+        logger.warning("export_not_wal journal_mode=%s writers may block during export", journal_mode)
+    return conn
+
+
+def _where(filters: ExportFilters, after_id: int, feedback_table: str = "feedback") -> tuple[str, List[Any]]:
+    clauses = ["m.id > ?"]
+    params: List[Any] = [after_id]
+    if filters.since:
+        clauses.append("m.created_at >= ?")
+        params.append(filters.since)
+    if filters.until:
+        clauses.append("m.created_at < ?")
+        params.append(filters.until)
+    if filters.safety_state:
+        clauses.append("m.safety_state = ?")
+        params.append(filters.safety_state)
+    if filters.role:
+        clauses.append("m.role = ?")
+        params.append(filters.role)
+    if filters.rating:
+        clauses.append(f"EXISTS (SELECT 1 FROM {feedback_table} f WHERE f.message_id = m.id AND f.rating = ?)")
+        params.append(filters.rating)
+    return " AND ".join(clauses), params
+
+
+def _feedback_for(
+    conn: sqlite3.Connection,
+    message_ids: List[int],
+    feedback_table: str = "feedback",
+) -> Dict[int, List[Dict[str, Any]]]:
+    if not message_ids:
+        return {}
+    placeholders = ", ".join("?" for _ in message_ids)
+    grouped: Dict[int, List[Dict[str, Any]]] = {}
+    for row in conn.execute(
+        f"""
+        SELECT message_id, user_id, rating, tags, rewrite_text, created_at
+        FROM {feedback_table} WHERE message_id IN ({placeholders})
+        ORDER BY id
+        """,
+        message_ids,
+    ):
+        grouped.setdefault(row["message_id"], []).append(
+            {
+                "user_id": row["user_id"],
+                "rating": row["rating"],
+                "tags": json.loads(row["tags"]) if row["tags"] else [],
+                "rewrite_text": row["rewrite_text"],
+                "created_at": row["created_at"],
+            }
+        )
+    return grouped
+
+
+def iter_records(
+    conn: sqlite3.Connection,
+    filters: ExportFilters,
+    after_id: int,
+    limit: int,
+    batch_size: int,
+    feedback_table: str = "feedback",
+) -> Iterator[Dict[str, Any]]:
+    where, params = _where(filters, after_id, feedback_table)
+    cursor = conn.execute(
+        f"""
+        SELECT m.id, m.conversation_id, m.role, m.content, m.created_at, m.model_name, m.temperature, m.safety_state
+        FROM messages m
+        WHERE {where}
+        ORDER BY m.id
+        LIMIT ?
+        """,
+        (*params, limit),
+    )
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        feedback = _feedback_for(conn, [row["id"] for row in rows], feedback_table)
+        for row in rows:
+            record = dict(row)
+            record["feedback"] = feedback.get(row["id"], [])
+            yield record
+
+
+def _matches(message: Dict[str, Any], filters: ExportFilters) -> bool:
+    """The non-feedback filters of `_where`, for archived rows that are no longer in SQL."""
+    if filters.since and message["created_at"] < filters.since:
+        return False
+    if filters.until and message["created_at"] >= filters.until:
+        return False
+    if filters.safety_state and message.get("safety_state") != filters.safety_state:
+        return False
+    return not filters.role or message["role"] == filters.role
+
+
+def iter_archived_records(
+    conn: sqlite3.Connection,
+    filters: ExportFilters,
+    after_index_id: int,
+    after_message_id: int,
+    segments_dir: Path,
+    feedback_table: str = "feedback",
+) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+    """(archive_index id, matching records) for each conversation archived after `after_index_id`.
+
+    Messages up to `after_message_id` were still live when an earlier run
+    exported them, so they are skipped.
+    """
+    try:
+        index_rows = conn.execute(
+            "SELECT id, segment, offset, length FROM archive_index WHERE id > ? ORDER BY id",
+            (after_index_id,),
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return
+    for index_row in index_rows:
+        members = read_member(index_row["segment"], index_row["offset"], index_row["length"], segments_dir)
+        messages = [
+            member["row"]
+            for member in members
+            if member.get("kind") == "message"
+            and member["row"]["id"] > after_message_id
+            and _matches(member["row"], filters)
+        ]
+        feedback = _feedback_for(conn, [message["id"] for message in messages], feedback_table)
+        records = []
+        for message in messages:
+            entries = feedback.get(message["id"], [])
+            if filters.rating and not any(entry["rating"] == filters.rating for entry in entries):
+                continue
+            record = {key: message.get(key) for key in _RECORD_KEYS}
+            record["feedback"] = entries
+            records.append(record)
+        yield index_row["id"], records
+
+
+class _ShardWriter:
+    def __init__(self, path: Path, fmt: str, row_group_size: int) -> None:
+        self.path = path
+        self._fmt = fmt
+        self._row_group_size = row_group_size
+        self._buffer: List[Dict[str, Any]] = []
+        self._parquet_writer = None
+        self._handle = None
+        if fmt == "jsonl.gz":
+            self._handle = gzip.open(path, "wt", encoding="utf-8")
+        elif fmt == "jsonl":
+            self._handle = path.open("w", encoding="utf-8")
+
+    def write(self, record: Dict[str, Any]) -> None:
+        if self._handle is not None:
+            self._handle.write(json.dumps(record, ensure_ascii=False) + "\n")
+            return
+        record = dict(record, feedback=json.dumps(record["feedback"]))
+        self._buffer.append(record)
+        if len(self._buffer) >= self._row_group_size:
+            self._flush_parquet()
+
+    def _flush_parquet(self) -> None:
+        if not self._buffer:
+            return
+        table = pyarrow.Table.from_pylist(self._buffer)
+        if self._parquet_writer is None:
+            self._parquet_writer = parquet.ParquetWriter(self.path, table.schema)
+        self._parquet_writer.write_table(table)
+        self._buffer = []
+
+    def close(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+            return
+        self._flush_parquet()
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+
+def _load_checkpoint(out_dir: Path, filters: ExportFilters, fmt: str, resume: bool) -> ExportCheckpoint:
+    path = out_dir / _CHECKPOINT
+    if resume and path.exists():
+        checkpoint = ExportCheckpoint(**json.loads(path.read_text(encoding="utf-8")))
+        if checkpoint.filters != asdict(filters) or checkpoint.fmt != fmt:
+            raise SystemExit("checkpoint filters/format differ from this run; use a new output directory")
+        return checkpoint
+    return ExportCheckpoint(filters=asdict(filters), fmt=fmt)
+
+
+def _save_checkpoint(out_dir: Path, checkpoint: ExportCheckpoint) -> None:
+    tmp = out_dir / (_CHECKPOINT + ".tmp")
+    tmp.write_text(json.dumps(asdict(checkpoint), indent=2), encoding="utf-8")
+    tmp.replace(out_dir / _CHECKPOINT)
+
+
+def _open_part(out_dir: Path, checkpoint: ExportCheckpoint, fmt: str, batch_size: int) -> Tuple[Path, _ShardWriter]:
+    partial = out_dir / f"part-{checkpoint.next_shard:05d}.{fmt}.partial"
+    return partial, _ShardWriter(partial, fmt, row_group_size=batch_size)
+
+
+def _finish_part(out_dir: Path, checkpoint: ExportCheckpoint, partial: Path, rows: int, last_id: int) -> bool:
+    """Publishes a written part and checkpoints it; an empty part is discarded and returns False."""
+    if rows == 0:
+        partial.unlink(missing_ok=True)
+        return False
+    shard_name = partial.name[: -len(".partial")]
+    partial.replace(out_dir / shard_name)
+    checkpoint.next_shard += 1
+    checkpoint.rows_written += rows
+    checkpoint.shards.append(shard_name)
+    _save_checkpoint(out_dir, checkpoint)
+    logger.info("export_shard_done shard=%s rows=%s last_id=%s", shard_name, rows, last_id)
+    return True
+
+
+def export_dataset(
+    db_path: Path,
+    out_dir: Path,
+    filters: ExportFilters,
+    fmt: str = "jsonl.gz",
+    shard_rows: int = 100_000,
+    batch_size: int = 1000,
+    resume: bool = True,
+    pause_ms: int = 0,
+    include_archived: bool = True,
+) -> ExportCheckpoint:
+    if fmt == "parquet" and pyarrow is None:
+        raise SystemExit("parquet output requires pyarrow")
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for leftover in out_dir.glob("*.partial"):
+        leftover.unlink()
+    checkpoint = _load_checkpoint(out_dir, filters, fmt, resume)
+    segments_dir = archive_dir(db_path)
+    # Storage shards are exported one after another; feedback always lives in the main database.
+    for db_index, path in sqlite_db.existing_shards(db_path):
+        is_main = db_index == sqlite_db.MAIN_DB
+        conn = open_readonly(path, feedback_db=None if is_main else db_path)
+        feedback_table = "feedback" if is_main else "fb.feedback"
+        cursor = checkpoint.last_message_id if is_main else checkpoint.shard_cursors.get(str(db_index), 0)
+        exported_live = cursor
+        while True:
+            partial, writer = _open_part(out_dir, checkpoint, fmt, batch_size)
+            rows = 0
+            last_id = cursor
+            # One read transaction per shard: a consistent WAL snapshot without pinning the WAL for the whole export.
+            conn.execute("BEGIN")
+            try:
+                for record in iter_records(conn, filters, cursor, shard_rows, batch_size, feedback_table):
+                    writer.write(record)
+                    rows += 1
+                    last_id = record["id"]
+                    if pause_ms and rows % batch_size == 0:
+                        time.sleep(pause_ms / 1000)
+            finally:
+                conn.execute("COMMIT")
+                writer.close()
+
+            cursor = last_id
+            if is_main:
+                checkpoint.last_message_id = cursor
+            else:
+                checkpoint.shard_cursors[str(db_index)] = cursor
+            if not _finish_part(out_dir, checkpoint, partial, rows, last_id) or rows < shard_rows:
+                break
+
+        # Conversations moved out by the retention job: one archive member at a time, so parts end on members.
+        archive_cursor = checkpoint.archive_cursors.get(str(db_index), 0)
+        while include_archived:
+            partial, writer = _open_part(out_dir, checkpoint, fmt, batch_size)
+            rows = 0
+            exhausted = True
+            conn.execute("BEGIN")
+            try:
+                for index_id, records in iter_archived_records(
+                    conn, filters, archive_cursor, exported_live, segments_dir, feedback_table
+                ):
+                    for record in records:
+                        writer.write(record)
+                    rows += len(records)
+                    archive_cursor = index_id
+                    if rows >= shard_rows:
+                        exhausted = False
+                        break
+            finally:
+                conn.execute("COMMIT")
+                writer.close()
+
+            checkpoint.archive_cursors[str(db_index)] = archive_cursor
+            if not _finish_part(out_dir, checkpoint, partial, rows, archive_cursor):
+                _save_checkpoint(out_dir, checkpoint)
+            if exhausted:
+                break
+
+        conn.close()
+
+    (out_dir / _MANIFEST).write_text(json.dumps(asdict(checkpoint), indent=2), encoding="utf-8")
+    return checkpoint
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Stream messages joined with feedback into sharded training files.")
+    parser.add_argument("out_dir", type=Path)
+    parser.add_argument("--db", type=Path, default=None, help="Database path (defaults to the backend DB).")
+    parser.add_argument("--format", choices=["jsonl", "jsonl.gz", "parquet"], default="jsonl.gz")
+    parser.add_argument("--since", default=None, help="ISO timestamp, inclusive.")
+    parser.add_argument("--until", default=None, help="ISO timestamp, exclusive.")
+    parser.add_argument("--rating", choices=["thumbs_up", "thumbs_down"], default=None)
+    parser.add_argument("--safety-state", default=None)
+    parser.add_argument("--role", default=None)
+    parser.add_argument("--shard-rows", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--pause-ms", type=int, default=0, help="Sleep between batches to limit I/O on a live host.")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint.")
+    parser.add_argument(
+        "--skip-archived", action="store_true", help="Leave out conversations the retention job archived."
+    )
+    args = parser.parse_args()
+
+    filters = ExportFilters(
+        since=args.since,
+        until=args.until,
+        rating=args.rating,
+        safety_state=args.safety_state,
+        role=args.role,
+    )
+    checkpoint = export_dataset(
+        args.db or sqlite_db._db_path(),
+        args.out_dir,
+        filters,
+        fmt=args.format,
+        shard_rows=args.shard_rows,
+        batch_size=args.batch_size,
+        resume=not args.restart,
+        pause_ms=args.pause_ms,
+        include_archived=not args.skip_archived,
+    )
+    print(f"exported {checkpoint.rows_written} rows into {len(checkpoint.shards)} shards")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+from typing import List, Sequence
+
+from app.db.sqlite import FeedbackRow, insert_feedback_batch
+from shared.config.settings import get_settings
+from shared.logging.logger import get_logger
+
+settings = get_settings()
+logger = get_logger("feedback-buffer")
+
+
+class FeedbackWriteBuffer:
+    """Collects feedback rows and writes them in one transaction per flush interval."""
+
+    def __init__(self, flush_interval_ms: int, max_rows: int) -> None:
+        self._flush_interval = max(flush_interval_ms, 1) / 1000
+        self._max_rows = max(max_rows, 1)
+        self._rows: List[FeedbackRow] = []
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._rows)
+
+    async def add(self, rows: Sequence[FeedbackRow]) -> None:
+        async with self._lock:
+            self._rows.extend(rows)
+            pending = len(self._rows)
+        self._ensure_task()
+        if pending >= self._max_rows:
+            await self.flush()
+
+    async def flush(self) -> int:
+        async with self._lock:
+            rows, self._rows = self._rows, []
+        if not rows:
+            return 0
+        try:
+            await asyncio.to_thread(insert_feedback_batch, rows)
+        except sqlite3.Error as exc:
+            logger.warning("feedback_flush_failed rows=%s error=%s", len(rows), exc)
+            async with self._lock:
+                self._rows[:0] = rows
+                overflow = len(self._rows) - self._max_rows * 10
+                if overflow > 0:
+                    del self._rows[:overflow]
+                    logger.warning("feedback_buffer_dropped rows=%s", overflow)
+            return 0
+        return len(rows)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    def _ensure_task(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._task = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            await self.flush()
+
+
+feedback_buffer = FeedbackWriteBuffer(settings.feedback_flush_interval_ms, settings.feedback_buffer_max_rows)
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+
+from shared.logging.logger import get_logger
+
+logger = get_logger("idempotency")
+
+
+def _is_error_frame(frame: str) -> bool:
+    """True for an SSE `event: error` frame, with or without a leading `id:` line."""
+    return frame.startswith("event: error\n") or "\nevent: error\n" in frame
+
+
+class IdempotencyEntry:
+    """One generation shared by every request that carries the same key."""
+
+    def __init__(self, fingerprint: str) -> None:
+        self.fingerprint = fingerprint
+        self.task: Optional[asyncio.Task] = None
+        self.completed_at: Optional[float] = None
+        self._frames: List[str] = []
+        # Once the stream ends its frames are joined into one string kept for the TTL.
+        self._replay: Optional[str] = None
+        self._stream_done = False
+        self._changed = asyncio.Condition()
+        self._pump: Optional[asyncio.Task] = None
+
+    @property
+    def streaming(self) -> bool:
+        return self._pump is not None
+
+    def start_stream(self, body: AsyncIterator[str], on_finish: Callable[[bool], None]) -> None:
+        self._pump = asyncio.create_task(self._run_pump(body, on_finish))
+
+    async def _run_pump(self, body: AsyncIterator[str], on_finish: Callable[[bool], None]) -> None:
+        # The generation keeps running when the original client goes away, so followers can finish it.
+        failed = False
+        try:
+            async for frame in body:
+                # A stream that ends on an error frame failed, even though the body itself returned normally.
+                failed = _is_error_frame(frame)
+                async with self._changed:
+                    self._frames.append(frame)
+                    self._changed.notify_all()
+        except Exception as exc:
+            failed = True
+            logger.warning("idempotent_stream_failed error=%s", exc)
+        finally:
+            async with self._changed:
+                self._replay = "".join(self._frames)
+                self._frames = []
+                self._stream_done = True
+                self._changed.notify_all()
+            on_finish(failed)
+
+    async def follow(self) -> AsyncGenerator[str, None]:
+        """Replays buffered frames, then follows the live generation until it ends.
+
+        Progress is counted in characters, so a follower still reading when the
+        stream finishes picks up the rest from the joined replay.
+        """
+        index = 0
+        sent = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: len(self._frames) > index or self._stream_done)
+                replay = self._replay
+                batch = self._frames[index:]
+            if replay is not None:
+                if replay[sent:]:
+                    yield replay[sent:]
+                return
+            index += len(batch)
+            for frame in batch:
+                sent += len(frame)
+                yield frame
+
+
+class IdempotencyRegistry:
+    """Deduplicates retried requests in this process; completed entries are kept for `ttl_seconds`."""
+
+    def __init__(self, ttl_seconds: int, max_entries: int) -> None:
+        self._ttl_seconds = ttl_seconds
+        self._max_entries = max(max_entries, 1)
+        self._entries: "OrderedDict[str, IdempotencyEntry]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        expired = [
+            key
+            for key, entry in self._entries.items()
+            if entry.completed_at is not None and now - entry.completed_at > self._ttl_seconds
+        ]
+        for key in expired:
+            del self._entries[key]
+        while len(self._entries) > self._max_entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry.completed_at is None:
+                break
+            del self._entries[key]
+
+    def _finish(self, key: str, entry: IdempotencyEntry, failed: bool) -> None:
+        if failed:
+            # Let the next retry run a fresh generation instead of replaying the failure forever.
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+            return
+        entry.completed_at = time.monotonic()
+
+    def begin(
+        self,
+        key: str,
+        fingerprint: str,
+        run: Callable[[], Awaitable[Any]],
+        is_stream: Callable[[Any], Optional[AsyncIterator[str]]],
+    ) -> Tuple[IdempotencyEntry, bool]:
+        """Returns the entry for `key` and whether this call started it.
+
+        `run` produces the response; `is_stream` returns its body iterator when the
+        response streams, which is then pumped into the shared frame buffer.
+        """
+        self._evict()
+        entry = self._entries.get(key)
+        if entry is not None:
+            return entry, False
+
+        entry = IdempotencyEntry(fingerprint)
+        self._entries[key] = entry
+
+        async def produce() -> Any:
+            result = await run()
+            body = is_stream(result)
+            if body is not None:
+                entry.start_stream(body, lambda failed: self._finish(key, entry, failed))
+            return result
+
+        def on_done(task: asyncio.Task) -> None:
+            failed = task.cancelled() or task.exception() is not None
+            if failed or not entry.streaming:
+                self._finish(key, entry, failed)
+
+        entry.task = asyncio.create_task(produce())
+        entry.task.add_done_callback(on_done)
+        return entry, True
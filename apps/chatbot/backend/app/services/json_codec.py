@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import json
+import math
+from typing import Any, AsyncIterator, Callable, Coroutine, List, Union
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+# allow_nan=False like Starlette's JSONResponse: a bare NaN token is not JSON.
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), allow_nan=False)
+
+DecodeError = orjson.JSONDecodeError if orjson is not None else json.JSONDecodeError
+
+
+def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+    """Parses JSON from bytes without decoding to str first when orjson is available."""
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+def _finite(value: Any) -> Any:
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite(item) for item in value]
+    return value
+
+
+def _encode(value: Any) -> str:
+    try:
+        return _encoder.encode(value)
+    except ValueError as exc:
+        if "Out of range float" not in str(exc):
+            raise
+        # orjson writes NaN and +/-Infinity as null; do the same rather than fail the response.
+        return _encoder.encode(_finite(value))
+
+
+def dumps(value: Any) -> bytes:
+    """Compact UTF-8 JSON; both backends produce the same bytes for plain JSON types."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return _encode(value).encode("utf-8")
+
+
+def dumps_str(value: Any) -> str:
+    if orjson is not None:
+        return orjson.dumps(value).decode("utf-8")
+    return _encode(value)
+
+
+async def iter_byte_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Splits a byte stream on newlines without decoding it (what `aiter_lines` does per line)."""
+    # Pieces of the unfinished line, joined once its newline arrives: a long line split over
+    # many chunks is copied once instead of once per chunk.
+    pending: List[bytes] = []
+    async for chunk in chunks:
+        lines = chunk.split(b"\n")
+        if len(lines) == 1:
+            pending.append(chunk)
+            continue
+        if pending:
+            pending.append(lines[0])
+            lines[0] = b"".join(pending)
+        tail = lines.pop()
+        pending = [tail] if tail else []
+        for line in lines:
+            yield line.rstrip(b"\r")
+    if pending:
+        yield b"".join(pending).rstrip(b"\r")
+
+
+class FastJSONResponse(JSONResponse):
+    """Default response class: renders with the fast codec instead of `json.dumps`."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class _FastJSONRequest(Request):
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            self._json = loads(await self.body())
+        return self._json
+
+
+class FastJSONRoute(APIRoute):
+    """Route class that parses JSON request bodies with the fast codec."""
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            return await handler(_FastJSONRequest(request.scope, request.receive))
+
+        return route_handler
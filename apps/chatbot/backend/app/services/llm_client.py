@@ -1,116 +1,352 @@
 from __future__ import annotations
 
 import asyncio
-import json
-from typing import Any, AsyncGenerator, Dict, List, Tuple
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, Iterator, Optional, Sequence, Tuple
+from urllib.parse import urlparse
 
 import httpx
 
+from app.services import json_codec
+from app.services.concurrency import AdaptiveConcurrencyLimiter, Permit
+from app.services.message_record import AnyMessage, encode_chat_payload
+from app.services.resilience import (
+    CircuitBreaker,
+    LatencyWindow,
+    LLMUnavailableError,
+    backoff_delay,
+    breaker_for,
+    count_retry,
+    hedged,
+)
+from app.services.shared_state import GlobalConcurrencyBudget
+from app.services.tracing import current_trace
 from shared.config.settings import get_settings
-from shared.schemas.chat import ChatMessage
 from shared.logging.logger import get_logger
 
 settings = get_settings()
 logger = get_logger("llm-client")
 
 
+@dataclass
+class LLMUsage:
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    ttft_ms: Optional[float] = None
+    duration_ms: Optional[float] = None
+    backend_id: Optional[str] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+def _ollama_token_counts(data: Dict[str, Any]) -> Tuple[Optional[int], Optional[int]]:
+    return data.get("prompt_eval_count"), data.get("eval_count")
+
+
+def _openai_token_counts(data: Dict[str, Any]) -> Tuple[Optional[int], Optional[int]]:
+    usage = data.get("usage") or {}
+    return usage.get("prompt_tokens"), usage.get("completion_tokens")
+
+
+def _build_limiter() -> AdaptiveConcurrencyLimiter:
+    if not settings.llm_adaptive_concurrency:
+        limit = settings.llm_concurrency_limit
+        return AdaptiveConcurrencyLimiter(limit, limit, limit, batch_share=settings.batch_llm_share)
+    return AdaptiveConcurrencyLimiter(
+        settings.llm_concurrency_limit,
+        settings.llm_concurrency_min,
+        settings.llm_concurrency_max,
+        target_ttft_ms=settings.llm_target_ttft_ms,
+        target_tokens_per_sec=settings.llm_target_tokens_per_sec,
+        batch_share=settings.batch_llm_share,
+    )
+
+
+def _is_overload(exc: Exception) -> bool:
+    if isinstance(exc, httpx.TimeoutException):
+        return True
+    return isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code in (429, 503)
+
+
 class LLMClient:
-    def __init__(self) -> None:
-        self._semaphore = asyncio.Semaphore(settings.llm_concurrency_limit)
-        self._timeout = httpx.Timeout(settings.llm_request_timeout_seconds)
+    def __init__(self, budget: GlobalConcurrencyBudget | None = None) -> None:
+        self._limiter = _build_limiter()
+        self._budget = budget
+        self._timeout = httpx.Timeout(
+            settings.llm_request_timeout_seconds,
+            connect=settings.llm_connect_timeout_seconds,
+        )
+        self._latency = LatencyWindow()
         self._base_url = settings.llm_base_url.rstrip("/")
         self._model = settings.llm_model
         self._api_mode = settings.llm_api_mode.lower()
+        self._backend_id = urlparse(self._base_url).netloc or self._base_url
+        self._client: httpx.AsyncClient | None = None
+        self._client_loop: asyncio.AbstractEventLoop | None = None
 
     def _endpoint(self, path: str) -> str:
         return f"{self._base_url}/{path.lstrip('/')}"
 
+    @asynccontextmanager
+    async def _http(self) -> AsyncIterator[httpx.AsyncClient]:
+        """Pooled client for the running loop, so calls reuse warm keep-alive connections."""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(
+                timeout=self._timeout,
+                limits=httpx.Limits(
+                    max_connections=max(settings.llm_concurrency_max, settings.llm_concurrency_limit) * 2,
+                    max_keepalive_connections=settings.llm_concurrency_limit,
+                ),
+            )
+            self._client_loop = loop
+        yield self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def preload(self) -> None:
+        """Opens a pooled connection and asks the backend to load the model without generating."""
+        async with self._http() as client:
+            if self._api_mode == "ollama":
+                request = client.build_request(
+                    "POST",
+                    self._endpoint("/api/chat"),
+                    json={"model": self._model, "messages": [], "keep_alive": settings.llm_keep_alive},
+                )
+            else:
+                request = client.build_request("GET", self._endpoint("/models"))
+            with self._breaker_outcome():
+                response = await self._send(client, request, stream=False)
+                response.raise_for_status()
+        logger.info("llm_preloaded backend=%s model=%s", self._backend_id, self._model)
+
+    @property
+    def limiter(self) -> AdaptiveConcurrencyLimiter:
+        return self._limiter
+
+    def _breaker(self) -> CircuitBreaker:
+        return breaker_for(
+            self._backend_id,
+            settings.llm_breaker_failure_threshold,
+            settings.llm_breaker_reset_seconds,
+        )
+
+    def _hedge_delay(self) -> float | None:
+        if not settings.llm_hedge_enabled or len(self._latency) < settings.llm_hedge_min_samples:
+            return None
+        return self._latency.percentile(95)
+
+    @contextmanager
+    def _breaker_outcome(self) -> Iterator[None]:
+        """Records one breaker outcome for a logical call, however many attempts or hedges it sent."""
+        breaker = self._breaker()
+        try:
+            yield
+        except (LLMUnavailableError, httpx.TimeoutException):
+            breaker.record_failure()
+            raise
+        except httpx.HTTPStatusError as exc:
+            if exc.response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            raise
+        breaker.record_success()
+
+    async def _send(self, client: httpx.AsyncClient, request: httpx.Request, stream: bool) -> httpx.Response:
+        """Sends with jittered retries on connect errors; callers report the outcome via `_breaker_outcome`."""
+        attempt = 0
+        while True:
+            try:
+                return await client.send(request, stream=stream)
+            except (httpx.ConnectError, httpx.ConnectTimeout) as exc:
+                if attempt >= settings.llm_connect_retries or self._breaker().state == CircuitBreaker.OPEN:
+                    raise LLMUnavailableError(f"{self._backend_id} unreachable: {exc}") from exc
+                count_retry(self._backend_id)
+                await asyncio.sleep(backoff_delay(attempt, settings.llm_retry_backoff_ms / 1000))
+                attempt += 1
+
+    @asynccontextmanager
+    async def _slot(self, priority: str = AdaptiveConcurrencyLimiter.LIVE) -> AsyncIterator[Permit]:
+        # Fail fast while the backend is down instead of queueing for a concurrency slot.
+        self._breaker().check()
+        async with self._limiter.acquire(priority) as permit:
+            try:
+                if self._budget is None:
+                    yield permit
+                else:
+                    async with self._budget.slot():
+                        yield permit
+            except (httpx.TimeoutException, httpx.HTTPStatusError) as exc:
+                if _is_overload(exc):
+                    permit.observe(overloaded=True)
+                raise
+
     async def chat_completions(
         self,
-        messages: List[ChatMessage],
+        messages: Sequence[AnyMessage],
         max_tokens: int,
         temperature: float = 0.8,
+        priority: str = AdaptiveConcurrencyLimiter.LIVE,
     ) -> Dict[str, Any]:
+        """Non-streaming completion; priority="batch" yields slots to live traffic (see the limiter)."""
         if self._api_mode == "ollama":
             payload = {
                 "model": self._model,
-                "messages": [message.model_dump() for message in messages],
                 "stream": False,
-                "options": {"temperature": temperature},
+                "keep_alive": settings.llm_keep_alive,
+                "options": {"temperature": temperature, "num_predict": max_tokens},
             }
             endpoint = self._endpoint("/api/chat")
         else:
             payload = {
                 "model": self._model,
-                "messages": [message.model_dump() for message in messages],
                 "max_tokens": max_tokens,
                 "temperature": temperature,
                 "stream": False,
             }
             endpoint = self._endpoint("/chat/completions")
-        async with self._semaphore:
-            async with httpx.AsyncClient(timeout=self._timeout) as client:
-                response = await client.post(endpoint, json=payload)
-                response.raise_for_status()
-                data = response.json()
+        trace = current_trace()
+        async with self._slot(priority) as permit:
+            async with self._http() as client:
+                request = client.build_request(
+                    "POST",
+                    endpoint,
+                    content=encode_chat_payload(payload, messages),
+                    headers={**trace.headers(), "Content-Type": "application/json"},
+                )
+
+                async def attempt() -> httpx.Response:
+                    response = await self._send(client, request, stream=False)
+                    response.raise_for_status()
+                    return response
+
+                # Batch calls neither hedge (a duplicate request would take a second slot from live
+                # traffic) nor feed the latency window the live hedge delay is picked from.
+                live = priority != AdaptiveConcurrencyLimiter.BATCH
+                started = time.perf_counter()
+                with trace.span("llm_request"), self._breaker_outcome():
+                    response = await hedged(attempt, self._hedge_delay() if live else None, self._backend_id)
+                duration_ms = _elapsed_ms(started)
+                if live:
+                    self._latency.add(duration_ms / 1000)
+                data = json_codec.loads(response.content)
                 if self._api_mode == "ollama":
+                    prompt_tokens, completion_tokens = _ollama_token_counts(data)
                     content = data.get("message", {}).get("content", "")
-                    return {"choices": [{"message": {"content": content}}]}
+                    data = {"choices": [{"message": {"content": content}}]}
+                else:
+                    prompt_tokens, completion_tokens = _openai_token_counts(data)
+                # Without streaming the first token arrives with the whole body.
+                usage = LLMUsage(prompt_tokens, completion_tokens, duration_ms, duration_ms, self._backend_id)
+                if completion_tokens and duration_ms > 0:
+                    permit.observe(tokens_per_sec=completion_tokens / (duration_ms / 1000))
+                data["usage"] = usage.as_dict()
                 return data
 
     async def stream_chat_completions(
         self,
-        messages: List[ChatMessage],
+        messages: Sequence[AnyMessage],
         max_tokens: int,
         temperature: float = 0.8,
-    ) -> AsyncGenerator[Tuple[str, str], None]:
+    ) -> AsyncGenerator[Tuple[str, Any], None]:
+        """Yields ("delta", text) chunks, then ("usage", LLMUsage) and ("done", "")."""
         if self._api_mode == "ollama":
             payload = {
                 "model": self._model,
-                "messages": [message.model_dump() for message in messages],
                 "stream": True,
-                "options": {"temperature": temperature},
+                "keep_alive": settings.llm_keep_alive,
+                "options": {"temperature": temperature, "num_predict": max_tokens},
             }
             endpoint = self._endpoint("/api/chat")
         else:
             payload = {
                 "model": self._model,
-                "messages": [message.model_dump() for message in messages],
                 "max_tokens": max_tokens,
                 "temperature": temperature,
                 "stream": True,
+                "stream_options": {"include_usage": True},
             }
             endpoint = self._endpoint("/chat/completions")
-        async with self._semaphore:
-            async with httpx.AsyncClient(timeout=self._timeout) as client:
-                async with client.stream("POST", endpoint, json=payload) as response:
-                    response.raise_for_status()
-                    async for line in response.aiter_lines():
+        trace = current_trace()
+        async with self._slot() as permit:
+            async with self._http() as client:
+                usage = LLMUsage(backend_id=self._backend_id)
+                started = time.perf_counter()
+                connect_span = trace.start_span("llm_connect")
+                request = client.build_request(
+                    "POST",
+                    endpoint,
+                    content=encode_chat_payload(payload, messages),
+                    headers={**trace.headers(), "Content-Type": "application/json"},
+                )
+                with self._breaker_outcome():
+                    response = await self._send(client, request, stream=True)
+                    connect_span.end(status_code=response.status_code)
+                    if response.is_error:
+                        await response.aclose()
+                        response.raise_for_status()
+                try:
+                    first_token_span = trace.start_span("llm_first_token")
+                    stream_span = trace.start_span("llm_stream_end")
+                    # Lines stay bytes end to end: no per-line decode, and orjson parses bytes directly.
+                    async for line in json_codec.iter_byte_lines(response.aiter_bytes()):
                         if not line:
                             continue
                         if self._api_mode == "ollama":
                             try:
-                                payload = json.loads(line)
-                            except json.JSONDecodeError:
-                                logger.warning("llm_stream_parse_failed payload=%s", line)
+                                payload = json_codec.loads(line)
+                            except json_codec.DecodeError:
+                                logger.warning("llm_stream_parse_failed payload=%r", line[:200])
                                 continue
                             if payload.get("done"):
+                                stream_span.end()
+                                usage.prompt_tokens, usage.completion_tokens = _ollama_token_counts(payload)
+                                usage.duration_ms = _elapsed_ms(started)
+                                yield ("usage", usage)
                                 yield ("done", "")
                                 return
                             content = payload.get("message", {}).get("content", "")
+                            if usage.ttft_ms is None:
+                                usage.ttft_ms = _elapsed_ms(started)
+                                permit.observe(ttft_ms=usage.ttft_ms)
+                            first_token_span.end()
                             yield ("delta", content)
                         else:
-                            if not line.startswith("data:"):
+                            if not line.startswith(b"data:"):
                                 continue
-                            data = line.replace("data:", "", 1).strip()
-                            if data == "[DONE]":
+                            data = line[5:].strip()
+                            if data == b"[DONE]":
+                                stream_span.end()
+                                usage.duration_ms = _elapsed_ms(started)
+                                yield ("usage", usage)
                                 yield ("done", "")
                                 return
                             try:
-                                payload = json.loads(data)
-                            except json.JSONDecodeError:
-                                logger.warning("llm_stream_parse_failed payload=%s", data)
+                                payload = json_codec.loads(data)
+                            except json_codec.DecodeError:
+                                logger.warning("llm_stream_parse_failed payload=%r", data[:200])
+                                continue
+                            if payload.get("usage"):
+                                usage.prompt_tokens, usage.completion_tokens = _openai_token_counts(payload)
+                            choices = payload.get("choices") or [{}]
+                            content = choices[0].get("delta", {}).get("content", "")
+                            if not content:
                                 continue
-                            delta = payload.get("choices", [{}])[0].get("delta", {})
-                            content = delta.get("content", "")
+                            if usage.ttft_ms is None:
+                                usage.ttft_ms = _elapsed_ms(started)
+                                permit.observe(ttft_ms=usage.ttft_ms)
+                            first_token_span.end()
                             yield ("delta", content)
+                finally:
+                    await response.aclose()
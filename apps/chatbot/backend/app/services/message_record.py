@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+from app.services.json_codec import dumps_str
+from shared.schemas.chat import ChatMessage
+
+
+class MessageRecord:
+    """Compact, append-only chat message kept in the conversation store.
+
+    Roles are interned so every record shares the same few strings, and the
+    `{"role": ..., "content": ...}` wire fragment is encoded once and reused for
+    every later request that sends this message to the LLM.
+    """
+
+    __slots__ = ("id", "role", "content", "_wire")
+
+    def __init__(self, role: str, content: str, id: Optional[int] = None) -> None:
+        self.id = id
+        self.role = sys.intern(role)
+        self.content = content
+        self._wire: Optional[str] = None
+
+    @classmethod
+    def from_message(cls, message: Union["MessageRecord", ChatMessage]) -> "MessageRecord":
+        if isinstance(message, MessageRecord):
+            return message
+        return cls(message.role, message.content, message.id)
+
+    def wire(self) -> str:
+        if self._wire is None:
+            self._wire = dumps_str({"role": self.role, "content": self.content})
+        return self._wire
+
+    def to_message(self) -> ChatMessage:
+        return ChatMessage(id=self.id, role=self.role, content=self.content)
+
+    def __repr__(self) -> str:
+        return f"MessageRecord(id={self.id!r}, role={self.role!r}, content={self.content[:40]!r})"
+
+
+AnyMessage = Union[MessageRecord, ChatMessage]
+
+
+def to_records(messages: Iterable[AnyMessage]) -> List[MessageRecord]:
+    return [MessageRecord.from_message(message) for message in messages]
+
+
+def encode_chat_payload(fields: Dict[str, Any], messages: Sequence[AnyMessage]) -> bytes:
+    """JSON body for an LLM chat call, splicing in the cached per-message fragments."""
+    head = dumps_str(fields)
+    fragments = ",".join(MessageRecord.from_message(message).wire() for message in messages)
+    separator = "," if fields else ""
+    return f'{head[:-1]}{separator}"messages":[{fragments}]}}'.encode("utf-8")
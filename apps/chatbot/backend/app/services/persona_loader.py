@@ -1,35 +1,189 @@
 from __future__ import annotations
 
+import asyncio
 import json
+import threading
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Optional, Tuple
 
-from jsonschema import validate
+from jsonschema.validators import validator_for
 
+from app.safety.policy import redirect_message, refusal_message
+from shared.config.settings import get_settings
 from shared.logging.logger import get_logger
 
+settings = get_settings()
 logger = get_logger("persona-loader")
 
-_CACHE: Dict[str, Any] | None = None
+_SCHEMA_FILE = "persona.schema.json"
+_PERSONA_SUFFIX = "_persona"
 
 
 def _persona_dir() -> Path:
+    if settings.persona_dir:
+        return Path(settings.persona_dir)
     return Path(__file__).resolve().parents[5] / "shared" / "persona"
 
 
-def load_default_persona() -> Dict[str, Any]:
-    global _CACHE
-    if _CACHE is not None:
-        return _CACHE
+def persona_id_for(path: Path) -> str:
+    """`default_persona.json` and `default.json` both register as persona id `default`."""
+    stem = path.stem
+    return stem[: -len(_PERSONA_SUFFIX)] if stem.endswith(_PERSONA_SUFFIX) else stem
 
-    persona_dir = _persona_dir()
-    schema_path = persona_dir / "persona.schema.json"
-    persona_path = persona_dir / "default_persona.json"
 
-    schema = json.loads(schema_path.read_text(encoding="utf-8"))
-    persona = json.loads(persona_path.read_text(encoding="utf-8"))
-    validate(instance=persona, schema=schema)
+def render_persona_block(persona: Dict[str, Any]) -> str:
+    """Static persona section of the system prompt."""
+    lines = [
+        "### Persona",
+        f"Name: {persona['name']}",
+        f"Role: {persona['role']}",
+        f"Tone: {persona['tone']}",
+        f"Speaking style: {persona['speaking_style']}",
+        f"Goals: {', '.join(persona['goals'])}",
+        f"Likes: {', '.join(persona['likes'])}",
+        f"Dislikes: {', '.join(persona['dislikes'])}",
+        f"{persona['name']} is an adult (21+).",
+        "Adult consensual explicit sexual conversation is allowed.",
+        "Refuse only: minors, coercion/trafficking/non-consensual, sexual violence/exploitation.",
+        "Do not describe physical actions or body language in text. Use emojis to convey tone/emotion instead.",
+        "Use first-person only. Avoid third-person narration.",
+        "Assume consent unless explicitly violated. No artificial pacing or trust-building.",
+    ]
+    return "\n".join(lines)
 
-    _CACHE = persona
-    logger.info("persona_loaded name=%s", persona.get("name"))
-    return persona
+
+@dataclass(frozen=True)
+class CompiledPersona:
+    """A validated persona plus everything the request path derives from it, built once per file version."""
+
+    persona_id: str
+    data: Dict[str, Any]
+    system_block: str
+    refusal: str
+    redirect: str
+    mtime_ns: int
+
+
+def compile_persona(persona_id: str, data: Dict[str, Any], mtime_ns: int = 0) -> CompiledPersona:
+    return CompiledPersona(
+        persona_id=persona_id,
+        data=data,
+        system_block=render_persona_block(data),
+        refusal=refusal_message(data),
+        redirect=redirect_message(data),
+        mtime_ns=mtime_ns,
+    )
+
+
+class PersonaRegistry:
+    """Personas keyed by id, reloaded from disk when a file's mtime changes.
+
+    `reload` does the file reads, schema validation and compilation, and then
+    swaps in a new dict, so lookups on the request path are a single dict read
+    and never see a half-built registry. A file that fails validation keeps
+    serving its last good version. Startup does the first `reload` off the
+    event loop; a lookup on a registry nothing has loaded yet (scripts, tests,
+    benchmarks) loads it once itself.
+    """
+
+    def __init__(self, directory: Optional[Path] = None) -> None:
+        self._directory = directory
+        self._personas: Dict[str, CompiledPersona] = {}
+        self._validator: Any = None
+        self._schema_mtime_ns = -1
+        self._reload_lock = threading.Lock()
+        self._loaded = False
+
+    @property
+    def directory(self) -> Path:
+        return self._directory or _persona_dir()
+
+    def _ensure_loaded(self) -> None:
+        with self._reload_lock:
+            if self._loaded:
+                return
+            changes = self._scan()
+        self._log(changes)
+
+    def get(self, persona_id: Optional[str] = None) -> Optional[CompiledPersona]:
+        if not self._loaded:
+            self._ensure_loaded()
+        return self._personas.get(persona_id or settings.default_persona_id)
+
+    def default(self) -> CompiledPersona:
+        persona = self.get()
+        if persona is None:
+            raise RuntimeError(f"default persona {settings.default_persona_id!r} not found in {self.directory}")
+        return persona
+
+    def ids(self) -> Tuple[str, ...]:
+        return tuple(sorted(self._personas))
+
+    def _schema_validator(self) -> Any:
+        schema_path = self.directory / _SCHEMA_FILE
+        mtime_ns = schema_path.stat().st_mtime_ns
+        if mtime_ns != self._schema_mtime_ns:
+            schema = json.loads(schema_path.read_text(encoding="utf-8"))
+            self._validator = validator_for(schema)(schema)
+            self._schema_mtime_ns = mtime_ns
+        return self._validator
+
+    def reload(self) -> Dict[str, str]:
+        """Rescans the directory; returns {persona_id: "loaded" | "removed" | "invalid"} for what changed."""
+        with self._reload_lock:
+            changes = self._scan()
+        self._log(changes)
+        return changes
+
+    def _scan(self) -> Dict[str, str]:
+        # Caller holds _reload_lock.
+        previous_schema = self._schema_mtime_ns
+        validator = self._schema_validator()
+        schema_changed = previous_schema != self._schema_mtime_ns
+        current = self._personas
+        personas: Dict[str, CompiledPersona] = {}
+        changes: Dict[str, str] = {}
+        for path in sorted(self.directory.glob("*.json")):
+            if path.name == _SCHEMA_FILE:
+                continue
+            persona_id = persona_id_for(path)
+            mtime_ns = path.stat().st_mtime_ns
+            previous = current.get(persona_id)
+            if previous is not None and previous.mtime_ns == mtime_ns and not schema_changed:
+                personas[persona_id] = previous
+                continue
+            try:
+                data = json.loads(path.read_text(encoding="utf-8"))
+                validator.validate(data)
+            except Exception as exc:  # keep serving the last good version
+                logger.warning("persona_invalid persona_id=%s error=%s", persona_id, exc)
+                changes[persona_id] = "invalid"
+                if previous is not None:
+                    personas[persona_id] = previous
+                continue
+            personas[persona_id] = compile_persona(persona_id, data, mtime_ns)
+            changes[persona_id] = "loaded"
+        for persona_id in current.keys() - personas.keys():
+            changes[persona_id] = "removed"
+        self._personas = personas
+        self._loaded = True
+        return changes
+
+    @staticmethod
+    def _log(changes: Dict[str, str]) -> None:
+        for persona_id, change in changes.items():
+            if change != "invalid":
+                logger.info("persona_%s persona_id=%s", change, persona_id)
+
+
+persona_registry = PersonaRegistry()
+
+
+async def persona_reload_loop() -> None:
+    while True:
+        await asyncio.sleep(settings.persona_reload_interval_seconds)
+        try:
+            await asyncio.to_thread(persona_registry.reload)
+        except Exception as exc:  # keep the loop alive; the next scan retries
+            logger.warning("persona_reload_failed error=%s", exc)
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from app.db.sqlite import get_user_preferences, upsert_user_preferences
+from shared.config.settings import get_settings
+
+settings = get_settings()
+
+PREFERENCE_FIELDS = ("verbosity", "emoji_level", "nsfw_intensity")
+
+_VERBOSITY_INSTRUCTIONS = {
+    "short": "Keep replies short: one to three sentences.",
+    "long": "Longer, detailed replies are welcome when the moment calls for it.",
+}
+
+
+@dataclass(frozen=True)
+class GenerationBudget:
+    max_tokens: int
+    instruction: Optional[str] = None
+
+
+def generation_budget(preferences: Dict[str, Optional[str]]) -> GenerationBudget:
+    """Maps the user's verbosity to a per-request token cap and a matching prompt instruction."""
+    verbosity = preferences.get("verbosity") or "normal"
+    if verbosity == "short":
+        max_tokens = min(settings.verbosity_short_max_tokens, settings.llm_max_tokens_default)
+    elif verbosity == "long":
+        max_tokens = max(settings.verbosity_long_max_tokens, settings.llm_max_tokens_default)
+    else:
+        max_tokens = settings.llm_max_tokens_default
+    return GenerationBudget(max_tokens, _VERBOSITY_INSTRUCTIONS.get(verbosity))
+
+
+class PreferencesCache:
+    """Small TTL + LRU cache in front of `user_preferences`.
+
+    Writes through this process invalidate immediately; other workers pick up a
+    change once their entry expires.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+        self._max_entries = max(max_entries, 1)
+        self._ttl = ttl_seconds
+        self._entries: "OrderedDict[int, Tuple[float, Dict[str, Optional[str]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Dict[str, Optional[str]]:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._entries.get(user_id)
+            if cached is not None and cached[0] > now:
+                self._entries.move_to_end(user_id)
+                return dict(cached[1])
+        row = get_user_preferences(user_id)
+        preferences = {field: (row[field] if row is not None else None) for field in PREFERENCE_FIELDS}
+        self._store(user_id, preferences, now)
+        return dict(preferences)
+
+    def set(self, user_id: int, preferences: Dict[str, Optional[str]]) -> None:
+        values = {field: preferences.get(field) for field in PREFERENCE_FIELDS}
+        upsert_user_preferences(user_id, **values)
+        self._store(user_id, values, time.monotonic())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _store(self, user_id: int, preferences: Dict[str, Optional[str]], now: float) -> None:
+        with self._lock:
+            self._entries[user_id] = (now + self._ttl, preferences)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+
+preferences_cache = PreferencesCache(settings.preferences_cache_max_entries, settings.preferences_cache_ttl_seconds)
@@ -5,6 +5,11 @@ from datetime import datetime, timedelta
 import asyncio
 from typing import Dict, List
 
+from app.services.shared_state import SharedStateBackend, SharedStateError
+from shared.logging.logger import get_logger
+
+logger = get_logger("rate-limit")
+
 
 @dataclass
 class RateLimitState:
@@ -33,3 +38,18 @@ class SlidingWindowRateLimiter:
                 return False
             state.timestamps.append(now)
             return True
+
+
+class SharedRateLimiter:
+    """Same quota as SlidingWindowRateLimiter, counted across every worker sharing the backend."""
+
+    def __init__(self, backend: SharedStateBackend, max_per_minute: int, burst: int) -> None:
+        self._backend = backend
+        self._limit = max_per_minute + burst
+
+    async def allow(self, key: str) -> bool:
+        try:
+            return await self._backend.hit(key, 60, self._limit)
+        except SharedStateError as exc:
+            logger.warning("rate_limit_backend_unavailable error=%s", exc)
+            return True
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List
+
+from app.db.sqlite import RelationshipRow, get_relationship_state, upsert_relationship_states
+from shared.config.settings import get_settings
+from shared.logging.logger import get_logger
+
+settings = get_settings()
+logger = get_logger("relationship-cache")
+
+_DEFAULT_STATE = {"affinity_score": 0.0, "trust_level": "low", "intimacy_level": "low", "nicknames": ""}
+
+
+def _as_row(conversation_id: str, state: Dict[str, Any]) -> RelationshipRow:
+    return (
+        conversation_id,
+        state["affinity_score"],
+        state["trust_level"],
+        state["intimacy_level"],
+        state["nicknames"],
+        state["updated_at"],
+    )
+
+
+class RelationshipStateCache:
+    """Write-behind LRU cache of relationship_state rows.
+
+    Reads hit SQLite only on a miss; updates mark the entry dirty and are written
+    in one transaction per flush interval (and on shutdown). Dirty entries evicted
+    by the LRU bound are parked until the next flush, so no update is lost.
+    """
+
+    def __init__(self, max_entries: int, flush_interval_ms: int) -> None:
+        self._max_entries = max(max_entries, 1)
+        self._flush_interval = max(flush_interval_ms, 1) / 1000
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._dirty: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def dirty(self) -> int:
+        return len(self._dirty)
+
+    def get(self, conversation_id: str) -> Dict[str, Any]:
+        """Returns the state for a conversation, creating the default row (dirty) if none exists."""
+        with self._lock:
+            cached = self._entries.get(conversation_id) or self._dirty.get(conversation_id)
+            if cached is not None:
+                self._remember(conversation_id, cached)
+                return dict(cached)
+        row = get_relationship_state(conversation_id)
+        with self._lock:
+            # Another thread may have loaded or updated it while we were reading.
+            cached = self._entries.get(conversation_id) or self._dirty.get(conversation_id)
+            if cached is None:
+                if row is not None:
+                    cached = {key: row[key] for key in (*_DEFAULT_STATE, "updated_at")}
+                else:
+                    cached = dict(_DEFAULT_STATE, updated_at=datetime.utcnow().isoformat())
+                    self._dirty[conversation_id] = cached
+            self._remember(conversation_id, cached)
+            return dict(cached)
+
+    def update(self, conversation_id: str, **fields: Any) -> None:
+        """Applies field changes (or just bumps updated_at) and schedules the row for the next flush."""
+        state = self.get(conversation_id)
+        with self._lock:
+            cached = self._entries.get(conversation_id) or self._dirty.get(conversation_id) or state
+            cached.update(fields)
+            cached["updated_at"] = datetime.utcnow().isoformat()
+            self._dirty[conversation_id] = cached
+            self._remember(conversation_id, cached)
+        self._ensure_task()
+
+    def touch(self, conversation_id: str) -> None:
+        self.update(conversation_id)
+
+    def _remember(self, conversation_id: str, state: Dict[str, Any]) -> None:
+        self._entries[conversation_id] = state
+        self._entries.move_to_end(conversation_id)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def _flush_sync(self) -> int:
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            rows: List[RelationshipRow] = [_as_row(key, dict(state)) for key, state in dirty.items()]
+        if not rows:
+            return 0
+        try:
+            return upsert_relationship_states(rows)
+        except sqlite3.Error as exc:
+            logger.warning("relationship_flush_failed rows=%s error=%s", len(rows), exc)
+            with self._lock:
+                for key, state in dirty.items():
+                    self._dirty.setdefault(key, state)
+            return 0
+
+    async def flush(self) -> int:
+        return await asyncio.to_thread(self._flush_sync)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._dirty.clear()
+
+    def _ensure_task(self) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._task = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            await self.flush()
+
+
+relationship_cache = RelationshipStateCache(
+    settings.relationship_cache_max_entries,
+    settings.relationship_flush_interval_ms,
+)
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+import httpx
+
+from app.services.metrics import registry
+from shared.logging.logger import get_logger
+
+logger = get_logger("llm-resilience")
+
+_breaker_state_gauge = registry.gauge(
+    "llm_circuit_open",
+    "1 while the circuit breaker for an LLM backend is open or half-open, else 0.",
+)
+_hedge_counter = registry.counter("llm_hedged_requests_total", "Non-streaming LLM calls that sent a hedge request.")
+_retry_counter = registry.counter("llm_connect_retries_total", "Connect retries against LLM backends.")
+
+
+class LLMUnavailableError(Exception):
+    """The backend is unreachable or its circuit is open; callers should fail fast (503)."""
+
+
+def is_unavailable(exc: BaseException) -> bool:
+    """Failures that mean the backend could not serve the call, which callers report as 503 llm_unavailable."""
+    if isinstance(exc, (LLMUnavailableError, httpx.TimeoutException)):
+        return True
+    return isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code >= 500
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures; after `reset_seconds` lets one probe through."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float) -> None:
+        self.name = name
+        self._threshold = max(failure_threshold, 1)
+        self._reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+        self.state = self.CLOSED
+
+    def _set_state(self, state: str) -> None:
+        if state != self.state:
+            logger.info("circuit_state_changed backend=%s state=%s previous=%s", self.name, state, self.state)
+        self.state = state
+        _breaker_state_gauge.set(0 if state == self.CLOSED else 1, {"backend": self.name})
+
+    def check(self) -> None:
+        if self.state == self.CLOSED:
+            return
+        if self.state == self.OPEN and time.monotonic() - self._opened_at >= self._reset_seconds:
+            self._set_state(self.HALF_OPEN)
+        if self.state == self.HALF_OPEN:
+            now = time.monotonic()
+            # A probe that never reported back (cancelled caller) must not wedge the breaker.
+            if not self._probe_in_flight or now - self._probe_started >= self._reset_seconds:
+                self._probe_in_flight = True
+                self._probe_started = now
+                return
+        raise LLMUnavailableError(f"circuit open for {self.name}")
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._probe_in_flight = False
+        self._set_state(self.CLOSED)
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self._failures >= self._threshold:
+            self._opened_at = time.monotonic()
+            self._set_state(self.OPEN)
+
+
+def backoff_delay(attempt: int, base_seconds: float, cap_seconds: float = 5.0) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap_seconds, base_seconds * (2**attempt)))
+
+
+class LatencyWindow:
+    """Rolling window of successful call durations, used to pick the hedge delay."""
+
+    def __init__(self, size: int = 200) -> None:
+        self._samples: Deque[float] = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+async def hedged(call: Callable[[], Awaitable[Any]], delay: Optional[float], backend: str) -> Any:
+    """Runs `call`; if it has not finished after `delay` seconds, races a second copy and keeps the first success."""
+    if delay is None:
+        return await call()
+    primary = asyncio.create_task(call())
+    pending = {primary}
+    first_error: Optional[BaseException] = None
+    try:
+        done, pending = await asyncio.wait(pending, timeout=delay)
+        if done:
+            return primary.result()
+        _hedge_counter.inc(labels={"backend": backend})
+        pending.add(asyncio.create_task(call()))
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                first_error = first_error or task.exception()
+        assert first_error is not None
+        raise first_error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def breaker_for(backend: str, failure_threshold: int, reset_seconds: float) -> CircuitBreaker:
+    breaker = _breakers.get(backend)
+    if breaker is None:
+        breaker = CircuitBreaker(backend, failure_threshold, reset_seconds)
+        _breakers[backend] = breaker
+    return breaker
+
+
+def count_retry(backend: str) -> None:
+    _retry_counter.inc(labels={"backend": backend})
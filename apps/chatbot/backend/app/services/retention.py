@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import fcntl
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional, Tuple
+
+from app.db.archive import SegmentWriter, archive_codec, archive_conversation, archive_dir
+from app.db.sqlite import all_shard_connections, init_db
+from shared.config.settings import get_settings
+from shared.logging.logger import get_logger
+
+settings = get_settings()
+logger = get_logger("retention")
+
+
+@contextmanager
+def _job_lock() -> Iterator[bool]:
+    directory = archive_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    with (directory / ".retention.lock").open("w") as handle:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def find_idle_conversations(
+    conn: sqlite3.Connection,
+    idle_days: int,
+    limit: int,
+    now: Optional[datetime] = None,
+    after: str = "",
+) -> Tuple[List[str], Optional[str]]:
+    """Idle conversations among the next `limit` ids after `after`, plus the cursor for the next window.
+
+    Each window walks the (conversation_id, id) index and looks up one row per
+    conversation, so a full pass costs one index scan however many batches it takes.
+    """
+    cutoff = ((now or datetime.utcnow()) - timedelta(days=idle_days)).isoformat()
+    rows = conn.execute(
+        """
+        SELECT latest.conversation_id, messages.created_at
+        FROM (
+            SELECT conversation_id, MAX(id) AS last_id
+            FROM messages
+            WHERE conversation_id > ?
+            GROUP BY conversation_id
+            ORDER BY conversation_id
+            LIMIT ?
+        ) AS latest
+        JOIN messages ON messages.id = latest.last_id
+        ORDER BY latest.conversation_id
+        """,
+        (after, limit),
+    ).fetchall()
+    if not rows:
+        return [], None
+    idle = [row["conversation_id"] for row in rows if row["created_at"] < cutoff]
+    return idle, rows[-1]["conversation_id"]
+
+
+def run_retention(
+    idle_days: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    max_batches: int = 0,
+    now: Optional[datetime] = None,
+) -> int:
+    idle_days = settings.archive_idle_days if idle_days is None else idle_days
+    batch_size = batch_size or settings.archive_batch_size
+    if idle_days <= 0:
+        return 0
+
+    with _job_lock() as acquired:
+        if not acquired:
+            logger.info("retention_skipped reason=locked")
+            return 0
+        writer = SegmentWriter(archive_dir(), archive_codec(), settings.archive_segment_max_mb * 1024 * 1024)
+        archived_conversations = 0
+        archived_messages = 0
+        batches = 0
+        # Shards are drained one after another; `max_batches` bounds the whole run, not each shard.
+        for _, conn in all_shard_connections():
+            cursor: Optional[str] = ""
+            while cursor is not None and not (max_batches and batches >= max_batches):
+                conversation_ids, cursor = find_idle_conversations(conn, idle_days, batch_size, now, cursor)
+                if not conversation_ids:
+                    continue
+                for conversation_id in conversation_ids:
+                    archived_messages += archive_conversation(conn, writer, conversation_id)
+                archived_conversations += len(conversation_ids)
+                conn.execute(f"PRAGMA incremental_vacuum({settings.archive_vacuum_pages})")
+                batches += 1
+
+        logger.info(
+            "retention_done conversations=%s messages=%s batches=%s",
+            archived_conversations,
+            archived_messages,
+            batches,
+        )
+        return archived_conversations
+
+
+async def retention_loop() -> None:
+    while True:
+        try:
+            await asyncio.to_thread(run_retention, max_batches=settings.archive_max_batches_per_run)
+        except Exception as exc:  # keep the loop alive; the next run retries
+            logger.warning("retention_failed error=%s", exc)
+        await asyncio.sleep(settings.archive_interval_seconds)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Archive idle conversations into compressed segment files.")
+    parser.add_argument("--idle-days", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--max-batches", type=int, default=0)
+    args = parser.parse_args()
+    init_db()
+    archived = run_retention(args.idle_days, args.batch_size, args.max_batches)
+    print(f"archived {archived} conversations")
+
+
+if __name__ == "__main__":
+    main()
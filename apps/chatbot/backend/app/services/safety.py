@@ -5,8 +5,7 @@ from dataclasses import dataclass
 from enum import Enum
 from typing import Optional
 
-from app.services.persona_loader import load_default_persona
-from app.safety.policy import refusal_message
+from app.services.persona_loader import CompiledPersona, persona_registry
 
 
 class ModerationState(str, Enum):
@@ -42,60 +41,71 @@ _VIOLENCE_PATTERN = r"\b(rape|sexual assault)\b"
 _ADULT_AGE_PATTERN = r"\b(18|19|2[0-9]|3[0-9]|4[0-9]|5[0-9]|6[0-9]|7[0-9]|8[0-9]|9[0-9])\b"
 
 
+_COMPILED: dict[str, re.Pattern[str]] = {
+    pattern: re.compile(pattern, re.IGNORECASE | re.DOTALL)
+    for pattern in (_MINORS_EXPLICIT_PATTERN, _AMBIGUOUS_AGE_PATTERN, _COERCION_PATTERN, _VIOLENCE_PATTERN)
+}
+_ADULT_AGE_RE = re.compile(_ADULT_AGE_PATTERN, re.IGNORECASE)
+
+
 def _has_explicit_adult_age(text: str) -> bool:
-    lowered = text.lower()
-    return re.search(_ADULT_AGE_PATTERN, lowered, re.IGNORECASE) is not None
+    return _ADULT_AGE_RE.search(text) is not None
 
 
 def _matches_pattern(pattern: str, text: str) -> bool:
-    lowered = text.lower()
-    return re.search(pattern, lowered, re.IGNORECASE | re.DOTALL) is not None
+    compiled = _COMPILED.get(pattern) or re.compile(pattern, re.IGNORECASE | re.DOTALL)
+    return compiled.search(text.lower()) is not None
 
 
 def _matches_any(patterns: list[str], text: str) -> bool:
     return any(_matches_pattern(pattern, text) for pattern in patterns)
 
 
-def validate_content(text: str, enabled: bool = True, stage: str = "pre-llm") -> SafetyResult:
+def _refusal(persona: Optional[CompiledPersona]) -> str:
+    return (persona or persona_registry.default()).refusal
+
+
+def validate_content(
+    text: str,
+    enabled: bool = True,
+    stage: str = "pre-llm",
+    persona: Optional[CompiledPersona] = None,
+) -> SafetyResult:
     if not enabled:
         return SafetyResult(state=ModerationState.ALLOW, reason="safety_disabled", category=None)
 
     if _matches_pattern(_MINORS_EXPLICIT_PATTERN, text):
         if not _has_explicit_adult_age(text):
-            persona = load_default_persona()
             return SafetyResult(
                 state=ModerationState.REFUSE_HARD,
                 reason="illegal_or_exploitative_sexual_content",
                 category="minors",
-                refusal=refusal_message(persona),
+                refusal=_refusal(persona),
             )
 
     if _matches_pattern(_AMBIGUOUS_AGE_PATTERN, text):
         if not _has_explicit_adult_age(text):
-            persona = load_default_persona()
             return SafetyResult(
                 state=ModerationState.REFUSE_HARD,
                 reason="illegal_or_exploitative_sexual_content",
                 category="minors",
-                refusal=refusal_message(persona),
+                refusal=_refusal(persona),
             )
 
     if _matches_pattern(_COERCION_PATTERN, text):
-        persona = load_default_persona()
         return SafetyResult(
             state=ModerationState.REFUSE_HARD,
             reason="illegal_or_exploitative_sexual_content",
             category="coercion_or_trafficking",
-            refusal=refusal_message(persona),
+            refusal=_refusal(persona),
         )
 
     if _matches_pattern(_VIOLENCE_PATTERN, text):
-        persona = load_default_persona()
         return SafetyResult(
             state=ModerationState.REFUSE_HARD,
             reason="illegal_or_exploitative_sexual_content",
             category="sexual_violence",
-            refusal=refusal_message(persona),
+            refusal=_refusal(persona),
         )
 
     return SafetyResult(state=ModerationState.ALLOW, reason="allowed", category=None)
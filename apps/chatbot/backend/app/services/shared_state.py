@@ -0,0 +1,384 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Protocol
+from urllib.parse import urlparse
+from uuid import uuid4
+
+from shared.config.settings import get_settings
+from shared.logging.logger import get_logger
+
+settings = get_settings()
+logger = get_logger("shared-state")
+
+
+class SharedStateError(Exception):
+    pass
+
+
+class SharedStateBackend(Protocol):
+    async def hit(self, key: str, window_seconds: int, limit: int) -> bool:
+        ...
+
+    async def acquire_slot(self, name: str, limit: int, ttl_seconds: float) -> Optional[str]:
+        ...
+
+    async def renew_slot(self, name: str, token: str, ttl_seconds: float) -> None:
+        ...
+
+    async def release_slot(self, name: str, token: str) -> None:
+        ...
+
+
+class SqliteSharedState:
+    """Shares counters between worker processes on one host through a small SQLite file."""
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+        self._local = threading.local()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        with conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS rate_hits (key TEXT NOT NULL, ts REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_rate_hits_key_ts ON rate_hits (key, ts)")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS slot_leases (
+                    name TEXT NOT NULL,
+                    token TEXT PRIMARY KEY,
+                    expires_at REAL NOT NULL
+                )
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        """This thread's connection; the to_thread pool reuses a handful of threads, so these stay few."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _fail(conn: sqlite3.Connection, exc: sqlite3.Error) -> SharedStateError:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        return SharedStateError(str(exc))
+
+    def _hit(self, key: str, window_seconds: int, limit: int) -> bool:
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM rate_hits WHERE key = ? AND ts <= ?", (key, now - window_seconds))
+            count = conn.execute("SELECT COUNT(*) FROM rate_hits WHERE key = ?", (key,)).fetchone()[0]
+            allowed = count < limit
+            if allowed:
+                conn.execute("INSERT INTO rate_hits (key, ts) VALUES (?, ?)", (key, now))
+            conn.execute("COMMIT")
+            return allowed
+        except sqlite3.Error as exc:
+            raise self._fail(conn, exc) from exc
+
+    def _acquire(self, name: str, limit: int, ttl_seconds: float) -> Optional[str]:
+        now = time.time()
+        token = uuid4().hex
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM slot_leases WHERE name = ? AND expires_at <= ?", (name, now))
+            count = conn.execute("SELECT COUNT(*) FROM slot_leases WHERE name = ?", (name,)).fetchone()[0]
+            acquired = count < limit
+            if acquired:
+                conn.execute(
+                    "INSERT INTO slot_leases (name, token, expires_at) VALUES (?, ?, ?)",
+                    (name, token, now + ttl_seconds),
+                )
+            conn.execute("COMMIT")
+            return token if acquired else None
+        except sqlite3.Error as exc:
+            raise self._fail(conn, exc) from exc
+
+    def _execute(self, sql: str, params: tuple) -> None:
+        conn = self._connect()
+        try:
+            conn.execute(sql, params)
+        except sqlite3.Error as exc:
+            raise self._fail(conn, exc) from exc
+
+    async def hit(self, key: str, window_seconds: int, limit: int) -> bool:
+        return await asyncio.to_thread(self._hit, key, window_seconds, limit)
+
+    async def acquire_slot(self, name: str, limit: int, ttl_seconds: float) -> Optional[str]:
+        return await asyncio.to_thread(self._acquire, name, limit, ttl_seconds)
+
+    async def renew_slot(self, name: str, token: str, ttl_seconds: float) -> None:
+        now = time.time()
+        # Only a live lease is extended: an expired one may already have been handed to another worker.
+        await asyncio.to_thread(
+            self._execute,
+            "UPDATE slot_leases SET expires_at = ? WHERE token = ? AND expires_at > ?",
+            (now + ttl_seconds, token, now),
+        )
+
+    async def release_slot(self, name: str, token: str) -> None:
+        await asyncio.to_thread(self._execute, "DELETE FROM slot_leases WHERE token = ?", (token,))
+
+
+# Slot leases live in one sorted set per budget: member = lease token, score = expiry in ms.
+# Each script runs atomically on the server, so admission is a single round trip.
+ACQUIRE_SLOT_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[3]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], tonumber(ARGV[1]) + tonumber(ARGV[2]), ARGV[4])
+redis.call('PEXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+RENEW_SLOT_SCRIPT = """
+local expires = redis.call('ZSCORE', KEYS[1], ARGV[3])
+if not expires or tonumber(expires) <= tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], tonumber(ARGV[1]) + tonumber(ARGV[2]), ARGV[3])
+redis.call('PEXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+
+class _RespConnection:
+    """One RESP2 connection; used by a single caller at a time (see `RespClient`)."""
+
+    def __init__(self, host: str, port: int, password: Optional[str], db: int, timeout: float) -> None:
+        self._host = host
+        self._port = port
+        self._password = password
+        self._db = db
+        self._timeout = timeout
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+
+    async def _connect(self) -> None:
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self._host, self._port), self._timeout
+        )
+        if self._password:
+            await self._send("AUTH", self._password)
+        if self._db:
+            await self._send("SELECT", str(self._db))
+
+    async def _send(self, *args: str):
+        assert self._writer is not None and self._reader is not None
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            encoded = arg.encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(encoded), encoded))
+        self._writer.write(b"".join(parts))
+        await self._writer.drain()
+        return await asyncio.wait_for(self._read_reply(), self._timeout)
+
+    async def _read_reply(self):
+        assert self._reader is not None
+        line = await self._reader.readline()
+        if not line:
+            raise ConnectionError("connection closed")
+        prefix, body = line[:1], line[1:-2]
+        if prefix == b"+":
+            return body.decode()
+        if prefix == b"-":
+            raise SharedStateError(body.decode())
+        if prefix == b":":
+            return int(body)
+        if prefix == b"$":
+            length = int(body)
+            if length < 0:
+                return None
+            data = await self._reader.readexactly(length + 2)
+            return data[:-2].decode("utf-8")
+        if prefix == b"*":
+            count = int(body)
+            if count < 0:
+                return None
+            return [await self._read_reply() for _ in range(count)]
+        raise SharedStateError(f"unexpected reply {line!r}")
+
+    async def execute(self, *args: str):
+        for attempt in range(2):
+            try:
+                if self._writer is None:
+                    await self._connect()
+                return await self._send(*args)
+            except (ConnectionError, OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as exc:
+                self.close()
+                if attempt:
+                    raise SharedStateError(f"redis unavailable: {exc}") from exc
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = None
+        self._writer = None
+
+
+class RespClient:
+    """Minimal RESP2 client over a small pool of connections (opened lazily)."""
+
+    def __init__(self, url: str, timeout: float = 2.0, pool_size: int = 4) -> None:
+        parsed = urlparse(url)
+        self._pool: asyncio.LifoQueue[_RespConnection] = asyncio.LifoQueue()
+        for _ in range(max(pool_size, 1)):
+            self._pool.put_nowait(
+                _RespConnection(
+                    parsed.hostname or "localhost",
+                    parsed.port or 6379,
+                    parsed.password,
+                    int(parsed.path.lstrip("/") or 0),
+                    timeout,
+                )
+            )
+        self._script_shas: Dict[str, str] = {}
+
+    async def execute(self, *args: str):
+        connection = await self._pool.get()
+        try:
+            return await connection.execute(*args)
+        except asyncio.CancelledError:
+            # A reply may still be in flight; the next caller must not read it as its own.
+            connection.close()
+            raise
+        finally:
+            self._pool.put_nowait(connection)
+
+    async def run_script(self, script: str, keys: List[str], args: List[str]):
+        """EVALSHA, falling back to EVAL (which also caches the script server-side) on NOSCRIPT."""
+        sha = self._script_shas.get(script)
+        if sha is None:
+            sha = self._script_shas[script] = hashlib.sha1(script.encode("utf-8")).hexdigest()
+        try:
+            return await self.execute("EVALSHA", sha, str(len(keys)), *keys, *args)
+        except SharedStateError as exc:
+            if not str(exc).startswith("NOSCRIPT"):
+                raise
+        return await self.execute("EVAL", script, str(len(keys)), *keys, *args)
+
+
+class RedisSharedState:
+    """Redis-protocol backend; rate limits use INCR/DECR/EXPIRE/GET, slot leases two small Lua scripts and ZREM."""
+
+    def __init__(self, url: str, prefix: str = "shadowstax", pool_size: int = 4) -> None:
+        self._client = RespClient(url, pool_size=pool_size)
+        self._prefix = prefix
+
+    async def hit(self, key: str, window_seconds: int, limit: int) -> bool:
+        # Sliding window approximated from the current and previous fixed buckets.
+        now = time.time()
+        bucket = int(now // window_seconds)
+        elapsed = (now % window_seconds) / window_seconds
+        current_key = f"{self._prefix}:rl:{key}:{bucket}"
+        previous = await self._client.execute("GET", f"{self._prefix}:rl:{key}:{bucket - 1}")
+        current = await self._client.execute("INCR", current_key)
+        if current == 1:
+            await self._client.execute("EXPIRE", current_key, str(window_seconds * 2))
+        estimate = int(previous or 0) * (1 - elapsed) + current
+        if estimate > limit:
+            await self._client.execute("DECR", current_key)
+            return False
+        return True
+
+    def _slots_key(self, name: str) -> str:
+        return f"{self._prefix}:slots:{name}"
+
+    async def acquire_slot(self, name: str, limit: int, ttl_seconds: float) -> Optional[str]:
+        token = uuid4().hex
+        args = [str(int(time.time() * 1000)), str(int(ttl_seconds * 1000)), str(limit), token]
+        acquired = await self._client.run_script(ACQUIRE_SLOT_SCRIPT, [self._slots_key(name)], args)
+        return token if acquired == 1 else None
+
+    async def renew_slot(self, name: str, token: str, ttl_seconds: float) -> None:
+        args = [str(int(time.time() * 1000)), str(int(ttl_seconds * 1000)), token]
+        await self._client.run_script(RENEW_SLOT_SCRIPT, [self._slots_key(name)], args)
+
+    async def release_slot(self, name: str, token: str) -> None:
+        # Tokens are unique members, so ZREM is already a compare-and-delete.
+        await self._client.execute("ZREM", self._slots_key(name), token)
+
+
+class GlobalConcurrencyBudget:
+    """Leases one of `limit` slots shared by every worker; leases expire if a worker dies."""
+
+    def __init__(self, backend: SharedStateBackend, name: str, limit: int, ttl_seconds: float) -> None:
+        self._backend = backend
+        self._name = name
+        self._limit = limit
+        self._ttl = ttl_seconds
+
+    async def _heartbeat(self, token: str) -> None:
+        while True:
+            await asyncio.sleep(self._ttl / 3)
+            try:
+                await self._backend.renew_slot(self._name, token, self._ttl)
+            except SharedStateError as exc:
+                logger.warning("budget_renew_failed name=%s error=%s", self._name, exc)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        delay = 0.01
+        token: Optional[str] = None
+        while True:
+            try:
+                token = await self._backend.acquire_slot(self._name, self._limit, self._ttl)
+            except SharedStateError as exc:
+                logger.warning("budget_unavailable name=%s error=%s", self._name, exc)
+                break
+            if token is not None:
+                break
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.2)
+
+        if token is None:
+            yield
+            return
+        heartbeat = asyncio.create_task(self._heartbeat(token))
+        try:
+            yield
+        finally:
+            heartbeat.cancel()
+            try:
+                await self._backend.release_slot(self._name, token)
+            except SharedStateError as exc:
+                logger.warning("budget_release_failed name=%s error=%s", self._name, exc)
+
+
+def _default_state_path() -> Path:
+    if settings.shared_state_path:
+        return Path(settings.shared_state_path)
+    return Path(__file__).resolve().parents[2] / "data" / "shared_state.db"
+
+
+def build_shared_state_backend(kind: str | None = None) -> SharedStateBackend | None:
+    """None for `memory` (the default): callers keep their process-local limiter and skip the global budget."""
+    kind = (kind or settings.shared_state_backend).lower()
+    if kind == "sqlite":
+        return SqliteSharedState(_default_state_path())
+    if kind == "redis":
+        return RedisSharedState(settings.shared_state_url, pool_size=settings.shared_state_pool_size)
+    if kind not in ("", "memory"):
+        logger.warning("shared_state_backend_unknown backend=%s", kind)
+    return None
+
+
+def build_llm_budget(backend: SharedStateBackend | None) -> GlobalConcurrencyBudget | None:
+    if backend is None:
+        return None
+    limit = settings.llm_global_concurrency_limit or settings.llm_concurrency_limit
+    return GlobalConcurrencyBudget(backend, "llm", limit, ttl_seconds=float(settings.llm_request_timeout_seconds))
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from typing import AsyncGenerator, AsyncIterator, Deque, Optional, Tuple
+
+from app.services.json_codec import dumps_str
+from app.services.metrics import registry
+from shared.logging.logger import get_logger
+
+logger = get_logger("stream-buffer")
+
+POLICIES = ("coalesce", "drop", "disconnect")
+
+_occupancy_gauge = registry.gauge(
+    "chat_stream_buffer_frames", "Frames buffered between the upstream stream and SSE clients, across all streams."
+)
+_active_gauge = registry.gauge("chat_stream_buffers_active", "SSE responses currently draining a stream buffer.")
+_overflows = registry.counter(
+    "chat_stream_buffer_overflows_total", "Delta frames that arrived at a full stream buffer, by slow-client policy."
+)
+
+_buffered_frames = 0
+_active_buffers = 0
+
+
+def _track(frames: int = 0, buffers: int = 0) -> None:
+    global _buffered_frames, _active_buffers
+    _buffered_frames += frames
+    _active_buffers += buffers
+    _occupancy_gauge.set(_buffered_frames)
+    _active_gauge.set(_active_buffers)
+
+
+def _split_delta(frame: str) -> Optional[Tuple[str, str]]:
+    """(`id:` line or "", text) for a plain `data:` frame; None for events, which are never merged or dropped."""
+    head = ""
+    if frame.startswith("id: "):
+        newline = frame.find("\n")
+        if newline < 0:
+            return None
+        head, frame = frame[: newline + 1], frame[newline + 1 :]
+    if not frame.startswith("data: ") or not frame.endswith("\n\n"):
+        return None
+    return head, frame[6:-2]
+
+
+class StreamBuffer:
+    """Decouples an SSE body from the client that reads it.
+
+    A reader task pulls `source` at the backend's pace into a bounded deque and
+    the response drains it at the client's pace, so a slow client no longer
+    holds the upstream connection (and its LLM slot) open. When the deque is
+    full, delta frames are handled by `policy`:
+
+    - `coalesce` merges the delta into the last buffered one (one bigger write);
+    - `drop` discards it, so the client sees a gap in the text;
+    - `disconnect` drops the buffered deltas and ends the response with a
+      `slow_client` error frame carrying the last SSE id the client received,
+      which is where a resumable stream picks up again.
+
+    Event frames (meta, blocked, error, done) are always kept.
+    """
+
+    def __init__(self, source: AsyncIterator[str], max_frames: int, policy: str = "coalesce") -> None:
+        if policy not in POLICIES:
+            logger.warning("stream_buffer_unknown_policy policy=%s fallback=coalesce", policy)
+            policy = "coalesce"
+        self.policy = policy
+        self.high_water = 0
+        self._source = source
+        self._max_frames = max(max_frames, 1)
+        self._frames: Deque[str] = deque()
+        self._ready = asyncio.Event()
+        self._finished = False
+        self._overflowed = False
+        self._closed = False
+        self._last_event_id: Optional[str] = None
+        self._reader: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def _put(self, frame: str) -> None:
+        if self._closed or self._overflowed:
+            return
+        if len(self._frames) >= self._max_frames:
+            delta = _split_delta(frame)
+            if delta is not None:
+                _overflows.inc(labels={"policy": self.policy})
+                if self.policy == "drop":
+                    return
+                if self.policy == "disconnect":
+                    logger.info("stream_buffer_slow_client buffered=%s", len(self._frames))
+                    self._overflowed = True
+                    events = deque(pending for pending in self._frames if _split_delta(pending) is None)
+                    _track(frames=len(events) - len(self._frames))
+                    self._frames = events
+                    self._ready.set()
+                    return
+                previous = _split_delta(self._frames[-1])
+                if previous is not None:
+                    # The merged frame takes the newer SSE id: a resume after it must skip both deltas.
+                    self._frames[-1] = f"{delta[0] or previous[0]}data: {previous[1]}{delta[1]}\n\n"
+                    return
+        self._frames.append(frame)
+        _track(frames=1)
+        self.high_water = max(self.high_water, len(self._frames))
+        self._ready.set()
+
+    async def _read(self) -> None:
+        try:
+            async for frame in self._source:
+                self._put(frame)
+        except Exception as exc:
+            logger.warning("stream_buffer_source_failed error=%s", exc)
+        finally:
+            self._finished = True
+            self._ready.set()
+
+    async def drain(self) -> AsyncGenerator[str, None]:
+        self._reader = asyncio.create_task(self._read())
+        _track(buffers=1)
+        try:
+            while True:
+                await self._ready.wait()
+                while self._frames:
+                    frame = self._frames.popleft()
+                    _track(frames=-1)
+                    if frame.startswith("id: "):
+                        self._last_event_id = frame[4 : frame.find("\n")]
+                    yield frame
+                if self._overflowed:
+                    payload = dumps_str({"error": "slow_client", "last_event_id": self._last_event_id})
+                    yield f"event: error\ndata: {payload}\n\n"
+                    return
+                if self._finished:
+                    return
+                self._ready.clear()
+        finally:
+            # The client is gone or done: the upstream stops the same way it would on a direct disconnect.
+            self._closed = True
+            _track(frames=-len(self._frames), buffers=-1)
+            self._frames.clear()
+            if not self._reader.done():
+                self._reader.cancel()
+
+
+def buffered(source: AsyncIterator[str], max_frames: int, policy: str = "coalesce") -> AsyncGenerator[str, None]:
+    return StreamBuffer(source, max_frames, policy).drain()
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import AsyncGenerator, AsyncIterator, Deque, Optional, Tuple
+
+from app.services.metrics import registry
+from shared.logging.logger import get_logger
+
+logger = get_logger("stream-resume")
+
+_resumes = registry.counter("chat_stream_resumes_total", "GET reconnects that resumed a streaming generation.")
+
+
+class ResumeGapError(Exception):
+    """The frames after the client's Last-Event-ID have already left the ring buffer."""
+
+
+def parse_last_event_id(value: Optional[str]) -> int:
+    """Accepts `<generation_id>:<seq>` or a bare sequence number; anything else replays from the start."""
+    if not value:
+        return -1
+    try:
+        return int(value.rsplit(":", 1)[-1])
+    except ValueError:
+        return -1
+
+
+class StreamGeneration:
+    """One streaming generation, pumped independently of the client that started it.
+
+    Frames get SSE ids `<generation_id>:<seq>` and are kept in a bounded ring
+    buffer, so a reconnecting client can replay what it missed and then follow
+    the live output.
+    """
+
+    def __init__(self, generation_id: str, user_id: int, max_frames: int) -> None:
+        self.generation_id = generation_id
+        self.user_id = user_id
+        self.completed_at: Optional[float] = None
+        self._frames: Deque[Tuple[int, str]] = deque(maxlen=max(max_frames, 1))
+        self._next_seq = 0
+        self._done = False
+        self._changed = asyncio.Condition()
+        self._pump: Optional[asyncio.Task] = None
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def start(self, body: AsyncIterator[str]) -> None:
+        self._pump = asyncio.create_task(self._run_pump(body))
+
+    def cancel(self) -> None:
+        if self._pump is not None and not self._pump.done():
+            self._pump.cancel()
+
+    async def _run_pump(self, body: AsyncIterator[str]) -> None:
+        try:
+            async for frame in body:
+                async with self._changed:
+                    seq = self._next_seq
+                    self._next_seq += 1
+                    self._frames.append((seq, f"id: {self.generation_id}:{seq}\n{frame}"))
+                    self._changed.notify_all()
+        except Exception as exc:
+            logger.warning("stream_generation_failed generation_id=%s error=%s", self.generation_id, exc)
+        finally:
+            async with self._changed:
+                self._done = True
+                self.completed_at = time.monotonic()
+                self._changed.notify_all()
+
+    def check_resumable(self, last_seq: int) -> None:
+        if self._frames and last_seq + 1 < self._frames[0][0]:
+            raise ResumeGapError(self.generation_id)
+
+    async def follow(self, last_seq: int = -1) -> AsyncGenerator[str, None]:
+        """Yields frames after `last_seq`, then live frames until the generation ends."""
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: self._next_seq > last_seq + 1 or self._done)
+                if self._frames and last_seq + 1 < self._frames[0][0]:
+                    # This reader fell further behind than the ring buffer holds.
+                    yield 'event: error\ndata: {"error": "resume_gap"}\n\n'
+                    return
+                batch = [frame for seq, frame in self._frames if seq > last_seq]
+                finished = self._done and self._next_seq == last_seq + 1 + len(batch)
+            for frame in batch:
+                yield frame
+            last_seq += len(batch)
+            if finished:
+                return
+
+
+class StreamRegistry:
+    """Live and recently finished generations in this process; finished ones are kept for `grace_seconds`.
+
+    Nothing is shared between workers, so a resume has to reach the worker that
+    started the stream (sticky routing when running several).
+    """
+
+    def __init__(self, grace_seconds: float, max_frames: int, max_generations: int) -> None:
+        self._grace_seconds = grace_seconds
+        self._max_frames = max_frames
+        self._max_generations = max(max_generations, 1)
+        self._generations: "OrderedDict[str, StreamGeneration]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self._grace_seconds > 0
+
+    def __len__(self) -> int:
+        return len(self._generations)
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        expired = [
+            key
+            for key, generation in self._generations.items()
+            if generation.completed_at is not None and now - generation.completed_at > self._grace_seconds
+        ]
+        for key in expired:
+            del self._generations[key]
+        while len(self._generations) >= self._max_generations:
+            key, generation = next(iter(self._generations.items()))
+            if generation.completed_at is None:
+                break
+            del self._generations[key]
+
+    def start(self, generation_id: str, user_id: int, body: AsyncIterator[str]) -> StreamGeneration:
+        self._evict()
+        generation = StreamGeneration(generation_id, user_id, self._max_frames)
+        self._generations[generation_id] = generation
+        generation.start(body)
+        return generation
+
+    def resume(self, generation_id: str, user_id: int, last_seq: int) -> Optional[StreamGeneration]:
+        """Returns the generation if it still exists and belongs to `user_id`; raises on a replay gap."""
+        self._evict()
+        generation = self._generations.get(generation_id)
+        if generation is None or generation.user_id != user_id:
+            return None
+        generation.check_resumable(last_seq)
+        _resumes.inc()
+        logger.info("stream_resumed generation_id=%s last_seq=%s", generation_id, last_seq)
+        return generation
+
+    async def stop(self) -> None:
+        for generation in self._generations.values():
+            generation.cancel()
+        self._generations.clear()
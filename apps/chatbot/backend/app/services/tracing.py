@@ -0,0 +1,322 @@
+from __future__ import annotations
+
+import json
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Protocol
+from uuid import uuid4
+
+import httpx
+
+from shared.config.settings import get_settings
+from shared.logging.logger import get_logger
+
+settings = get_settings()
+logger = get_logger("tracing")
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start_ns: int
+    end_ns: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    def end(self, **attributes: Any) -> None:
+        if self.end_ns:
+            return
+        self.attributes.update(attributes)
+        self.end_ns = time.time_ns()
+
+    @property
+    def duration_ms(self) -> float:
+        return max(self.end_ns - self.start_ns, 0) / 1_000_000
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+        }
+
+
+class SpanExporter(Protocol):
+    def export(self, spans: List[Span]) -> None:
+        ...
+
+    def flush(self, timeout: float = 5.0) -> None:
+        ...
+
+
+def _join(pending: "queue.Queue[List[Span]]", timeout: float) -> None:
+    """queue.join() with a deadline, so a stuck collector cannot hold up shutdown."""
+    with pending.all_tasks_done:
+        pending.all_tasks_done.wait_for(lambda: not pending.unfinished_tasks, timeout)
+
+
+class JsonlSpanExporter:
+    """Appends spans to a JSONL file from a daemon thread, so finishing a trace never touches the disk."""
+
+    def __init__(self, path: Path, max_queue: int = 1000) -> None:
+        self._path = path
+        self._queue: "queue.Queue[List[Span]]" = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="jsonl-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, spans: List[Span]) -> None:
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            logger.warning("trace_export_dropped spans=%s", len(spans))
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """Blocks until every queued trace is on disk, or `timeout` passes."""
+        _join(self._queue, timeout)
+
+    def _run(self) -> None:
+        while True:
+            batches = [self._queue.get()]
+            # One open/write for whatever piled up while the last write ran.
+            while True:
+                try:
+                    batches.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                lines = "".join(json.dumps(span.to_dict()) + "\n" for spans in batches for span in spans)
+                self._path.parent.mkdir(parents=True, exist_ok=True)
+                with self._path.open("a", encoding="utf-8") as handle:
+                    handle.write(lines)
+            except (OSError, TypeError, ValueError) as exc:
+                logger.warning("trace_export_failed error=%s", exc)
+            finally:
+                for _ in batches:
+                    self._queue.task_done()
+
+
+class OtlpHttpSpanExporter:
+    """Posts spans as OTLP/HTTP JSON from a daemon thread so requests never wait on the collector."""
+
+    def __init__(self, endpoint: str, service_name: str = "chatbot-backend", max_queue: int = 1000) -> None:
+        self._endpoint = endpoint
+        self._service_name = service_name
+        self._queue: "queue.Queue[List[Span]]" = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="otlp-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, spans: List[Span]) -> None:
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            logger.warning("trace_export_dropped spans=%s", len(spans))
+
+    def flush(self, timeout: float = 5.0) -> None:
+        _join(self._queue, timeout)
+
+    def _run(self) -> None:
+        with httpx.Client(timeout=5.0) as client:
+            while True:
+                batch = self._queue.get()
+                try:
+                    client.post(self._endpoint, json=self.encode(batch))
+                except httpx.HTTPError as exc:
+                    logger.warning("trace_export_failed error=%s", exc)
+                finally:
+                    self._queue.task_done()
+
+    def encode(self, spans: List[Span]) -> Dict[str, Any]:
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {"key": "service.name", "value": {"stringValue": self._service_name}}
+                        ]
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "shadow-stax.chatbot"},
+                            "spans": [_otlp_span(span) for span in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+
+
+def _otlp_span(span: Span) -> Dict[str, Any]:
+    encoded: Dict[str, Any] = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": 1,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": [
+            {"key": key, "value": {"stringValue": str(value)}} for key, value in span.attributes.items()
+        ],
+    }
+    if span.parent_id:
+        encoded["parentSpanId"] = span.parent_id
+    return encoded
+
+
+def _new_span_id() -> str:
+    return uuid4().hex[:16]
+
+
+class Trace:
+    sampled = True
+
+    def __init__(self, name: str, exporter: SpanExporter, **attributes: Any) -> None:
+        self.trace_id = uuid4().hex
+        self._exporter = exporter
+        self._root = Span(
+            name=name,
+            trace_id=self.trace_id,
+            span_id=_new_span_id(),
+            parent_id=None,
+            start_ns=time.time_ns(),
+            attributes=dict(attributes),
+        )
+        self._spans: List[Span] = [self._root]
+        self._finished = False
+
+    def start_span(self, name: str, **attributes: Any) -> Span:
+        span = Span(
+            name=name,
+            trace_id=self.trace_id,
+            span_id=_new_span_id(),
+            parent_id=self._root.span_id,
+            start_ns=time.time_ns(),
+            attributes=dict(attributes),
+        )
+        self._spans.append(span)
+        return span
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        span = self.start_span(name, **attributes)
+        try:
+            yield span
+        except BaseException as exc:
+            span.end(error=type(exc).__name__)
+            raise
+        finally:
+            span.end()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self._root.attributes[key] = value
+
+    def headers(self) -> Dict[str, str]:
+        return {"traceparent": f"00-{self.trace_id}-{self._root.span_id}-01"}
+
+    def finish(self, **attributes: Any) -> None:
+        if self._finished:
+            return
+        self._finished = True
+        self._root.end(**attributes)
+        for span in self._spans:
+            span.end()
+        try:
+            self._exporter.export(self._spans)
+        except OSError as exc:
+            logger.warning("trace_export_failed error=%s", exc)
+
+
+class _NoopSpan:
+    def end(self, **attributes: Any) -> None:
+        return None
+
+
+class NoopTrace:
+    sampled = False
+    trace_id = ""
+
+    def start_span(self, name: str, **attributes: Any) -> _NoopSpan:
+        return _NOOP_SPAN
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[_NoopSpan]:
+        yield _NOOP_SPAN
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        return None
+
+    def headers(self) -> Dict[str, str]:
+        return {}
+
+    def finish(self, **attributes: Any) -> None:
+        return None
+
+
+_NOOP_SPAN = _NoopSpan()
+NOOP_TRACE = NoopTrace()
+
+_current_trace: ContextVar[Trace | NoopTrace] = ContextVar("current_trace", default=NOOP_TRACE)
+
+
+class Tracer:
+    def __init__(self, exporter: SpanExporter | None, sample_rate: float) -> None:
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    def start_trace(self, name: str, **attributes: Any) -> Trace | NoopTrace:
+        if self.exporter is None or self.sample_rate <= 0:
+            return NOOP_TRACE
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return NOOP_TRACE
+        return Trace(name, self.exporter, **attributes)
+
+    def flush(self, timeout: float = 5.0) -> None:
+        if self.exporter is not None:
+            self.exporter.flush(timeout)
+
+
+def _default_jsonl_path() -> Path:
+    if settings.trace_jsonl_path:
+        return Path(settings.trace_jsonl_path)
+    return Path(__file__).resolve().parents[2] / "data" / "traces.jsonl"
+
+
+def build_exporter(kind: str) -> SpanExporter | None:
+    kind = kind.lower()
+    if kind == "jsonl":
+        return JsonlSpanExporter(_default_jsonl_path())
+    if kind == "otlp":
+        return OtlpHttpSpanExporter(settings.trace_otlp_endpoint)
+    if kind not in ("", "none"):
+        logger.warning("trace_exporter_unknown exporter=%s", kind)
+    return None
+
+
+def activate_trace(trace: Trace | NoopTrace) -> Token:
+    return _current_trace.set(trace)
+
+
+def reset_trace(token: Token) -> None:
+    _current_trace.reset(token)
+
+
+def current_trace() -> Trace | NoopTrace:
+    return _current_trace.get()
+
+
+tracer = Tracer(
+    build_exporter(settings.trace_exporter) if settings.trace_sample_rate > 0 else None,
+    settings.trace_sample_rate,
+)
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from app.db.sqlite import ensure_db, get_connection
+from app.services.llm_client import LLMClient
+from app.services.memory_extractor import extract_memories
+from app.services.persona_loader import persona_registry
+from app.services.resilience import backoff_delay
+from app.services.safety import validate_content
+from shared.config.settings import get_settings
+from shared.logging.logger import get_logger
+
+settings = get_settings()
+logger = get_logger("warmup")
+
+
+@dataclass
+class WarmupState:
+    ready: bool = False
+    started_at: Optional[float] = None
+    steps: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"status": "ready" if self.ready else "warming", "steps": self.steps}
+
+
+def _warm_local() -> None:
+    """Pays the one-off costs of the first request: DB file and schema, regex and persona caches."""
+    ensure_db()
+    get_connection().execute("SELECT 1").fetchone()
+    persona_registry.default()
+    validate_content("warm up: my name is nobody and I like tea")
+    extract_memories("my name is nobody and I like tea")
+
+
+async def _timed(state: WarmupState, name: str, step) -> bool:
+    started = time.perf_counter()
+    try:
+        await step()
+    except Exception as exc:  # a failed step is reported, not raised
+        state.steps[name] = {"ok": False, "error": str(exc)}
+        return False
+    state.steps[name] = {"ok": True, "ms": round((time.perf_counter() - started) * 1000, 1)}
+    return True
+
+
+async def run_warmup(state: WarmupState, llm: LLMClient) -> None:
+    """Warms local caches, then preloads the LLM, retrying until WARMUP_TIMEOUT_SECONDS.
+
+    The pod is marked ready once local warm-up succeeded and either the model is
+    loaded or the deadline passed; a backend that stays down is reported by the
+    circuit breaker rather than by keeping every replica out of rotation.
+    """
+    state.started_at = time.monotonic()
+    if not await _timed(state, "local", lambda: asyncio.to_thread(_warm_local)):
+        logger.error("warmup_failed step=local error=%s", state.steps["local"]["error"])
+        return
+    deadline = state.started_at + settings.warmup_timeout_seconds
+    attempt = 0
+    while not await _timed(state, "llm_preload", llm.preload):
+        if time.monotonic() >= deadline:
+            logger.warning("warmup_llm_preload_gave_up error=%s", state.steps["llm_preload"]["error"])
+            break
+        await asyncio.sleep(min(backoff_delay(attempt, 0.5, cap_seconds=10.0), max(deadline - time.monotonic(), 0)))
+        attempt += 1
+    state.ready = True
+    logger.info("warmup_complete seconds=%.2f", time.monotonic() - state.started_at)
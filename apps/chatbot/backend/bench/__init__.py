@@ -0,0 +1 @@
+"""Benchmarking and load-generation tools for the chatbot backend."""
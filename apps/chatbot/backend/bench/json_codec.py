@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+from app.services import json_codec
+
+_WORDS = "i like you love the night coffee music slow mornings honest playful teasing 😏 tonight".split()
+
+
+def stream_lines(api_mode: str, tokens: int, seed: int = 7) -> List[bytes]:
+    """One upstream line per token, shaped like vLLM/OpenAI SSE or Ollama NDJSON chunks."""
+    rng = random.Random(seed)
+    lines = []
+    for index in range(tokens):
+        word = rng.choice(_WORDS) + " "
+        if api_mode == "ollama":
+            chunk = {
+                "model": "llama3.1:8b",
+                "created_at": "2026-01-01T00:00:00.000000Z",
+                "message": {"role": "assistant", "content": word},
+                "done": False,
+            }
+            lines.append(json.dumps(chunk).encode("utf-8"))
+        else:
+            chunk = {
+                "id": "chatcmpl-bench",
+                "object": "chat.completion.chunk",
+                "created": 1767225600,
+                "model": "bench",
+                "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}],
+            }
+            lines.append(b"data: " + json.dumps(chunk).encode("utf-8"))
+    return lines
+
+
+def _stdlib_path(api_mode: str) -> Callable[[bytes], str]:
+    # What the client did before: decode each line to str, copy it via replace(), parse with json.loads.
+    def parse(raw: bytes) -> str:
+        line = raw.decode("utf-8")
+        if api_mode == "ollama":
+            return json.loads(line).get("message", {}).get("content", "")
+        data = line.replace("data:", "", 1).strip()
+        return json.loads(data)["choices"][0].get("delta", {}).get("content", "")
+
+    return parse
+
+
+def _codec_path(api_mode: str) -> Callable[[bytes], str]:
+    def parse(line: bytes) -> str:
+        if api_mode == "ollama":
+            return json_codec.loads(line).get("message", {}).get("content", "")
+        return json_codec.loads(line[5:].strip())["choices"][0].get("delta", {}).get("content", "")
+
+    return parse
+
+
+def cpu_ns_per_token(parse: Callable[[bytes], str], lines: List[bytes], rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.process_time_ns()
+        for line in lines:
+            parse(line)
+        best = min(best, (time.process_time_ns() - started) / len(lines))
+    return best
+
+
+def run(tokens: int, rounds: int) -> Dict[str, Dict[str, float]]:
+    report: Dict[str, Dict[str, float]] = {}
+    for api_mode in ("openai", "ollama"):
+        lines = stream_lines(api_mode, tokens)
+        baseline = cpu_ns_per_token(_stdlib_path(api_mode), lines, rounds)
+        codec = cpu_ns_per_token(_codec_path(api_mode), lines, rounds)
+        report[api_mode] = {
+            "stdlib_us_per_token": round(baseline / 1000, 3),
+            "codec_us_per_token": round(codec / 1000, 3),
+            "saved_us_per_token": round((baseline - codec) / 1000, 3),
+            "saved_pct": round((baseline - codec) / baseline * 100, 1) if baseline else 0.0,
+        }
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="CPU per streamed token: stdlib json vs the app's JSON codec.")
+    parser.add_argument("--tokens", type=int, default=20_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print(f"codec backend: {json_codec.BACKEND}")
+    for api_mode, result in run(args.tokens, args.rounds).items():
+        print(
+            f"{api_mode:7s} stdlib {result['stdlib_us_per_token']:7.3f}us/token  "
+            f"codec {result['codec_us_per_token']:7.3f}us/token  "
+            f"saved {result['saved_us_per_token']:6.3f}us ({result['saved_pct']:.1f}%)"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
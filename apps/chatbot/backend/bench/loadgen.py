@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from dataclasses import Field, asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, ClassVar, Dict, List, Optional, Protocol
+from uuid import uuid4
+
+import httpx
+
+from bench.stats import summarize
+
+_PROMPTS = [
+    "Hello",
+    "How was your day?",
+    "Tell me something you like about late night conversations.",
+    "I love hiking and old movies. What do you like to do when you want to relax?",
+    "My name is Sam. I prefer slow mornings with coffee and music, and I hate rushing. "
+    "What would your perfect weekend look like if we spent it together?",
+]
+
+
+@dataclass
+class LoadConfig:
+    base_url: str = "http://localhost:8000"
+    requests: int = 200
+    concurrency: int = 16
+    stream_ratio: float = 0.5
+    users: int = 16
+    rate: float = 0.0
+    timeout: float = 120.0
+    token: Optional[str] = None
+    seed: int = 7
+
+
+class RunConfig(Protocol):
+    """Any run configuration dataclass `build_report` can record (everything but the token)."""
+
+    __dataclass_fields__: ClassVar[Dict[str, Field[Any]]]
+    token: Optional[str]
+
+
+@dataclass
+class RequestResult:
+    stream: bool
+    ok: bool
+    status: int
+    ttft_ms: float
+    total_ms: float
+    error: Optional[str] = None
+
+
+async def _register_token(client: httpx.AsyncClient) -> str:
+    username = f"loadgen-{uuid4().hex[:12]}"
+    response = await client.post("/auth/register", json={"username": username, "password": "loadgen-pass"})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def _run_one(client: httpx.AsyncClient, payload: Dict[str, Any], headers: Dict[str, str]) -> RequestResult:
+    stream = bool(payload["stream"])
+    started = time.perf_counter()
+    try:
+        if not stream:
+            response = await client.post("/chat", json=payload, headers=headers)
+            total_ms = (time.perf_counter() - started) * 1000
+            ok = response.status_code == 200
+            return RequestResult(stream, ok, response.status_code, total_ms, total_ms, None if ok else response.text[:200])
+
+        ttft_ms = 0.0
+        async with client.stream("POST", "/chat", json=payload, headers=headers) as response:
+            if response.status_code != 200:
+                body = (await response.aread()).decode("utf-8", "replace")
+                total_ms = (time.perf_counter() - started) * 1000
+                return RequestResult(stream, False, response.status_code, total_ms, total_ms, body[:200])
+            event_name = None
+            ok = False
+            async for line in response.aiter_lines():
+                if line.startswith("event:"):
+                    event_name = line[6:].strip()
+                elif line.startswith("data:"):
+                    if event_name is None and not ttft_ms:
+                        ttft_ms = (time.perf_counter() - started) * 1000
+                    if event_name == "done":
+                        ok = True
+                    elif event_name in ("blocked", "error"):
+                        ok = False
+                elif not line:
+                    event_name = None
+        total_ms = (time.perf_counter() - started) * 1000
+        return RequestResult(stream, ok, response.status_code, ttft_ms or total_ms, total_ms, None if ok else "stream_incomplete")
+    except httpx.HTTPError as exc:
+        total_ms = (time.perf_counter() - started) * 1000
+        return RequestResult(stream, False, 0, total_ms, total_ms, type(exc).__name__)
+
+
+async def run_load(config: LoadConfig) -> Dict[str, Any]:
+    rng = random.Random(config.seed)
+    limits = httpx.Limits(max_connections=config.concurrency, max_keepalive_connections=config.concurrency)
+    async with httpx.AsyncClient(base_url=config.base_url, timeout=config.timeout, limits=limits) as client:
+        token = config.token or await _register_token(client)
+        headers = {"Authorization": f"Bearer {token}"}
+        payloads = [
+            {
+                "user_id": f"loadgen-user-{index % max(config.users, 1)}",
+                "messages": [{"role": "user", "content": rng.choice(_PROMPTS)}],
+                "stream": rng.random() < config.stream_ratio,
+            }
+            for index in range(config.requests)
+        ]
+        semaphore = asyncio.Semaphore(config.concurrency)
+        results: List[RequestResult] = []
+
+        async def worker(index: int, payload: Dict[str, Any]) -> None:
+            if config.rate > 0:
+                await asyncio.sleep(index / config.rate)
+            async with semaphore:
+                results.append(await _run_one(client, payload, headers))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(index, payload) for index, payload in enumerate(payloads)))
+        duration = time.perf_counter() - started
+
+    return build_report(config, results, duration)
+
+
+def build_report(config: RunConfig, results: List[RequestResult], duration: float) -> Dict[str, Any]:
+    succeeded = [result for result in results if result.ok]
+    status_counts: Dict[str, int] = {}
+    for result in results:
+        status_counts[str(result.status)] = status_counts.get(str(result.status), 0) + 1
+
+    def _mode(stream: bool) -> Dict[str, Any]:
+        subset = [result for result in succeeded if result.stream == stream]
+        return {
+            "ttft_ms": summarize([result.ttft_ms for result in subset]),
+            "latency_ms": summarize([result.total_ms for result in subset]),
+        }
+
+    config_dict = asdict(config)
+    config_dict.pop("token", None)
+    return {
+        "recorded_at": datetime.utcnow().isoformat(),
+        "config": config_dict,
+        "duration_s": round(duration, 3),
+        "requests": len(results),
+        "succeeded": len(succeeded),
+        "errors": len(results) - len(succeeded),
+        "status_counts": status_counts,
+        "throughput_rps": round(len(succeeded) / duration, 3) if duration > 0 else 0.0,
+        "ttft_ms": summarize([result.ttft_ms for result in succeeded]),
+        "latency_ms": summarize([result.total_ms for result in succeeded]),
+        "stream": _mode(True),
+        "non_stream": _mode(False),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Drive /chat with concurrent streaming and non-streaming requests.")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--stream-ratio", type=float, default=0.5)
+    parser.add_argument("--users", type=int, default=16, help="Distinct user_id values, one rate-limit bucket each.")
+    parser.add_argument("--rate", type=float, default=0.0, help="Open-loop arrival rate in req/s (0 = closed loop).")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--token", default=None, help="Bearer token; a throwaway user is registered if omitted.")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", type=Path, default=None, help="Write the JSON report to this path.")
+    args = parser.parse_args()
+
+    config = LoadConfig(
+        base_url=args.base_url,
+        requests=args.requests,
+        concurrency=args.concurrency,
+        stream_ratio=args.stream_ratio,
+        users=args.users,
+        rate=args.rate,
+        timeout=args.timeout,
+        token=args.token,
+        seed=args.seed,
+    )
+    report = asyncio.run(run_load(config))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(text + "\n", encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+_DEFAULT_BASELINE = Path(__file__).resolve().parent / "results" / "micro_baseline.json"
+_WORDS = (
+    "i like you love hate prefer my name is sam the night coffee music slow mornings movies "
+    "we talk about dreams travel late honest playful teasing what are you wearing tonight"
+).split()
+
+
+@dataclass
+class Benchmark:
+    name: str
+    op: Callable[[int], Any] | None = None
+    async_op: Callable[[int], Awaitable[Any]] | None = None
+    inputs: int = 1
+
+
+def _text(rng: random.Random) -> str:
+    # Chat turns are mostly short with a long tail: ~70% under 30 words, a few up to 400.
+    bucket = rng.random()
+    if bucket < 0.7:
+        length = rng.randint(3, 30)
+    elif bucket < 0.95:
+        length = rng.randint(30, 120)
+    else:
+        length = rng.randint(120, 400)
+    return " ".join(rng.choice(_WORDS) for _ in range(length))
+
+
+def _history_length(rng: random.Random) -> int:
+    return min(int(rng.expovariate(1 / 12)), 80)
+
+
+def build_benchmarks(seed: int = 13) -> List[Benchmark]:
+    from app.db import sqlite as db
+    from app.llm.prompt_builder import build_prompt
+    from app.services.conversation_store import InMemoryConversationStore
+    from app.services.memory_extractor import extract_memories
+    from app.services.message_record import encode_chat_payload, to_records
+    from app.services.rate_limit import SlidingWindowRateLimiter
+    from app.services.safety import validate_content
+    from shared.schemas.chat import ChatMessage
+
+    rng = random.Random(seed)
+    texts = [_text(rng) for _ in range(512)]
+    histories = [
+        [
+            ChatMessage(role="user" if turn % 2 == 0 else "assistant", content=_text(rng))
+            for turn in range(_history_length(rng))
+        ]
+        for _ in range(64)
+    ]
+    record_histories = [to_records(history) for history in histories]
+    payload_fields = {"model": "bench", "stream": True, "options": {"temperature": 0.8}}
+    relationship = {"affinity_score": 0.2, "trust_level": "low", "intimacy_level": "low", "nicknames": ""}
+
+    limiter = SlidingWindowRateLimiter(max_per_minute=10**9, burst=0)
+    store = InMemoryConversationStore(ttl_seconds=3600)
+    store_keys = [(f"user-{index % 200}", f"conv-{index}") for index in range(1000)]
+
+    db.init_db()
+    conversation_ids = [f"bench-conv-{index}" for index in range(256)]
+    for conversation_id in conversation_ids:
+        db.create_conversation(conversation_id, None)
+        db.ensure_relationship_state(conversation_id)
+        db.upsert_summary(conversation_id, texts[0])
+        for text in texts[:8]:
+            db.insert_memory(conversation_id, "preference", text[:80], 0.5)
+    message_id = db.insert_message(conversation_ids[0], "assistant", texts[0], "bench", 0.8, "ALLOW")
+    db.create_user("bench-user", "hash")
+
+    def pick(items: List[Any], i: int) -> Any:
+        return items[i % len(items)]
+
+    async def limiter_allow(i: int) -> None:
+        await limiter.allow(f"user-{i % 500}")
+
+    async def store_upsert(i: int) -> None:
+        user_key, conversation_id = pick(store_keys, i)
+        await store.upsert(user_key, conversation_id, pick(histories, i))
+
+    async def store_get(i: int) -> None:
+        user_key, conversation_id = pick(store_keys, i)
+        await store.get(user_key, conversation_id)
+
+    return [
+        Benchmark("safety.validate_content", op=lambda i: validate_content(pick(texts, i))),
+        Benchmark("memory.extract_memories", op=lambda i: extract_memories(pick(texts, i))),
+        Benchmark(
+            "prompt.build_prompt",
+            op=lambda i: build_prompt(pick(histories, i), relationship, texts[1], pick(texts, i)),
+        ),
+        Benchmark(
+            "llm.encode_chat_payload",
+            op=lambda i: encode_chat_payload(payload_fields, pick(record_histories, i)),
+        ),
+        Benchmark("rate_limit.allow", async_op=limiter_allow),
+        Benchmark("store.upsert", async_op=store_upsert),
+        Benchmark("store.get", async_op=store_get),
+        Benchmark("db.create_conversation", op=lambda i: db.create_conversation(pick(conversation_ids, i), None)),
+        Benchmark(
+            "db.insert_message",
+            op=lambda i: db.insert_message(pick(conversation_ids, i), "user", pick(texts, i), None, None, "ALLOW"),
+        ),
+        Benchmark("db.insert_memory", op=lambda i: db.insert_memory(pick(conversation_ids, i), "profile", "sam", 0.6)),
+        Benchmark("db.upsert_summary", op=lambda i: db.upsert_summary(pick(conversation_ids, i), pick(texts, i))),
+        Benchmark("db.get_summary", op=lambda i: db.get_summary(pick(conversation_ids, i))),
+        Benchmark("db.get_recent_memories", op=lambda i: db.get_recent_memories(pick(conversation_ids, i))),
+        Benchmark("db.get_relationship_state", op=lambda i: db.get_relationship_state(pick(conversation_ids, i))),
+        Benchmark("db.ensure_relationship_state", op=lambda i: db.ensure_relationship_state(pick(conversation_ids, i))),
+        Benchmark("db.touch_relationship_state", op=lambda i: db.touch_relationship_state(pick(conversation_ids, i))),
+        Benchmark("db.insert_feedback", op=lambda i: db.insert_feedback(message_id, None, "thumbs_up", None, None)),
+        Benchmark("db.get_user_by_username", op=lambda i: db.get_user_by_username("bench-user")),
+    ]
+
+
+def _time_round(benchmark: Benchmark, ops: int, offset: int) -> float:
+    if benchmark.async_op is not None:
+        async_op = benchmark.async_op
+
+        async def run() -> float:
+            started = time.perf_counter_ns()
+            for i in range(offset, offset + ops):
+                await async_op(i)
+            return (time.perf_counter_ns() - started) / ops
+
+        return asyncio.run(run())
+
+    op = benchmark.op
+    assert op is not None
+    started = time.perf_counter_ns()
+    for i in range(offset, offset + ops):
+        op(i)
+    return (time.perf_counter_ns() - started) / ops
+
+
+def run_benchmark(benchmark: Benchmark, rounds: int, ops: int) -> Dict[str, float]:
+    _time_round(benchmark, max(ops // 10, 1), 0)
+    samples_us = [_time_round(benchmark, ops, round_index * ops) / 1000 for round_index in range(rounds)]
+    return {
+        "median_us": round(statistics.median(samples_us), 3),
+        "min_us": round(min(samples_us), 3),
+        "max_us": round(max(samples_us), 3),
+    }
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    threshold_pct: float,
+) -> List[str]:
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if not reference or reference.get("median_us", 0) <= 0:
+            continue
+        change = (result["median_us"] - reference["median_us"]) / reference["median_us"] * 100
+        result["change_pct"] = round(change, 1)
+        if change > threshold_pct:
+            regressions.append(
+                f"{name}: {reference['median_us']:.2f}us -> {result['median_us']:.2f}us (+{change:.1f}%)"
+            )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Microbenchmarks for per-request CPU hot paths.")
+    parser.add_argument("--baseline", type=Path, default=_DEFAULT_BASELINE)
+    parser.add_argument("--record", action="store_true", help="Overwrite the baseline with this run.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=float(os.getenv("MICRO_BENCH_THRESHOLD", "25")),
+        help="Fail when a median regresses by more than this percentage.",
+    )
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--ops", type=int, default=300)
+    parser.add_argument("--filter", default="", help="Only run benchmarks whose name contains this string.")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["MEMORY_DB_PATH"] = str(Path(tmp) / "bench.db")
+        benchmarks = [bench for bench in build_benchmarks() if args.filter in bench.name]
+        results = {bench.name: run_benchmark(bench, args.rounds, args.ops) for bench in benchmarks}
+
+    for name, result in results.items():
+        print(f"{name:34s} {result['median_us']:10.2f}us  (min {result['min_us']:.2f}, max {result['max_us']:.2f})")
+
+    if args.record:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        print(f"baseline recorded: {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"no baseline at {args.baseline}; run with --record first")
+        return 0
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"regressions over {args.threshold:.0f}%:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print(f"no regressions over {args.threshold:.0f}%")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+_WORDS = ["sure", "tell", "me", "more", "about", "that", "I", "love", "how", "you", "think", "so", "yes"]
+
+
+@dataclass
+class MockLLMConfig:
+    ttft_ms: float = 150.0
+    tokens_per_sec: float = 40.0
+    output_tokens: int = 64
+    error_rate: float = 0.0
+    jitter: float = 0.1
+    seed: int | None = None
+
+
+def _prompt_tokens(messages: List[Dict[str, Any]]) -> int:
+    return sum(len(str(message.get("content", "")).split()) for message in messages)
+
+
+def _completion_tokens(body: Dict[str, Any], config: MockLLMConfig) -> int:
+    requested = body.get("max_tokens") or body.get("options", {}).get("num_predict")
+    if requested:
+        return max(min(int(requested), config.output_tokens), 1)
+    return config.output_tokens
+
+
+def create_app(config: MockLLMConfig | None = None) -> FastAPI:
+    config = config or MockLLMConfig()
+    rng = random.Random(config.seed)
+    app = FastAPI(title="Mock LLM backend")
+    app.state.config = config
+
+    def _jittered(value: float) -> float:
+        if config.jitter <= 0:
+            return value
+        return max(value * rng.uniform(1 - config.jitter, 1 + config.jitter), 0.0)
+
+    def _should_fail() -> bool:
+        return config.error_rate > 0 and rng.random() < config.error_rate
+
+    async def _tokens(count: int) -> AsyncGenerator[str, None]:
+        await asyncio.sleep(_jittered(config.ttft_ms) / 1000)
+        interval = 1 / config.tokens_per_sec if config.tokens_per_sec > 0 else 0.0
+        for index in range(count):
+            if index:
+                await asyncio.sleep(_jittered(interval))
+            yield rng.choice(_WORDS) + " "
+
+    def _error() -> JSONResponse:
+        return JSONResponse({"error": "mock_backend_error"}, status_code=500)
+
+    @app.get("/api/tags")
+    @app.get("/models")
+    @app.get("/v1/models")
+    async def models() -> Dict[str, Any]:
+        return {"models": [{"name": "mock"}], "data": [{"id": "mock"}]}
+
+    @app.post("/api/chat")
+    async def ollama_chat(request: Request):
+        body = await request.json()
+        if _should_fail():
+            return _error()
+        model = body.get("model", "mock")
+        prompt_tokens = _prompt_tokens(body.get("messages", []))
+        count = _completion_tokens(body, config)
+        started = time.perf_counter_ns()
+
+        if not body.get("stream", True):
+            content = "".join([token async for token in _tokens(count)])
+            return {
+                "model": model,
+                "message": {"role": "assistant", "content": content},
+                "done": True,
+                "prompt_eval_count": prompt_tokens,
+                "eval_count": count,
+                "total_duration": time.perf_counter_ns() - started,
+            }
+
+        async def ndjson() -> AsyncGenerator[str, None]:
+            async for token in _tokens(count):
+                chunk = {"model": model, "message": {"role": "assistant", "content": token}, "done": False}
+                yield json.dumps(chunk) + "\n"
+            final = {
+                "model": model,
+                "message": {"role": "assistant", "content": ""},
+                "done": True,
+                "prompt_eval_count": prompt_tokens,
+                "eval_count": count,
+                "total_duration": time.perf_counter_ns() - started,
+            }
+            yield json.dumps(final) + "\n"
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    @app.post("/chat/completions")
+    @app.post("/v1/chat/completions")
+    async def openai_chat(request: Request):
+        body = await request.json()
+        if _should_fail():
+            return _error()
+        model = body.get("model", "mock")
+        usage = {
+            "prompt_tokens": _prompt_tokens(body.get("messages", [])),
+            "completion_tokens": _completion_tokens(body, config),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+        if not body.get("stream", False):
+            content = "".join([token async for token in _tokens(usage["completion_tokens"])])
+            return {
+                "id": "mock-completion",
+                "object": "chat.completion",
+                "model": model,
+                "choices": [
+                    {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+                ],
+                "usage": usage,
+            }
+
+        include_usage = bool(body.get("stream_options", {}).get("include_usage"))
+
+        async def sse() -> AsyncGenerator[str, None]:
+            async for token in _tokens(usage["completion_tokens"]):
+                chunk = {
+                    "id": "mock-completion",
+                    "object": "chat.completion.chunk",
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+            if include_usage:
+                final = {"id": "mock-completion", "object": "chat.completion.chunk", "choices": [], "usage": usage}
+                yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(sse(), media_type="text/event-stream")
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Stand-in LLM server speaking the Ollama and OpenAI chat protocols.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--ttft-ms", type=float, default=150.0)
+    parser.add_argument("--tokens-per-sec", type=float, default=40.0)
+    parser.add_argument("--output-tokens", type=int, default=64)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = MockLLMConfig(
+        ttft_ms=args.ttft_ms,
+        tokens_per_sec=args.tokens_per_sec,
+        output_tokens=args.output_tokens,
+        error_rate=args.error_rate,
+        jitter=args.jitter,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import re
+import secrets
+import sqlite3
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from app.db.sqlite import existing_shards
+from bench.loadgen import RequestResult, _register_token, _run_one, build_report
+from bench.stats import summarize
+
+_WORD = re.compile(r"[A-Za-z]+|[0-9]+")
+_LETTERS = "etaoinshrdlucmfwypvbgk"
+
+
+@dataclass
+class ReplayTurn:
+    conversation_id: str
+    offset_s: float
+    content: str
+    stream: bool
+    history_len: int
+
+
+@dataclass
+class ReplayConfig:
+    source: str = ""
+    base_url: str = "http://localhost:8000"
+    speedup: float = 1.0
+    max_conversations: int = 0
+    since: Optional[str] = None
+    default_stream: bool = True
+    timeout: float = 120.0
+    token: Optional[str] = None
+    trace_file: Optional[str] = None
+    run_id: str = field(default_factory=lambda: datetime.utcnow().strftime("%Y%m%d%H%M%S"))
+    # Random unless given: an unsalted mapping could be inverted by hashing a dictionary. The report
+    # records it so the next build can be replayed with the same anonymized traffic.
+    salt: str = field(default_factory=lambda: secrets.token_hex(16))
+
+
+def anonymize(text: str, salt: str) -> str:
+    """Replaces every word with a deterministic pseudo-word of the same length; spacing and punctuation stay."""
+
+    def replace(match: re.Match[str]) -> str:
+        word = match.group(0)
+        digest = hashlib.blake2b((salt + word.lower()).encode("utf-8"), digest_size=16).digest()
+        if word.isdigit():
+            return "".join(str(digest[index % len(digest)] % 10) for index in range(len(word)))
+        letters = "".join(_LETTERS[digest[index % len(digest)] % len(_LETTERS)] for index in range(len(word)))
+        return letters.capitalize() if word[0].isupper() else letters
+
+    return _WORD.sub(replace, text)
+
+
+def _was_streamed(row: sqlite3.Row, default: bool) -> bool:
+    # Non-streaming replies record ttft_ms == duration_ms; streamed ones get a first token earlier.
+    if row["ttft_ms"] is None or row["duration_ms"] is None:
+        return default
+    return row["ttft_ms"] < row["duration_ms"]
+
+
+def _parse_time(value: str) -> float:
+    return datetime.fromisoformat(value).timestamp()
+
+
+def _read_messages(path: Path, since: Optional[str]) -> List[sqlite3.Row]:
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(messages)")}
+    metrics = "ttft_ms, duration_ms" if {"ttft_ms", "duration_ms"} <= columns else "NULL AS ttft_ms, NULL AS duration_ms"
+    where, params = "", []
+    if since:
+        where, params = "WHERE created_at >= ?", [since]
+    rows = conn.execute(
+        f"SELECT id, conversation_id, role, content, created_at, {metrics} FROM messages {where}",
+        params,
+    ).fetchall()
+    conn.close()
+    return rows
+
+
+def load_turns(config: ReplayConfig) -> List[ReplayTurn]:
+    """Reads user turns from a copy of the messages table, in arrival order, with anonymized content.
+
+    `config.source` is the main database; shard files next to it are read too.
+    """
+    rows: List[sqlite3.Row] = []
+    for _, path in existing_shards(Path(config.source)):
+        rows.extend(_read_messages(path, config.since))
+    rows.sort(key=lambda row: (row["created_at"], row["id"]))
+
+    conversations: Dict[str, List[sqlite3.Row]] = defaultdict(list)
+    for row in rows:
+        conversations[row["conversation_id"]].append(row)
+    selected = list(conversations)
+    if config.max_conversations > 0:
+        selected = selected[: config.max_conversations]
+
+    turns: List[ReplayTurn] = []
+    for original_id in selected:
+        history = conversations[original_id]
+        replay_id = "replay-" + hashlib.sha1((config.salt + original_id).encode("utf-8")).hexdigest()[:16]
+        for index, row in enumerate(history):
+            if row["role"] != "user":
+                continue
+            reply = next((later for later in history[index + 1:] if later["role"] == "assistant"), None)
+            stream = _was_streamed(reply, config.default_stream) if reply is not None else config.default_stream
+            turns.append(
+                ReplayTurn(
+                    conversation_id=replay_id,
+                    offset_s=_parse_time(row["created_at"]),
+                    content=anonymize(row["content"], config.salt),
+                    stream=stream,
+                    history_len=index,
+                )
+            )
+    if turns:
+        start = min(turn.offset_s for turn in turns)
+        for turn in turns:
+            turn.offset_s -= start
+    turns.sort(key=lambda turn: turn.offset_s)
+    return turns
+
+
+def stage_latencies(trace_file: Path, since_ns: int) -> Dict[str, Dict[str, float]]:
+    """Percentiles per span name from the backend's JSONL trace export, limited to spans after `since_ns`."""
+    durations: Dict[str, List[float]] = defaultdict(list)
+    if not trace_file.exists():
+        return {}
+    with trace_file.open(encoding="utf-8") as handle:
+        for line in handle:
+            try:
+                span = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if span.get("start_ns", 0) >= since_ns:
+                durations[span["name"]].append(span["duration_ms"])
+    return {name: summarize(values) for name, values in sorted(durations.items())}
+
+
+async def replay(
+    config: ReplayConfig,
+    turns: List[ReplayTurn],
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+) -> Dict[str, Any]:
+    """Sends each turn at its original offset divided by `speedup`; turns of one conversation stay in order."""
+    speedup = config.speedup if config.speedup > 0 else 1.0
+    results: List[RequestResult] = []
+    by_history: Dict[str, List[float]] = defaultdict(list)
+    started_ns = time.time_ns()
+    async with httpx.AsyncClient(base_url=config.base_url, timeout=config.timeout, transport=transport) as client:
+        token = config.token or await _register_token(client)
+        headers = {"Authorization": f"Bearer {token}"}
+        previous: Dict[str, asyncio.Task] = {}
+        started = time.perf_counter()
+
+        async def send(turn: ReplayTurn, after: Optional[asyncio.Task]) -> None:
+            delay = turn.offset_s / speedup - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if after is not None:
+                await asyncio.wait([after])
+            payload = {
+                "user_id": f"replay-{config.run_id}-{turn.conversation_id}",
+                "conversation_id": f"{turn.conversation_id}-{config.run_id}",
+                "messages": [{"role": "user", "content": turn.content}],
+                "stream": turn.stream,
+            }
+            result = await _run_one(client, payload, headers)
+            results.append(result)
+            if result.ok:
+                bucket = "0" if turn.history_len == 0 else "1-9" if turn.history_len < 10 else "10+"
+                by_history[bucket].append(result.total_ms)
+
+        tasks = []
+        for turn in turns:
+            task = asyncio.create_task(send(turn, previous.get(turn.conversation_id)))
+            previous[turn.conversation_id] = task
+            tasks.append(task)
+        await asyncio.gather(*tasks)
+        duration = time.perf_counter() - started
+
+    report = build_report(config, results, duration)
+    report["latency_by_history_ms"] = {bucket: summarize(values) for bucket, values in sorted(by_history.items())}
+    if config.trace_file:
+        report["stages_ms"] = stage_latencies(Path(config.trace_file), started_ns)
+    return report
+
+
+def _flatten(report: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    flat: Dict[str, float] = {}
+    for key, value in report.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, path + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = float(value)
+    return flat
+
+
+def diff_reports(before: Dict[str, Any], after: Dict[str, Any], threshold_pct: float = 10.0) -> List[Dict[str, Any]]:
+    """Compares latency/throughput metrics of two replay reports; `regressed` marks changes past the threshold."""
+    old, new = _flatten(before), _flatten(after)
+    rows = []
+    for key in sorted(old.keys() & new.keys()):
+        if key.startswith("config.") or not (key.endswith(("p50", "p95", "p99", "mean")) or key == "throughput_rps"):
+            continue
+        if old[key] <= 0:
+            continue
+        change = (new[key] - old[key]) / old[key] * 100
+        worse = -change if key == "throughput_rps" else change
+        rows.append(
+            {
+                "metric": key,
+                "before": old[key],
+                "after": new[key],
+                "change_pct": round(change, 1),
+                "regressed": worse > threshold_pct,
+            }
+        )
+    return rows
+
+
+def _start_mock_llm(port: int, extra: List[str]) -> subprocess.Popen:
+    process = subprocess.Popen([sys.executable, "-m", "bench.mock_llm", "--port", str(port), *extra])
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/models", timeout=0.5)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f"mock LLM did not start on port {port}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay recorded chat traffic from a copy of the messages table.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Replay a SQLite copy against a backend.")
+    run.add_argument("source", type=Path, help="Copy of the backend SQLite database.")
+    run.add_argument("--base-url", default="http://localhost:8000")
+    run.add_argument("--speedup", type=float, default=1.0, help="Divide original inter-arrival gaps by this factor.")
+    run.add_argument("--max-conversations", type=int, default=0)
+    run.add_argument("--since", default=None, help="Only replay messages created at or after this ISO timestamp.")
+    run.add_argument("--default-stream", choices=("true", "false"), default="true",
+                     help="Mode for turns whose reply has no timing columns.")
+    run.add_argument("--salt", default=None,
+                     help="Anonymization salt; random by default. Pass the one from a previous report to compare builds.")
+    run.add_argument("--timeout", type=float, default=120.0)
+    run.add_argument("--token", default=None)
+    run.add_argument("--trace-file", default=None, help="Backend TRACE_JSONL_PATH, for per-stage percentiles.")
+    run.add_argument("--mock-llm-port", type=int, default=0,
+                     help="Start bench.mock_llm on this port for the run (point LLM_BASE_URL at it).")
+    run.add_argument("--mock-llm-args", default="", help="Extra arguments for bench.mock_llm, e.g. '--ttft-ms 200'.")
+    run.add_argument("--output", type=Path, default=None)
+
+    diff = commands.add_parser("diff", help="Compare two replay reports, e.g. from two builds.")
+    diff.add_argument("before", type=Path)
+    diff.add_argument("after", type=Path)
+    diff.add_argument("--threshold", type=float, default=10.0)
+    args = parser.parse_args(argv)
+
+    if args.command == "diff":
+        rows = diff_reports(
+            json.loads(args.before.read_text(encoding="utf-8")),
+            json.loads(args.after.read_text(encoding="utf-8")),
+            args.threshold,
+        )
+        for row in rows:
+            marker = "REGRESSED" if row["regressed"] else ""
+            print(f"{row['metric']:<40} {row['before']:>12.3f} {row['after']:>12.3f} {row['change_pct']:>+8.1f}% {marker}")
+        return 1 if any(row["regressed"] for row in rows) else 0
+
+    config = ReplayConfig(
+        source=str(args.source),
+        base_url=args.base_url,
+        speedup=args.speedup,
+        max_conversations=args.max_conversations,
+        since=args.since,
+        default_stream=args.default_stream == "true",
+        timeout=args.timeout,
+        token=args.token,
+        trace_file=args.trace_file,
+    )
+    if args.salt:
+        config.salt = args.salt
+    else:
+        print(f"anonymization salt: {config.salt}", file=sys.stderr)
+    turns = load_turns(config)
+    mock = _start_mock_llm(args.mock_llm_port, args.mock_llm_args.split()) if args.mock_llm_port else None
+    try:
+        report = asyncio.run(replay(config, turns))
+    finally:
+        if mock is not None:
+            mock.terminate()
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(text + "\n", encoding="utf-8")
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.services.shared_state import ACQUIRE_SLOT_SCRIPT, RENEW_SLOT_SCRIPT
+
+_Value = Tuple[str, Optional[float]]
+
+
+def _sha(script: str) -> str:
+    return hashlib.sha1(script.encode("utf-8")).hexdigest()
+
+
+class RespServer:
+    """In-memory stand-in for the handful of Redis commands the shared-state backend uses.
+
+    There is no Lua here: EVAL/EVALSHA run Python equivalents of the backend's
+    own slot scripts, looked up by SHA1, and reject any other script.
+    """
+
+    def __init__(self) -> None:
+        self._data: Dict[str, _Value] = {}
+        self._zsets: Dict[str, Dict[str, float]] = {}
+        self._scripts: Dict[str, Callable[[List[str], List[str]], int]] = {
+            _sha(ACQUIRE_SLOT_SCRIPT): self._acquire_slot,
+            _sha(RENEW_SLOT_SCRIPT): self._renew_slot,
+        }
+        self._loaded: set[str] = set()
+        self._server: asyncio.base_events.Server | None = None
+
+    @property
+    def port(self) -> int:
+        assert self._server is not None
+        return self._server.sockets[0].getsockname()[1]
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        self._server = await asyncio.start_server(self._handle, host, port)
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def _get(self, key: str) -> Optional[str]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    def _expire(self, key: str, seconds: float) -> int:
+        if self._get(key) is None:
+            return 0
+        self._data[key] = (self._data[key][0], time.monotonic() + seconds)
+        return 1
+
+    def _incr(self, key: str, delta: int) -> int:
+        value = int(self._get(key) or 0) + delta
+        expires_at = self._data[key][1] if key in self._data else None
+        self._data[key] = (str(value), expires_at)
+        return value
+
+    def _set(self, args: List[str]) -> Optional[str]:
+        key, value, options = args[0], args[1], [arg.upper() for arg in args[2:]]
+        if "NX" in options and self._get(key) is not None:
+            return None
+        expires_at = None
+        if "PX" in options:
+            expires_at = time.monotonic() + int(args[2 + options.index("PX") + 1]) / 1000
+        elif "EX" in options:
+            expires_at = time.monotonic() + int(args[2 + options.index("EX") + 1])
+        self._data[key] = (value, expires_at)
+        return "+OK"
+
+    def _acquire_slot(self, keys: List[str], argv: List[str]) -> int:
+        now_ms, ttl_ms, limit, token = float(argv[0]), float(argv[1]), int(argv[2]), argv[3]
+        leases = {member: score for member, score in self._zsets.get(keys[0], {}).items() if score > now_ms}
+        self._zsets[keys[0]] = leases
+        if len(leases) >= limit:
+            return 0
+        leases[token] = now_ms + ttl_ms
+        return 1
+
+    def _renew_slot(self, keys: List[str], argv: List[str]) -> int:
+        now_ms, ttl_ms, token = float(argv[0]), float(argv[1]), argv[2]
+        leases = self._zsets.get(keys[0], {})
+        if leases.get(token, 0) <= now_ms:
+            return 0
+        leases[token] = now_ms + ttl_ms
+        return 1
+
+    def _eval(self, sha: str, args: List[str]):
+        handler = self._scripts.get(sha)
+        if handler is None or sha not in self._loaded:
+            return Exception("NOSCRIPT No matching script. Please use EVAL.")
+        numkeys = int(args[0])
+        return handler(args[1 : 1 + numkeys], args[1 + numkeys :])
+
+    def dispatch(self, args: List[str]):
+        command = args[0].upper()
+        if command in ("PING", "AUTH", "SELECT"):
+            return "+PONG" if command == "PING" else "+OK"
+        if command == "GET":
+            return self._get(args[1])
+        if command == "SET":
+            return self._set(args[1:])
+        if command == "INCR":
+            return self._incr(args[1], 1)
+        if command == "DECR":
+            return self._incr(args[1], -1)
+        if command == "EXPIRE":
+            return self._expire(args[1], int(args[2]))
+        if command == "PEXPIRE":
+            return self._expire(args[1], int(args[2]) / 1000)
+        if command == "EVAL":
+            sha = _sha(args[1])
+            if sha not in self._scripts:
+                return Exception("ERR the stand-in only runs the shared-state slot scripts")
+            self._loaded.add(sha)
+            return self._eval(sha, args[2:])
+        if command == "EVALSHA":
+            return self._eval(args[1], args[2:])
+        if command == "ZREM":
+            leases = self._zsets.get(args[1], {})
+            return sum(1 for member in args[2:] if leases.pop(member, None) is not None)
+        if command == "DEL":
+            return sum(1 for key in args[1:] if self._get(key) is not None and self._data.pop(key))
+        return Exception(f"ERR unknown command '{command}'")
+
+    @staticmethod
+    def _encode(reply) -> bytes:
+        if reply is None:
+            return b"$-1\r\n"
+        if isinstance(reply, Exception):
+            return f"-{reply}\r\n".encode()
+        if isinstance(reply, int):
+            return f":{reply}\r\n".encode()
+        if reply.startswith("+"):
+            return f"{reply}\r\n".encode()
+        encoded = reply.encode("utf-8")
+        return b"$%d\r\n%s\r\n" % (len(encoded), encoded)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                header = await reader.readline()
+                if not header:
+                    break
+                args = []
+                for _ in range(int(header[1:-2])):
+                    length = int((await reader.readline())[1:-2])
+                    args.append((await reader.readexactly(length + 2))[:-2].decode("utf-8"))
+                writer.write(self._encode(self.dispatch(args)))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def _serve(host: str, port: int) -> None:
+    server = RespServer()
+    await server.start(host, port)
+    print(f"resp stand-in listening on {host}:{server.port}")
+    await asyncio.Event().wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Tiny Redis-protocol server for exercising SHARED_STATE_BACKEND=redis.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    args = parser.parse_args()
+    asyncio.run(_serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+import pytest
+
+from app.db import sqlite as sqlite_db
+from app.services.auth import create_access_token
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A fresh, initialised SQLite database under tmp_path; returns the sqlite module."""
+    monkeypatch.setattr(sqlite_db, "_db_path", lambda: tmp_path / "memory.db")
+    sqlite_db.init_db()
+    return sqlite_db
+
+
+@pytest.fixture
+def owner_id(db) -> int:
+    return db.create_user("owner", "hash")
+
+
+@pytest.fixture
+def auth_headers(owner_id):
+    return {"Authorization": f"Bearer {create_access_token(owner_id, 'owner')}"}
@@ -0,0 +1,59 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.concurrency import AdaptiveConcurrencyLimiter
+
+
+def _drive(limiter: AdaptiveConcurrencyLimiter, calls: int, ttft_ms, parallel: int) -> None:
+    async def call(index: int) -> None:
+        async with limiter.acquire() as permit:
+            await asyncio.sleep(0.001)
+            permit.observe(ttft_ms=ttft_ms(index))
+
+    async def run() -> None:
+        for start in range(0, calls, parallel):
+            await asyncio.gather(*(call(index) for index in range(start, start + parallel)))
+
+    asyncio.run(run())
+
+
+def test_limit_grows_while_saturated_and_fast() -> None:
+    limiter = AdaptiveConcurrencyLimiter(4, 1, 10, target_ttft_ms=500)
+    _drive(limiter, calls=400, ttft_ms=lambda _: 100, parallel=16)
+    assert limiter.limit == 10
+
+
+def test_limit_backs_off_once_per_congested_burst() -> None:
+    limiter = AdaptiveConcurrencyLimiter(8, 2, 16, target_ttft_ms=500)
+    _drive(limiter, calls=8, ttft_ms=lambda _: 2000, parallel=8)
+    assert limiter.limit == 6
+
+    _drive(limiter, calls=200, ttft_ms=lambda _: 2000, parallel=8)
+    assert limiter.limit == 2
+
+
+def test_in_flight_never_exceeds_limit() -> None:
+    limiter = AdaptiveConcurrencyLimiter(3, 3, 3)
+    peak = 0
+
+    async def call() -> None:
+        nonlocal peak
+        async with limiter.acquire():
+            peak = max(peak, limiter.in_flight)
+            await asyncio.sleep(0.005)
+
+    async def run() -> None:
+        await asyncio.gather(*(call() for _ in range(20)))
+
+    asyncio.run(run())
+    assert peak == 3
+    assert limiter.in_flight == 0
+
+
+def test_metrics_endpoint_exports_limit() -> None:
+    AdaptiveConcurrencyLimiter(5, 5, 5, name="metrics-test")
+    body = TestClient(app).get("/metrics").text
+    assert 'llm_concurrency_limit{limiter="metrics-test"} 5' in body
+    assert "# TYPE llm_in_flight gauge" in body
@@ -0,0 +1,150 @@
+import asyncio
+import dataclasses
+import json
+
+from fastapi.testclient import TestClient
+
+from app.db import sqlite as sqlite_db
+from app.main import app
+from app.routes import chat as chat_route
+from app.services.concurrency import AdaptiveConcurrencyLimiter
+
+
+class _EvalLLM:
+    def __init__(self) -> None:
+        self.priorities = []
+        self.in_flight = 0
+        self.peak = 0
+
+    async def chat_completions(self, messages, max_tokens, temperature=0.8, priority="live"):
+        self.priorities.append(priority)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return {
+            "choices": [{"message": {"content": f"reply to {messages[-1].content}"}}],
+            "usage": {"prompt_tokens": 3, "completion_tokens": 2},
+        }
+
+
+def _jsonl(*items) -> bytes:
+    return "\n".join(item if isinstance(item, str) else json.dumps(item) for item in items).encode("utf-8")
+
+
+def test_batch_streams_jsonl_results_with_bounded_concurrency(auth_headers, monkeypatch) -> None:
+    llm = _EvalLLM()
+    monkeypatch.setattr(chat_route, "llm_client", llm)
+    body = _jsonl(
+        *({"id": f"c{index}", "turns": ["hello", "again"]} for index in range(6)),
+        {"id": "history", "messages": [{"role": "user", "content": "only turn"}]},
+        "{not json",
+    )
+
+    response = TestClient(app).post("/chat/batch?concurrency=3", content=body, headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    results = {item["line"]: item for item in map(json.loads, response.text.splitlines())}
+    assert len(results) == 8
+    assert results[1]["replies"] == ["reply to hello", "reply to again"]
+    assert results[7]["replies"] == ["reply to only turn"]
+    assert results[8]["status"] == "error"
+    assert llm.peak <= 3
+    assert set(llm.priorities) == {AdaptiveConcurrencyLimiter.BATCH}
+    assert sqlite_db.get_connection().execute("SELECT COUNT(*) FROM messages").fetchone()[0] == 0
+
+
+def test_batch_persists_when_asked(auth_headers, monkeypatch) -> None:
+    monkeypatch.setattr(chat_route, "llm_client", _EvalLLM())
+
+    response = TestClient(app).post("/chat/batch?persist=true", content=_jsonl({"turns": ["hi"]}), headers=auth_headers)
+
+    result = json.loads(response.text)
+    assert result["conversation_id"].startswith(response.headers["X-Batch-Id"])
+    rows = sqlite_db.get_connection().execute(
+        "SELECT role, content, prompt_tokens FROM messages WHERE conversation_id = ? ORDER BY id",
+        (result["conversation_id"],),
+    ).fetchall()
+    assert [tuple(row) for row in rows] == [("user", "hi", None), ("assistant", "reply to hi", 3)]
+
+
+def test_batch_checks_the_quota_before_each_conversation(auth_headers, monkeypatch) -> None:
+    monkeypatch.setattr(chat_route, "llm_client", _EvalLLM())
+    monkeypatch.setattr(chat_route, "settings", dataclasses.replace(chat_route.settings, user_daily_token_quota=5))
+    body = _jsonl(*({"turns": ["hi"]} for _ in range(3)))
+
+    response = TestClient(app).post("/chat/batch?concurrency=1", content=body, headers=auth_headers)
+
+    statuses = [item["status"] for item in map(json.loads, response.text.splitlines())]
+    assert statuses == ["ok", "error", "error"]
+    assert json.loads(response.text.splitlines()[1])["error"] == "token_quota_exceeded"
+
+
+def test_batch_conversations_pick_their_persona(auth_headers, monkeypatch) -> None:
+    llm = _EvalLLM()
+    prompts = []
+    original = llm.chat_completions
+
+    async def recording(messages, *args, **kwargs):
+        prompts.append(messages[0].content)
+        return await original(messages, *args, **kwargs)
+
+    monkeypatch.setattr(llm, "chat_completions", recording)
+    monkeypatch.setattr(chat_route, "llm_client", llm)
+    body = _jsonl({"persona_id": "default", "turns": ["hi"]}, {"persona_id": "nobody", "turns": ["hi"]})
+
+    response = TestClient(app).post("/chat/batch", content=body, headers=auth_headers)
+
+    results = {item["line"]: item for item in map(json.loads, response.text.splitlines())}
+    assert results[1]["status"] == "ok" and "### Persona" in prompts[0]
+    assert results[2] == {"line": 2, "id": None, "status": "error", "error": "persona_not_found"}
+    assert len(prompts) == 1
+
+
+def test_batch_callers_wait_while_live_callers_are_queued() -> None:
+    async def scenario():
+        limiter = AdaptiveConcurrencyLimiter(2, 2, 2, batch_share=0.5)
+        order = []
+        release = asyncio.Event()
+
+        async def call(name, priority):
+            async with limiter.acquire(priority):
+                order.append(name)
+                await release.wait()
+
+        first = asyncio.create_task(call("live-1", "live"))
+        second = asyncio.create_task(call("live-2", "live"))
+        await asyncio.sleep(0)
+        batch = asyncio.create_task(call("batch", "batch"))
+        live = asyncio.create_task(call("live-3", "live"))
+        await asyncio.sleep(0.01)
+        release.set()
+        await asyncio.gather(first, second, batch, live)
+        return order
+
+    order = asyncio.run(scenario())
+    assert order.index("live-3") < order.index("batch")
+
+
+def test_batch_accounts_completed_turns_and_caps_max_tokens(auth_headers, owner_id, monkeypatch) -> None:
+    llm = _EvalLLM()
+    budgets = []
+    original = llm.chat_completions
+
+    async def failing_second_turn(messages, max_tokens, *args, **kwargs):
+        budgets.append(max_tokens)
+        if len(budgets) == 2:
+            raise RuntimeError("backend went away")
+        return await original(messages, max_tokens, *args, **kwargs)
+
+    monkeypatch.setattr(llm, "chat_completions", failing_second_turn)
+    monkeypatch.setattr(chat_route, "llm_client", llm)
+    body = _jsonl({"turns": ["hello", "again"], "max_tokens": 10**9})
+
+    response = TestClient(app).post("/chat/batch", content=body, headers=auth_headers)
+
+    assert json.loads(response.text)["error"] == "RuntimeError"
+    assert budgets == [chat_route.settings.llm_max_tokens_default] * 2
+    usage = sqlite_db.get_user_usage(owner_id)
+    assert (usage["prompt_tokens"], usage["completion_tokens"]) == (3, 2)
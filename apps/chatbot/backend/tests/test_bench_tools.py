@@ -0,0 +1,57 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from bench.loadgen import LoadConfig, RequestResult, build_report
+from bench.micro import compare
+from bench.mock_llm import MockLLMConfig, create_app
+
+
+def _mock_client() -> TestClient:
+    return TestClient(create_app(MockLLMConfig(ttft_ms=0, tokens_per_sec=0, output_tokens=3, jitter=0, seed=1)))
+
+
+def test_mock_ollama_stream_ends_with_usage() -> None:
+    client = _mock_client()
+    response = client.post("/api/chat", json={"model": "m", "messages": [{"role": "user", "content": "hi"}]})
+    lines = [json.loads(line) for line in response.text.splitlines() if line]
+    assert [line["done"] for line in lines] == [False, False, False, True]
+    assert lines[-1]["eval_count"] == 3
+
+
+def test_mock_openai_stream_is_sse() -> None:
+    client = _mock_client()
+    response = client.post(
+        "/v1/chat/completions",
+        json={"model": "m", "messages": [], "stream": True, "stream_options": {"include_usage": True}},
+    )
+    events = [line[len("data: "):] for line in response.text.splitlines() if line.startswith("data: ")]
+    assert events[-1] == "[DONE]"
+    assert json.loads(events[-2])["usage"]["completion_tokens"] == 3
+
+
+def test_mock_error_rate() -> None:
+    client = TestClient(create_app(MockLLMConfig(error_rate=1.0)))
+    response = client.post("/chat/completions", json={"messages": [], "stream": False})
+    assert response.status_code == 500
+
+
+def test_load_report_percentiles() -> None:
+    results = [RequestResult(stream=True, ok=True, status=200, ttft_ms=float(i), total_ms=float(i * 10)) for i in range(1, 101)]
+    results.append(RequestResult(stream=False, ok=False, status=429, ttft_ms=1.0, total_ms=1.0, error="rate_limited"))
+    report = build_report(LoadConfig(token="secret"), results, duration=10.0)
+    assert report["errors"] == 1
+    assert report["status_counts"] == {"200": 100, "429": 1}
+    assert report["ttft_ms"]["p50"] == 50.0
+    assert report["ttft_ms"]["p99"] == 99.0
+    assert report["throughput_rps"] == 10.0
+    assert "token" not in report["config"]
+
+
+def test_micro_compare_flags_regressions_over_threshold() -> None:
+    baseline = {"fast": {"median_us": 10.0}, "slow": {"median_us": 10.0}, "new": {"median_us": 0.0}}
+    results = {"fast": {"median_us": 11.0}, "slow": {"median_us": 14.0}, "new": {"median_us": 5.0}}
+    regressions = compare(results, baseline, threshold_pct=25)
+    assert len(regressions) == 1
+    assert regressions[0].startswith("slow:")
+    assert results["fast"]["change_pct"] == 10.0
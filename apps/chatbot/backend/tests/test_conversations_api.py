@@ -0,0 +1,97 @@
+from fastapi.testclient import TestClient
+
+from app.db import sqlite as sqlite_db
+from app.main import app
+from app.routes import chat as chat_route
+
+
+class _CapturingLLM:
+    def __init__(self) -> None:
+        self.last_messages = None
+
+    async def chat_completions(self, messages, max_tokens, temperature=0.8):
+        self.last_messages = messages
+        return {"choices": [{"message": {"content": "Welcome back"}}]}
+
+
+def _seed(owner_id):
+    other_id = sqlite_db.create_user("other", "hash")
+    sqlite_db.create_conversation("c1", owner_id)
+    sqlite_db.create_conversation("c2", owner_id)
+    sqlite_db.create_conversation("c3", other_id)
+    ids = [
+        sqlite_db.insert_message("c1", "user" if i % 2 == 0 else "assistant", f"turn {i}", None, None, "ALLOW")
+        for i in range(5)
+    ]
+    return ids
+
+
+def test_messages_keyset_pages(owner_id, auth_headers) -> None:
+    ids = _seed(owner_id)
+    client = TestClient(app)
+
+    first = client.get("/conversations/c1/messages?limit=2", headers=auth_headers).json()
+    assert [item["id"] for item in first["items"]] == ids[:2]
+    second = client.get(f"/conversations/c1/messages?limit=2&after={first['next_cursor']}", headers=auth_headers).json()
+    assert [item["id"] for item in second["items"]] == ids[2:4]
+    last = client.get(f"/conversations/c1/messages?limit=2&after={second['next_cursor']}", headers=auth_headers).json()
+    assert [item["id"] for item in last["items"]] == ids[4:]
+    assert "next_cursor" not in last
+
+    newest = client.get(f"/conversations/c1/messages?limit=2&before={ids[-1] + 1}", headers=auth_headers).json()
+    assert [item["id"] for item in newest["items"]] == ids[3:]
+    assert newest["next_cursor"] == ids[3]
+
+
+def test_messages_projection_and_etag(owner_id, auth_headers) -> None:
+    _seed(owner_id)
+    client = TestClient(app)
+
+    response = client.get("/conversations/c1/messages?include_content=false", headers=auth_headers)
+    assert response.status_code == 200
+    assert all("content" not in item for item in response.json()["items"])
+
+    etag = response.headers["ETag"]
+    cached = client.get(
+        "/conversations/c1/messages?include_content=false",
+        headers={**auth_headers, "If-None-Match": etag},
+    )
+    assert cached.status_code == 304
+
+    sqlite_db.insert_message("c1", "user", "new turn", None, None, "ALLOW")
+    changed = client.get(
+        "/conversations/c1/messages?include_content=false",
+        headers={**auth_headers, "If-None-Match": etag},
+    )
+    assert changed.status_code == 200
+
+
+def test_conversation_listing_is_scoped_to_user(owner_id, auth_headers) -> None:
+    _seed(owner_id)
+    client = TestClient(app)
+
+    page = client.get("/conversations?limit=1", headers=auth_headers).json()
+    assert [item["id"] for item in page["items"]] == ["c1"]
+    assert page["items"][0]["message_count"] == 5
+    rest = client.get(f"/conversations?after={page['next_cursor']}", headers=auth_headers).json()
+    assert [item["id"] for item in rest["items"]] == ["c2"]
+
+    assert client.get("/conversations/c3/messages", headers=auth_headers).status_code == 404
+    assert client.get("/conversations").status_code == 401
+
+
+def test_chat_hydrates_history_from_db(owner_id, auth_headers, monkeypatch) -> None:
+    _seed(owner_id)
+    llm = _CapturingLLM()
+    monkeypatch.setattr(chat_route, "llm_client", llm)
+    client = TestClient(app)
+
+    response = client.post(
+        "/chat",
+        json={"conversation_id": "c1", "user_id": "hydrate-test", "messages": [{"role": "user", "content": "Hi again"}]},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    contents = [message.content for message in llm.last_messages]
+    assert "turn 3" in contents
+    assert contents[-1] == "Hi again"
@@ -0,0 +1,70 @@
+import gzip
+import json
+from datetime import datetime, timedelta
+
+from app.db import sqlite as sqlite_db
+from app.services.dataset_export import ExportFilters, export_dataset
+from app.services.retention import run_retention
+
+
+def _seed():
+    sqlite_db.create_conversation("c1", None)
+    ids = [sqlite_db.insert_message("c1", "assistant", f"reply {i}", "m", 0.8, "ALLOW") for i in range(5)]
+    sqlite_db.insert_feedback(ids[1], None, "thumbs_up", json.dumps(["warm"]), None)
+    sqlite_db.insert_feedback(ids[3], None, "thumbs_down", None, "better reply")
+    return ids
+
+
+def _read(out_dir):
+    records = []
+    for shard in sorted(out_dir.glob("part-*.jsonl.gz")):
+        with gzip.open(shard, "rt", encoding="utf-8") as handle:
+            records.extend(json.loads(line) for line in handle)
+    return records
+
+
+def test_export_shards_and_resumes(db, tmp_path) -> None:
+    ids = _seed()
+    out_dir = tmp_path / "export"
+
+    checkpoint = export_dataset(tmp_path / "memory.db", out_dir, ExportFilters(), shard_rows=2, batch_size=1)
+    assert checkpoint.shards == ["part-00000.jsonl.gz", "part-00001.jsonl.gz", "part-00002.jsonl.gz"]
+    records = _read(out_dir)
+    assert [record["id"] for record in records] == ids
+    assert records[1]["feedback"][0]["tags"] == ["warm"]
+
+    new_id = sqlite_db.insert_message("c1", "assistant", "later reply", "m", 0.8, "ALLOW")
+    checkpoint = export_dataset(tmp_path / "memory.db", out_dir, ExportFilters(), shard_rows=2, batch_size=1)
+    assert checkpoint.rows_written == 6
+    assert [record["id"] for record in _read(out_dir)] == ids + [new_id]
+
+
+def test_export_rating_filter(db, tmp_path) -> None:
+    ids = _seed()
+    out_dir = tmp_path / "export"
+
+    export_dataset(tmp_path / "memory.db", out_dir, ExportFilters(rating="thumbs_down"), fmt="jsonl.gz")
+    records = _read(out_dir)
+    assert [record["id"] for record in records] == [ids[3]]
+    assert records[0]["feedback"][0]["rewrite_text"] == "better reply"
+
+
+def test_export_includes_archived_conversations_once(db, tmp_path) -> None:
+    ids = _seed()
+    out_dir = tmp_path / "export"
+    export_dataset(tmp_path / "memory.db", out_dir, ExportFilters(), shard_rows=2)
+
+    # Archived after they were exported live: a resumed export must not repeat them.
+    run_retention(idle_days=30, batch_size=10, now=datetime.utcnow() + timedelta(days=31))
+    sqlite_db.create_conversation("c2", None)
+    archived_later = [sqlite_db.insert_message("c2", "user", f"old {i}", None, None, "ALLOW") for i in range(2)]
+    run_retention(idle_days=30, batch_size=10, now=datetime.utcnow() + timedelta(days=31))
+    checkpoint = export_dataset(tmp_path / "memory.db", out_dir, ExportFilters(), shard_rows=2)
+    assert [record["id"] for record in _read(out_dir)] == ids + archived_later
+    assert checkpoint.rows_written == 7
+
+    fresh = export_dataset(tmp_path / "memory.db", tmp_path / "fresh", ExportFilters(rating="thumbs_up"))
+    assert fresh.rows_written == 1
+    assert _read(tmp_path / "fresh")[0]["feedback"][0]["tags"] == ["warm"]
+    skipped = export_dataset(tmp_path / "memory.db", tmp_path / "skipped", ExportFilters(), include_archived=False)
+    assert skipped.rows_written == 0
@@ -0,0 +1,64 @@
+from fastapi.testclient import TestClient
+
+from app.db import sqlite as sqlite_db
+from app.main import app
+
+
+def _seed(owner_id):
+    other_id = sqlite_db.create_user("other", "hash")
+    sqlite_db.create_conversation("mine", owner_id)
+    sqlite_db.create_conversation("theirs", other_id)
+    own_message = sqlite_db.insert_message("mine", "assistant", "hi", "m", 0.8, "ALLOW")
+    foreign_message = sqlite_db.insert_message("theirs", "assistant", "hi", "m", 0.8, "ALLOW")
+    return own_message, foreign_message
+
+
+def _feedback_rows():
+    conn = sqlite_db.get_connection()
+    return conn.execute("SELECT message_id, user_id, rating, tags FROM feedback ORDER BY id").fetchall()
+
+
+def test_batch_inserts_only_owned_messages(owner_id, auth_headers) -> None:
+    own_message, foreign_message = _seed(owner_id)
+    client = TestClient(app)
+
+    response = client.post(
+        "/feedback/batch?buffered=false",
+        json={
+            "items": [
+                {"message_id": own_message, "rating": "thumbs_up", "tags": ["funny"]},
+                {"message_id": own_message, "rating": "thumbs_down"},
+                {"message_id": foreign_message, "rating": "thumbs_up"},
+                {"message_id": 9999, "rating": "thumbs_up"},
+            ]
+        },
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["accepted"] == 2
+    assert body["rejected_message_ids"] == [foreign_message, 9999]
+
+    rows = _feedback_rows()
+    assert [row["message_id"] for row in rows] == [own_message, own_message]
+    assert rows[0]["tags"] == '["funny"]'
+
+
+def test_batch_requires_auth(db) -> None:
+    response = TestClient(app).post(
+        "/feedback/batch",
+        json={"items": [{"message_id": 1, "rating": "thumbs_up"}]},
+    )
+    assert response.status_code == 401
+
+
+def test_buffered_batch_is_written_on_shutdown(owner_id, auth_headers) -> None:
+    own_message, _ = _seed(owner_id)
+    with TestClient(app) as client:
+        response = client.post(
+            "/feedback/batch?buffered=true",
+            json={"items": [{"message_id": own_message, "rating": "thumbs_up"}]},
+            headers=auth_headers,
+        )
+        assert response.json()["buffered"] is True
+    assert len(_feedback_rows()) == 1
@@ -0,0 +1,164 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.db import sqlite as sqlite_db
+from app.main import app
+from app.routes import chat as chat_route
+from app.services.idempotency import IdempotencyEntry, IdempotencyRegistry
+from app.services.resilience import LLMUnavailableError
+
+
+class _SlowLLM:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def chat_completions(self, messages, max_tokens, temperature=0.8):
+        self.calls += 1
+        await asyncio.sleep(0.2)
+        return {"choices": [{"message": {"content": f"reply {self.calls}"}}]}
+
+    async def stream_chat_completions(self, messages, max_tokens, temperature=0.8):
+        self.calls += 1
+        for word in ("one ", "two ", "three"):
+            await asyncio.sleep(0.05)
+            yield ("delta", word)
+        yield ("done", "")
+
+
+class _FlakyStreamingLLM:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def stream_chat_completions(self, messages, max_tokens, temperature=0.8):
+        self.calls += 1
+        if self.calls == 1:
+            raise LLMUnavailableError("backend down")
+        yield ("delta", "back")
+        yield ("done", "")
+
+
+@pytest.fixture(autouse=True)
+def _fresh_registry(monkeypatch):
+    monkeypatch.setattr(chat_route, "idempotency_registry", IdempotencyRegistry(ttl_seconds=60, max_entries=10))
+
+
+def _message_count(conversation_id: str) -> int:
+    return sqlite_db.get_connection().execute(
+        "SELECT COUNT(*) FROM messages WHERE conversation_id = ?",
+        (conversation_id,),
+    ).fetchone()[0]
+
+
+def _post_concurrently(client, payload, headers, count=3):
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        return list(pool.map(lambda _: client.post("/chat", json=payload, headers=headers), range(count)))
+
+
+def test_concurrent_retries_share_one_generation(auth_headers, monkeypatch) -> None:
+    headers = {**auth_headers, "Idempotency-Key": "turn-1"}
+    llm = _SlowLLM()
+    monkeypatch.setattr(chat_route, "llm_client", llm)
+    payload = {"conversation_id": "retry", "messages": [{"role": "user", "content": "hi"}], "stream": False}
+
+    with TestClient(app) as client:
+        responses = _post_concurrently(client, payload, headers)
+        late = client.post("/chat", json=payload, headers=headers)
+
+    assert llm.calls == 1
+    assert {response.json()["response"]["content"] for response in [*responses, late]} == {"reply 1"}
+    assert late.headers["Idempotent-Replayed"] == "true"
+    assert _message_count("retry") == 2
+
+
+def test_streaming_followers_replay_then_follow(auth_headers, monkeypatch) -> None:
+    headers = {**auth_headers, "Idempotency-Key": "turn-2"}
+    llm = _SlowLLM()
+    monkeypatch.setattr(chat_route, "llm_client", llm)
+    payload = {"conversation_id": "streamed", "messages": [{"role": "user", "content": "hi"}], "stream": True}
+
+    with TestClient(app) as client:
+        responses = _post_concurrently(client, payload, headers)
+        late = client.post("/chat", json=payload, headers=headers)
+
+    assert llm.calls == 1
+    bodies = {response.text for response in [*responses, late]}
+    assert len(bodies) == 1
+    assert "data: three" in bodies.pop()
+    assert _message_count("streamed") == 2
+
+
+def test_key_reuse_with_different_body_is_rejected(auth_headers, monkeypatch) -> None:
+    headers = {**auth_headers, "Idempotency-Key": "turn-3"}
+    monkeypatch.setattr(chat_route, "llm_client", _SlowLLM())
+
+    with TestClient(app) as client:
+        first = client.post("/chat", json={"messages": [{"role": "user", "content": "hi"}]}, headers=headers)
+        second = client.post("/chat", json={"messages": [{"role": "user", "content": "bye"}]}, headers=headers)
+
+    assert first.status_code == 200
+    assert second.status_code == 422
+    assert second.json()["detail"] == "idempotency_key_reused"
+
+
+def test_streamed_llm_unavailable_is_not_replayed(auth_headers, monkeypatch) -> None:
+    headers = {**auth_headers, "Idempotency-Key": "turn-4"}
+    llm = _FlakyStreamingLLM()
+    monkeypatch.setattr(chat_route, "llm_client", llm)
+    payload = {"conversation_id": "flaky", "messages": [{"role": "user", "content": "hi"}], "stream": True}
+
+    with TestClient(app) as client:
+        first = client.post("/chat", json=payload, headers=headers)
+        retry = client.post("/chat", json=payload, headers=headers)
+
+    assert "llm_unavailable" in first.text
+    assert llm.calls == 2
+    assert "data: back" in retry.text
+    assert "Idempotent-Replayed" not in retry.headers
+
+
+def test_idempotent_stream_is_buffered_once(auth_headers, monkeypatch) -> None:
+    headers = {**auth_headers, "Idempotency-Key": "turn-5"}
+    monkeypatch.setattr(chat_route, "llm_client", _SlowLLM())
+    wrapped = []
+    real_buffered = chat_route.buffered
+
+    def counting_buffered(body, max_frames, policy):
+        wrapped.append(body)
+        return real_buffered(body, max_frames, policy)
+
+    monkeypatch.setattr(chat_route, "buffered", counting_buffered)
+    payload = {"conversation_id": "once", "messages": [{"role": "user", "content": "hi"}], "stream": True}
+
+    with TestClient(app) as client:
+        response = client.post("/chat", json=payload, headers=headers)
+
+    assert "data: three" in response.text
+    assert len(wrapped) == 1
+
+
+def test_finished_stream_is_kept_as_one_payload() -> None:
+    async def scenario():
+        entry = IdempotencyEntry("fingerprint")
+        gate = asyncio.Event()
+
+        async def body():
+            yield "data: one\n\n"
+            await gate.wait()
+            yield "data: two\n\n"
+
+        finished = []
+        entry.start_stream(body(), finished.append)
+        early = entry.follow()
+        first = await early.__anext__()
+        gate.set()
+        rest = [frame async for frame in early]
+        late = [frame async for frame in entry.follow()]
+        return first, rest, late, finished, entry._frames
+
+    first, rest, late, finished, frames = asyncio.run(scenario())
+    assert first + "".join(rest) == "data: one\n\ndata: two\n\n"
+    assert late == ["data: one\n\ndata: two\n\n"]
+    assert finished == [False] and frames == []
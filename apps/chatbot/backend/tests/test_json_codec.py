@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import json_codec
+
+
+async def _chunks(*parts):
+    for part in parts:
+        yield part
+
+
+def test_byte_lines_survive_chunk_boundaries() -> None:
+    async def collect():
+        stream = _chunks(b'data: {"a"', b': 1}\r\n\ndata: [DO', b"NE]\n", b"tail")
+        return [line async for line in json_codec.iter_byte_lines(stream)]
+
+    assert asyncio.run(collect()) == [b'data: {"a": 1}', b"", b"data: [DONE]", b"tail"]
+
+
+def test_byte_lines_join_a_line_split_into_many_chunks() -> None:
+    payload = b'data: {"content": "' + b"x" * 5000 + b'"}'
+
+    async def collect():
+        stream = _chunks(*(payload[index : index + 7] for index in range(0, len(payload), 7)), b"\r\nnext\n")
+        return [line async for line in json_codec.iter_byte_lines(stream)]
+
+    assert asyncio.run(collect()) == [payload, b"next"]
+
+
+@pytest.mark.parametrize("backend", ["fast", "stdlib"])
+def test_backends_agree_on_encoding_and_errors(monkeypatch, backend) -> None:
+    if backend == "stdlib":
+        monkeypatch.setattr(json_codec, "orjson", None)
+        monkeypatch.setattr(json_codec, "DecodeError", json_codec.json.JSONDecodeError)
+    value = {"content": 'quotes " and émojis 😏', "n": [1, 2.5, None, True]}
+
+    assert json_codec.dumps(value) == '{"content":"quotes \\" and émojis 😏","n":[1,2.5,null,true]}'.encode("utf-8")
+    assert json_codec.loads(memoryview(json_codec.dumps(value))) == value
+    with pytest.raises(json_codec.DecodeError):
+        json_codec.loads(b"{not json")
+    assert json_codec.dumps_str({"score": float("nan"), "range": [float("inf"), 1.5]}) == (
+        '{"score":null,"range":[null,1.5]}'
+    )
+
+
+def test_request_bodies_and_responses_use_the_codec() -> None:
+    client = TestClient(app)
+
+    invalid = client.post("/chat", content=b"{not json", headers={"Content-Type": "application/json"})
+    assert invalid.status_code == 422
+    assert client.get("/health").content == b'{"status":"ok"}'
@@ -0,0 +1,47 @@
+import asyncio
+import json
+
+from app.services.conversation_store import InMemoryConversationStore
+from app.services.message_record import MessageRecord, encode_chat_payload
+from shared.schemas.chat import ChatMessage
+
+
+def test_payload_matches_plain_json_encoding() -> None:
+    messages = [
+        ChatMessage(role="system", content="You are Nyx."),
+        MessageRecord("user", 'quotes " and émojis 😏', 7),
+    ]
+    fields = {"model": "llama", "stream": True, "options": {"temperature": 0.8}}
+
+    body = json.loads(encode_chat_payload(fields, messages))
+
+    assert body == {
+        **fields,
+        "messages": [
+            {"role": "system", "content": "You are Nyx."},
+            {"role": "user", "content": 'quotes " and émojis 😏'},
+        ],
+    }
+
+
+def test_wire_fragment_is_encoded_once_and_roles_are_interned() -> None:
+    first = MessageRecord("".join(["assis", "tant"]), "hi")
+    second = MessageRecord("assistant", "there")
+
+    assert first.role is second.role
+    assert first.wire() is first.wire()
+
+
+def test_store_keeps_compact_records() -> None:
+    store = InMemoryConversationStore()
+    record = MessageRecord("assistant", "hello", 3)
+
+    async def run():
+        await store.upsert("user", "conv", [ChatMessage(role="user", content="hey"), record])
+        return await store.get("user", "conv")
+
+    conversation = asyncio.run(run())
+
+    assert all(isinstance(message, MessageRecord) for message in conversation.messages)
+    assert conversation.messages[1] is record
+    assert not hasattr(record, "__dict__")
@@ -0,0 +1,91 @@
+import json
+import os
+import shutil
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routes import chat as chat_route
+from app.services import persona_loader
+from app.services.persona_loader import PersonaRegistry
+
+_SHARED_PERSONAS = Path(persona_loader.__file__).resolve().parents[5] / "shared" / "persona"
+
+
+class _RecordingLLM:
+    def __init__(self) -> None:
+        self.prompts = []
+
+    async def chat_completions(self, messages, max_tokens, temperature=0.8):
+        self.prompts.append(messages)
+        return {"choices": [{"message": {"content": "ok"}}]}
+
+
+def _persona_dir(tmp_path: Path) -> Path:
+    directory = tmp_path / "personas"
+    directory.mkdir()
+    shutil.copy(_SHARED_PERSONAS / "persona.schema.json", directory)
+    shutil.copy(_SHARED_PERSONAS / "default_persona.json", directory)
+    return directory
+
+
+def _write_persona(directory: Path, persona_id: str, name: str, mtime_ns: int) -> None:
+    data = json.loads((directory / "default_persona.json").read_text(encoding="utf-8"))
+    data.update(name=name, refusal_templates=[f"{name} says no."])
+    path = directory / f"{persona_id}_persona.json"
+    path.write_text(json.dumps(data), encoding="utf-8")
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_registry_hot_reloads_changed_files_and_keeps_last_good_version(tmp_path) -> None:
+    directory = _persona_dir(tmp_path)
+    _write_persona(directory, "vale", "Vale", 1_000_000_000)
+    registry = PersonaRegistry(directory)
+
+    assert registry.reload() == {"default": "loaded", "vale": "loaded"}
+    vale = registry.get("vale")
+    assert "Vale is an adult (21+)." in vale.system_block
+    assert vale.refusal == "Vale says no."
+    assert registry.reload() == {}
+    assert registry.get("vale") is vale
+
+    _write_persona(directory, "vale", "Valerie", 2_000_000_000)
+    assert registry.reload() == {"vale": "loaded"}
+    assert registry.get("vale").refusal == "Valerie says no."
+
+    (directory / "vale_persona.json").write_text('{"name": "broken"}', encoding="utf-8")
+    assert registry.reload() == {"vale": "invalid"}
+    assert registry.get("vale").refusal == "Valerie says no."
+
+    (directory / "vale_persona.json").unlink()
+    assert registry.reload() == {"vale": "removed"}
+    assert registry.get("vale") is None
+    assert registry.default().persona_id == "default"
+
+
+def test_first_lookup_loads_an_unloaded_registry(tmp_path) -> None:
+    directory = _persona_dir(tmp_path)
+    _write_persona(directory, "vale", "Vale", 1_000_000_000)
+    registry = PersonaRegistry(directory)
+
+    assert registry.get("vale").refusal == "Vale says no."
+    assert registry.default().persona_id == "default"
+    assert registry.reload() == {}
+
+
+def test_chat_selects_persona_by_id(tmp_path, auth_headers, monkeypatch) -> None:
+    directory = _persona_dir(tmp_path)
+    _write_persona(directory, "vale", "Vale", 1_000_000_000)
+    monkeypatch.setattr(chat_route, "persona_registry", PersonaRegistry(directory))
+    llm = _RecordingLLM()
+    monkeypatch.setattr(chat_route, "llm_client", llm)
+    client = TestClient(app)
+
+    payload = {"persona_id": "vale", "messages": [{"role": "user", "content": "hi"}]}
+    assert client.post("/chat", json=payload, headers=auth_headers).status_code == 200
+    assert "Name: Vale" in llm.prompts[-1][0].content
+
+    missing = client.post("/chat", json={**payload, "persona_id": "nobody"}, headers=auth_headers)
+    assert missing.status_code == 404
+    assert missing.json()["detail"] == "persona_not_found"
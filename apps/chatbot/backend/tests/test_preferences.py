@@ -0,0 +1,68 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.db import sqlite as sqlite_db
+from app.main import app
+from app.routes import chat as chat_route
+from app.services import preferences as preferences_module
+from app.services.preferences import generation_budget, preferences_cache
+
+
+class _RecordingLLM:
+    def __init__(self) -> None:
+        self.calls = []
+
+    async def chat_completions(self, messages, max_tokens, temperature=0.8):
+        self.calls.append((messages, max_tokens))
+        return {"choices": [{"message": {"content": "ok"}}]}
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache():
+    preferences_cache.clear()
+    yield
+    preferences_cache.clear()
+
+
+def test_preferences_round_trip_and_validation(owner_id, auth_headers) -> None:
+    client = TestClient(app)
+
+    assert client.get("/preferences").status_code == 401
+    assert client.get("/preferences", headers=auth_headers).json() == {
+        "verbosity": None,
+        "emoji_level": None,
+        "nsfw_intensity": None,
+    }
+    assert client.put("/preferences", json={"verbosity": "chatty"}, headers=auth_headers).status_code == 422
+
+    response = client.put("/preferences", json={"verbosity": "short", "emoji_level": "low"}, headers=auth_headers)
+    assert response.status_code == 200
+    assert client.get("/preferences", headers=auth_headers).json()["verbosity"] == "short"
+    assert sqlite_db.get_user_preferences(owner_id)["emoji_level"] == "low"
+
+
+def test_verbosity_maps_to_token_cap() -> None:
+    settings = preferences_module.settings
+    assert generation_budget({}).max_tokens == settings.llm_max_tokens_default
+    assert generation_budget({"verbosity": "short"}).max_tokens == settings.verbosity_short_max_tokens
+    assert generation_budget({"verbosity": "long"}).max_tokens == settings.verbosity_long_max_tokens
+    assert generation_budget({"verbosity": "normal"}).instruction is None
+
+
+def test_chat_uses_cached_preferences_for_budget_and_prompt(owner_id, auth_headers, monkeypatch) -> None:
+    llm = _RecordingLLM()
+    monkeypatch.setattr(chat_route, "llm_client", llm)
+    client = TestClient(app)
+    client.put("/preferences", json={"verbosity": "short"}, headers=auth_headers)
+
+    reads = []
+    real_read = preferences_module.get_user_preferences
+    monkeypatch.setattr(preferences_module, "get_user_preferences", lambda uid: reads.append(uid) or real_read(uid))
+    for turn in range(2):
+        payload = {"conversation_id": "prefs", "messages": [{"role": "user", "content": f"hi {turn}"}]}
+        assert client.post("/chat", json=payload, headers=auth_headers).status_code == 200
+
+    messages, max_tokens = llm.calls[-1]
+    assert max_tokens == preferences_module.settings.verbosity_short_max_tokens
+    assert "Keep replies short" in messages[0].content
+    assert reads == []
@@ -0,0 +1,65 @@
+import asyncio
+import dataclasses
+import time
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routes import admin as admin_route
+from app.services.profiler import SamplingProfiler, render_collapsed, top_frames
+
+
+def _busy_route_work(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def _busy_other_work(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_route_scoped_profile_keeps_only_tagged_tasks_and_their_children() -> None:
+    profiler = SamplingProfiler()
+
+    async def scenario():
+        session = asyncio.create_task(profiler.profile(0.5, 1, route_prefix="/chat"))
+        await asyncio.sleep(0.01)
+
+        async def child():
+            _busy_route_work(0.1)
+
+        async def request():
+            profiler.tag_current_task()
+            await asyncio.create_task(child())
+
+        async def unrelated():
+            _busy_other_work(0.1)
+
+        await asyncio.gather(request(), unrelated())
+        return await session
+
+    stacks = asyncio.run(scenario())
+    folded = render_collapsed(stacks)
+    assert "_busy_route_work" in folded
+    assert "_busy_other_work" not in folded
+    assert all(stack.startswith("/chat;") for stack in stacks)
+    assert top_frames(stacks)[0]["samples"] > 0
+
+
+def test_profile_endpoint_requires_admin_token(monkeypatch) -> None:
+    client = TestClient(app)
+    assert client.post("/admin/profile").status_code == 404
+
+    monkeypatch.setattr(admin_route, "settings", dataclasses.replace(admin_route.settings, admin_token="s3cret"))
+    assert client.post("/admin/profile", headers={"X-Admin-Token": "nope"}).status_code == 403
+    too_long = client.post("/admin/profile?seconds=3600", headers={"X-Admin-Token": "s3cret"})
+    assert too_long.status_code == 422
+
+    response = client.post("/admin/profile?seconds=0.2&interval_ms=1", headers={"X-Admin-Token": "s3cret"})
+    assert response.status_code == 200
+    assert response.headers["content-disposition"].startswith("attachment;")
+    assert int(response.headers["x-profile-samples"]) > 0
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in response.text.splitlines())
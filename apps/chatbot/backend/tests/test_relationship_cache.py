@@ -0,0 +1,50 @@
+import asyncio
+
+from app.db import sqlite as sqlite_db
+from app.services.relationship_cache import RelationshipStateCache
+
+
+def _seed():
+    sqlite_db.ensure_relationship_state("known", affinity_score=0.4, trust_level="medium")
+
+
+def _stored(conversation_id: str):
+    return sqlite_db.get_relationship_state(conversation_id)
+
+
+def test_reads_are_cached_and_writes_are_deferred_to_flush(db, monkeypatch) -> None:
+    _seed()
+    cache = RelationshipStateCache(max_entries=10, flush_interval_ms=60_000)
+    loads = []
+    real_get = sqlite_db.get_relationship_state
+    monkeypatch.setattr(
+        "app.services.relationship_cache.get_relationship_state",
+        lambda conversation_id: loads.append(conversation_id) or real_get(conversation_id),
+    )
+
+    assert cache.get("known")["trust_level"] == "medium"
+    assert cache.get("new")["trust_level"] == "low"
+    cache.get("known")
+    assert loads == ["known", "new"]
+
+    before = _stored("known")["updated_at"]
+    cache.touch("known")
+    cache.update("new", affinity_score=0.7)
+    assert _stored("new") is None
+    assert _stored("known")["updated_at"] == before
+
+    assert asyncio.run(cache.flush()) == 2
+    assert cache.dirty == 0
+    assert _stored("new")["affinity_score"] == 0.7
+    assert _stored("known")["updated_at"] > before
+
+
+def test_evicted_dirty_entries_still_flush(db) -> None:
+    _seed()
+    cache = RelationshipStateCache(max_entries=2, flush_interval_ms=60_000)
+
+    for index in range(5):
+        cache.update(f"conv-{index}", nicknames=f"nick-{index}")
+
+    assert asyncio.run(cache.flush()) == 5
+    assert [_stored(f"conv-{index}")["nicknames"] for index in range(5)] == [f"nick-{index}" for index in range(5)]
@@ -0,0 +1,115 @@
+import asyncio
+import dataclasses
+import json
+
+import httpx
+
+from app.db import sqlite as sqlite_db
+from app.main import app
+from app.routes import chat as chat_route
+from app.services.auth import create_access_token
+from bench.replay import ReplayConfig, anonymize, diff_reports, load_turns, replay
+
+
+class _EchoLLM:
+    async def chat_completions(self, messages, max_tokens, temperature=0.8):
+        return {"choices": [{"message": {"content": "ok"}}]}
+
+    async def stream_chat_completions(self, messages, max_tokens, temperature=0.8):
+        yield ("delta", "ok")
+        yield ("done", "")
+
+
+def _record(conn, conversation_id, role, content, created_at, ttft=None, duration=None) -> None:
+    conn.execute(
+        "INSERT INTO messages (conversation_id, role, content, created_at, ttft_ms, duration_ms) VALUES (?, ?, ?, ?, ?, ?)",
+        (conversation_id, role, content, created_at, ttft, duration),
+    )
+
+
+def _source_db(path) -> None:
+    sqlite_db.init_db()
+    conn = sqlite_db.get_connection()
+    with conn:
+        _record(conn, "a", "user", "My name is Sam", "2026-01-01T10:00:00")
+        _record(conn, "a", "assistant", "Hi Sam", "2026-01-01T10:00:01", ttft=100, duration=900)
+        _record(conn, "b", "user", "I love old movies", "2026-01-01T10:00:02")
+        _record(conn, "b", "assistant", "Me too", "2026-01-01T10:00:03", ttft=800, duration=800)
+        _record(conn, "a", "user", "Call me 42 times", "2026-01-01T10:00:04")
+
+
+def test_load_turns_reads_every_shard(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(sqlite_db, "_db_path", lambda: tmp_path / "prod-copy.db")
+    monkeypatch.setattr(sqlite_db, "settings", dataclasses.replace(sqlite_db.settings, db_shards=4))
+    sqlite_db.init_db()
+    conversation_ids = [f"conv-{index}" for index in range(8)]
+    for offset, conversation_id in enumerate(conversation_ids):
+        sqlite_db.insert_message(conversation_id, "user", "hello", None, None, "ALLOW")
+        conn = sqlite_db.connection_for(conversation_id)
+        with conn:
+            conn.execute(
+                "UPDATE messages SET created_at = ? WHERE conversation_id = ?",
+                (f"2026-01-01T10:00:0{offset}", conversation_id),
+            )
+
+    turns = load_turns(ReplayConfig(source=str(tmp_path / "prod-copy.db")))
+
+    assert len({sqlite_db.shard_for(conversation_id) for conversation_id in conversation_ids}) > 1
+    assert [turn.offset_s for turn in turns] == [float(offset) for offset in range(8)]
+
+
+def test_anonymize_keeps_shape_and_is_deterministic() -> None:
+    text = "My name is Sam, call me at 555!"
+    masked = anonymize(text, salt="s")
+    assert masked == anonymize(text, salt="s")
+    assert len(masked) == len(text) and masked[-1] == "!" and masked[7] == " "
+    assert "Sam" not in masked and "555" not in masked
+
+
+def test_unsalted_runs_get_distinct_salts(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(sqlite_db, "_db_path", lambda: tmp_path / "prod-copy.db")
+    _source_db(tmp_path)
+    source = str(tmp_path / "prod-copy.db")
+
+    first, second = ReplayConfig(source=source), ReplayConfig(source=source)
+
+    assert first.salt != second.salt
+    assert load_turns(first)[0].content != load_turns(second)[0].content
+    assert load_turns(ReplayConfig(source=source, salt=first.salt)) == load_turns(first)
+
+
+def test_load_turns_keeps_timing_order_and_stream_mode(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(sqlite_db, "_db_path", lambda: tmp_path / "prod-copy.db")
+    _source_db(tmp_path)
+
+    turns = load_turns(ReplayConfig(source=str(tmp_path / "prod-copy.db")))
+
+    assert [turn.offset_s for turn in turns] == [0.0, 2.0, 4.0]
+    assert [turn.stream for turn in turns] == [True, False, True]
+    assert [turn.history_len for turn in turns] == [0, 0, 2]
+    assert turns[0].conversation_id == turns[2].conversation_id != turns[1].conversation_id
+    assert len(turns[1].content) == len("I love old movies")
+
+
+def test_replay_reports_and_diffs(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(sqlite_db, "_db_path", lambda: tmp_path / "prod-copy.db")
+    _source_db(tmp_path)
+    user_id = sqlite_db.create_user("replayer", "hash")
+    monkeypatch.setattr(chat_route, "llm_client", _EchoLLM())
+    config = ReplayConfig(
+        source=str(tmp_path / "prod-copy.db"),
+        base_url="http://backend",
+        speedup=1000,
+        token=create_access_token(user_id, "replayer"),
+    )
+
+    report = asyncio.run(replay(config, load_turns(config), transport=httpx.ASGITransport(app=app)))
+
+    assert report["succeeded"] == 3
+    assert report["latency_by_history_ms"]["0"]["count"] == 2
+    assert "token" not in json.dumps(report["config"])
+    assert report["config"]["salt"] == config.salt
+    slower = json.loads(json.dumps(report))
+    slower["latency_ms"]["p95"] = report["latency_ms"]["p95"] * 2 + 1
+    flagged = [row["metric"] for row in diff_reports(report, slower) if row["regressed"]]
+    assert flagged == ["latency_ms.p95"]
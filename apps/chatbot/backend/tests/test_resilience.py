@@ -0,0 +1,204 @@
+import asyncio
+import time
+from dataclasses import replace
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routes import chat as chat_route
+from app.services import llm_client as llm_module
+from app.services import resilience
+from app.services.llm_client import LLMClient
+from app.services.resilience import CircuitBreaker, LLMUnavailableError
+from shared.schemas.chat import ChatMessage
+
+_MESSAGES = [ChatMessage(role="user", content="hi")]
+
+
+@pytest.fixture(autouse=True)
+def _fresh_breakers(monkeypatch):
+    monkeypatch.setattr(resilience, "_breakers", {})
+
+
+def _tuned_settings(monkeypatch, **overrides) -> None:
+    monkeypatch.setattr(llm_module, "settings", replace(llm_module.settings, **overrides))
+
+
+def test_breaker_opens_fails_fast_and_recovers_through_one_probe() -> None:
+    breaker = CircuitBreaker("gpu", failure_threshold=2, reset_seconds=0.05)
+    breaker.record_failure()
+    breaker.check()
+    breaker.record_failure()
+    with pytest.raises(LLMUnavailableError):
+        breaker.check()
+
+    time.sleep(0.06)
+    breaker.check()
+    with pytest.raises(LLMUnavailableError):
+        breaker.check()
+    breaker.record_success()
+    breaker.check()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_unreachable_backend_retries_then_short_circuits(monkeypatch) -> None:
+    _tuned_settings(
+        monkeypatch,
+        llm_connect_retries=1,
+        llm_retry_backoff_ms=1,
+        llm_breaker_failure_threshold=1,
+        llm_breaker_reset_seconds=60,
+    )
+    client = LLMClient()
+    client._api_mode = "openai"
+    client._base_url = "http://127.0.0.1:1"
+    client._backend_id = "down"
+
+    with pytest.raises(LLMUnavailableError):
+        asyncio.run(client.chat_completions(_MESSAGES, max_tokens=8))
+    # Both connect attempts belong to one call, so they count as one breaker failure.
+    assert client._breaker().state == CircuitBreaker.OPEN
+    started = time.perf_counter()
+    with pytest.raises(LLMUnavailableError):
+        asyncio.run(client.chat_completions(_MESSAGES, max_tokens=8))
+    assert time.perf_counter() - started < 0.05
+    assert client.limiter.in_flight == 0
+
+
+def test_slow_call_is_hedged(monkeypatch) -> None:
+    _tuned_settings(monkeypatch, llm_hedge_enabled=True, llm_hedge_min_samples=5)
+    backend = FastAPI()
+    calls = []
+
+    @backend.post("/v1/chat/completions")
+    async def completions():
+        calls.append(time.perf_counter())
+        if len(calls) == 1:
+            await asyncio.sleep(2)
+        return {"choices": [{"message": {"content": f"call {len(calls)}"}}]}
+
+    transport = httpx.ASGITransport(app=backend)
+    real_client = httpx.AsyncClient
+    monkeypatch.setattr(llm_module.httpx, "AsyncClient", lambda **kwargs: real_client(transport=transport, **kwargs))
+    client = LLMClient()
+    client._api_mode = "openai"
+    client._base_url = "http://mock/v1"
+    for _ in range(10):
+        client._latency.add(0.02)
+
+    started = time.perf_counter()
+    response = asyncio.run(client.chat_completions(_MESSAGES, max_tokens=8))
+
+    assert response["choices"][0]["message"]["content"] == "call 2"
+    assert time.perf_counter() - started < 1
+    assert len(calls) == 2
+
+
+def test_batch_calls_are_not_hedged_or_sampled(monkeypatch) -> None:
+    _tuned_settings(monkeypatch, llm_hedge_enabled=True, llm_hedge_min_samples=5)
+    backend = FastAPI()
+    calls = []
+
+    @backend.post("/v1/chat/completions")
+    async def completions():
+        calls.append(time.perf_counter())
+        await asyncio.sleep(0.2)
+        return {"choices": [{"message": {"content": "slow"}}]}
+
+    transport = httpx.ASGITransport(app=backend)
+    real_client = httpx.AsyncClient
+    monkeypatch.setattr(llm_module.httpx, "AsyncClient", lambda **kwargs: real_client(transport=transport, **kwargs))
+    client = LLMClient()
+    client._api_mode = "openai"
+    client._base_url = "http://mock/v1"
+    for _ in range(10):
+        client._latency.add(0.02)
+
+    asyncio.run(client.chat_completions(_MESSAGES, max_tokens=8, priority="batch"))
+
+    assert len(calls) == 1
+    assert len(client._latency) == 10
+
+
+def test_hedged_failure_counts_once_against_the_breaker(monkeypatch) -> None:
+    _tuned_settings(
+        monkeypatch,
+        llm_hedge_enabled=True,
+        llm_hedge_min_samples=5,
+        llm_breaker_failure_threshold=2,
+        llm_breaker_reset_seconds=60,
+    )
+    backend = FastAPI()
+    calls = []
+
+    @backend.post("/v1/chat/completions")
+    async def completions():
+        calls.append(time.perf_counter())
+        await asyncio.sleep(0.1)
+        return JSONResponse({"error": "overloaded"}, status_code=500)
+
+    transport = httpx.ASGITransport(app=backend)
+    real_client = httpx.AsyncClient
+    monkeypatch.setattr(llm_module.httpx, "AsyncClient", lambda **kwargs: real_client(transport=transport, **kwargs))
+    client = LLMClient()
+    client._api_mode = "openai"
+    client._base_url = "http://mock/v1"
+    for _ in range(10):
+        client._latency.add(0.02)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(client.chat_completions(_MESSAGES, max_tokens=8))
+
+    assert len(calls) == 2
+    assert client._breaker().state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        LLMUnavailableError("circuit open"),
+        httpx.ReadTimeout("read timed out"),
+        httpx.HTTPStatusError(
+            "bad gateway",
+            request=httpx.Request("POST", "http://llm/chat"),
+            response=httpx.Response(502, request=httpx.Request("POST", "http://llm/chat")),
+        ),
+    ],
+)
+def test_route_maps_unavailable_backend_to_503(auth_headers, monkeypatch, error) -> None:
+    class _DownLLM:
+        async def chat_completions(self, messages, max_tokens, temperature=0.8):
+            raise error
+
+    monkeypatch.setattr(chat_route, "llm_client", _DownLLM())
+
+    response = TestClient(app).post(
+        "/chat",
+        json={"messages": [{"role": "user", "content": "hi"}]},
+        headers=auth_headers,
+    )
+
+    assert response.status_code == 503
+    assert response.json()["detail"] == "llm_unavailable"
+
+
+def test_stream_timeout_ends_with_llm_unavailable(auth_headers, monkeypatch) -> None:
+    class _StallingLLM:
+        async def stream_chat_completions(self, messages, max_tokens, temperature=0.8):
+            yield ("delta", "Hel")
+            raise httpx.ReadTimeout("read timed out")
+
+    monkeypatch.setattr(chat_route, "llm_client", _StallingLLM())
+
+    response = TestClient(app).post(
+        "/chat",
+        json={"messages": [{"role": "user", "content": "hi"}], "stream": True},
+        headers=auth_headers,
+    )
+
+    assert response.status_code == 200
+    assert response.text.rstrip().endswith('event: error\ndata: {"error":"llm_unavailable"}')
@@ -0,0 +1,96 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+from app.db import sqlite as sqlite_db
+from app.db.archive import archive_dir, load_archived_messages
+from app.main import app
+from app.services.retention import find_idle_conversations, run_retention
+
+
+def _seed(owner_id):
+    sqlite_db.create_conversation("cold", owner_id)
+    ids = [sqlite_db.insert_message("cold", "user", f"turn {i}", None, None, "ALLOW") for i in range(4)]
+    sqlite_db.insert_memory("cold", "preference", "old movies", 0.5)
+    return ids
+
+
+def _hot_count(table: str) -> int:
+    return sqlite_db.get_connection().execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_idle_conversations_move_to_segments(owner_id) -> None:
+    ids = _seed(owner_id)
+
+    assert run_retention(idle_days=30, batch_size=10) == 0
+    archived = run_retention(idle_days=30, batch_size=10, now=datetime.utcnow() + timedelta(days=31))
+
+    assert archived == 1
+    assert _hot_count("messages") == 0
+    assert _hot_count("memories") == 0
+    assert list(archive_dir().glob("segment-*.jsonl.gz"))
+    assert [message["id"] for message in load_archived_messages("cold")] == ids
+
+
+def test_history_reads_fall_back_to_archive(owner_id, auth_headers) -> None:
+    ids = _seed(owner_id)
+    run_retention(idle_days=30, batch_size=10, now=datetime.utcnow() + timedelta(days=31))
+    new_id = sqlite_db.insert_message("cold", "user", "back again", None, None, "ALLOW")
+    client = TestClient(app)
+
+    page = client.get("/conversations/cold/messages?limit=3", headers=auth_headers).json()
+    assert [item["id"] for item in page["items"]] == ids[:3]
+    rest = client.get(f"/conversations/cold/messages?after={page['next_cursor']}", headers=auth_headers).json()
+    assert [item["id"] for item in rest["items"]] == [ids[3], new_id]
+
+    listing = client.get("/conversations", headers=auth_headers).json()
+    assert listing["items"][0]["message_count"] == 5
+    assert listing["items"][0]["last_message_id"] == new_id
+
+
+def test_idle_scan_pages_through_conversations(owner_id) -> None:
+    for name in ("a", "b", "c"):
+        sqlite_db.create_conversation(name, owner_id)
+        sqlite_db.insert_message(name, "user", "hi", None, None, "ALLOW")
+    conn = sqlite_db.connection_for("a")
+    later = datetime.utcnow() + timedelta(days=31)
+
+    assert find_idle_conversations(conn, 30, 2, later) == (["a", "b"], "b")
+    assert find_idle_conversations(conn, 30, 2, later, "b") == (["c"], "c")
+    assert find_idle_conversations(conn, 30, 2, later, "c") == ([], None)
+    assert find_idle_conversations(conn, 30, 2, None) == ([], "b")
+
+
+def test_archived_history_pages_across_members(owner_id, auth_headers) -> None:
+    sqlite_db.create_conversation("cold", owner_id)
+    ids = []
+    for _ in range(2):
+        ids += [sqlite_db.insert_message("cold", "user", f"turn {len(ids) + i}", None, None, "ALLOW") for i in range(3)]
+        run_retention(idle_days=30, batch_size=10, now=datetime.utcnow() + timedelta(days=31))
+    client = TestClient(app)
+
+    page = client.get("/conversations/cold/messages?limit=4", headers=auth_headers).json()
+    assert [item["id"] for item in page["items"]] == ids[:4]
+    rest = client.get(f"/conversations/cold/messages?after={page['next_cursor']}", headers=auth_headers).json()
+    assert [item["id"] for item in rest["items"]] == ids[4:]
+    recent = client.get(f"/conversations/cold/messages?before={ids[5]}&limit=4", headers=auth_headers).json()
+    assert [item["id"] for item in recent["items"]] == ids[1:5]
+
+
+def test_init_db_migrates_a_database_without_auto_vacuum(tmp_path, monkeypatch) -> None:
+    path = tmp_path / "legacy.db"
+    legacy = sqlite3.connect(path)
+    legacy.execute("CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL, "
+                   "password_hash TEXT NOT NULL, created_at TEXT NOT NULL)")
+    legacy.execute("INSERT INTO users (username, password_hash, created_at) VALUES ('old', 'hash', '2020-01-01')")
+    legacy.commit()
+    assert legacy.execute("PRAGMA auto_vacuum").fetchone()[0] == 0
+    legacy.close()
+    monkeypatch.setattr(sqlite_db, "_db_path", lambda: path)
+
+    sqlite_db.init_db()
+
+    conn = sqlite_db.get_connection()
+    assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    assert conn.execute("SELECT username FROM users").fetchall()[0]["username"] == "old"
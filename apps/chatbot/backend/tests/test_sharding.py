@@ -0,0 +1,79 @@
+import dataclasses
+
+from app.db import rebalance as rebalance_module
+from app.db import sqlite as sqlite_db
+from app.services.dataset_export import ExportFilters, export_dataset
+
+
+def _use_shards(tmp_path, monkeypatch, shards: int) -> None:
+    monkeypatch.setattr(sqlite_db, "_db_path", lambda: tmp_path / "memory.db")
+    monkeypatch.setattr(sqlite_db, "settings", dataclasses.replace(sqlite_db.settings, db_shards=shards))
+    sqlite_db.init_db()
+
+
+def _conversation_ids(count: int):
+    return [f"conv-{index:03d}" for index in range(count)]
+
+
+def test_conversations_spread_over_shards_with_unique_message_ids(tmp_path, monkeypatch) -> None:
+    _use_shards(tmp_path, monkeypatch, 4)
+    user_id = sqlite_db.create_user("owner", "hash")
+    ids = []
+    for conversation_id in _conversation_ids(12):
+        sqlite_db.create_conversation(conversation_id, user_id)
+        ids.extend(sqlite_db.insert_message(conversation_id, "user", "hi", None, None, "ALLOW") for _ in range(2))
+
+    assert sorted(path.name for _, path in sqlite_db.existing_shards()) == [
+        "memory.db",
+        "memory.shard0.db",
+        "memory.shard1.db",
+        "memory.shard2.db",
+        "memory.shard3.db",
+    ]
+    assert len({sqlite_db.shard_for(conversation_id) for conversation_id in _conversation_ids(12)}) > 1
+    assert len(set(ids)) == len(ids)
+    assert all(message_id % 1024 == sqlite_db.shard_for(f"conv-{index // 2:03d}") for index, message_id in enumerate(ids))
+
+    page = sqlite_db.list_conversations(user_id, after=None, limit=5)
+    assert [row["id"] for row in page] == _conversation_ids(5)
+    assert sqlite_db.get_owned_message_ids(user_id, ids) == set(ids)
+    assert [row["id"] for row in sqlite_db.list_messages("conv-007")] == ids[14:16]
+
+
+def test_rebalance_moves_conversations_and_keeps_message_ids(tmp_path, monkeypatch) -> None:
+    _use_shards(tmp_path, monkeypatch, 1)
+    user_id = sqlite_db.create_user("owner", "hash")
+    ids = {}
+    for conversation_id in _conversation_ids(8):
+        sqlite_db.create_conversation(conversation_id, user_id)
+        ids[conversation_id] = sqlite_db.insert_message(conversation_id, "user", "hi", None, None, "ALLOW")
+        sqlite_db.insert_memory(conversation_id, "fact", "likes tea", 0.5)
+    sqlite_db.insert_feedback(ids["conv-003"], user_id, "thumbs_up", None, None)
+
+    monkeypatch.setattr(sqlite_db, "settings", dataclasses.replace(sqlite_db.settings, db_shards=3))
+    planned = rebalance_module.rebalance(dry_run=True)
+    moved = rebalance_module.rebalance()
+    assert planned == moved and sum(moved.values()) > 0
+    assert rebalance_module.rebalance() == {}
+
+    for conversation_id, message_id in ids.items():
+        assert sqlite_db.get_conversation(conversation_id)["user_id"] == user_id
+        assert [row["id"] for row in sqlite_db.list_messages(conversation_id)] == [message_id]
+        assert len(sqlite_db.get_recent_memories(conversation_id)) == 1
+    assert sqlite_db.get_owned_message_ids(user_id, ids.values()) == set(ids.values())
+
+    checkpoint = export_dataset(tmp_path / "memory.db", tmp_path / "export", ExportFilters(rating="thumbs_up"), "jsonl")
+    assert checkpoint.rows_written == 1
+
+
+def test_usage_is_aggregated_in_the_main_database(tmp_path, monkeypatch) -> None:
+    _use_shards(tmp_path, monkeypatch, 4)
+    user_id = sqlite_db.create_user("owner", "hash")
+    for _ in range(6):
+        sqlite_db.record_user_usage(user_id, 10, 2)
+
+    for _, conn in sqlite_db.all_shard_connections():
+        if conn is not sqlite_db.get_connection():
+            assert conn.execute("SELECT COUNT(*) FROM user_usage").fetchone()[0] == 0
+    usage = sqlite_db.get_user_usage(user_id)
+    assert (usage["requests"], usage["prompt_tokens"], usage["completion_tokens"]) == (6, 60, 12)
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from app.services.rate_limit import SharedRateLimiter
+from app.services.shared_state import GlobalConcurrencyBudget, RedisSharedState, SqliteSharedState
+from bench.resp_server import RespServer
+
+
+async def _exercise(backend) -> None:
+    limiter = SharedRateLimiter(backend, max_per_minute=2, burst=1)
+    assert [await limiter.allow("user-a") for _ in range(4)] == [True, True, True, False]
+    assert await limiter.allow("user-b")
+
+    first = await backend.acquire_slot("llm", 2, 5.0)
+    second = await backend.acquire_slot("llm", 2, 5.0)
+    assert first and second
+    assert await backend.acquire_slot("llm", 2, 5.0) is None
+    await backend.release_slot("llm", first)
+    third = await backend.acquire_slot("llm", 2, 5.0)
+    assert third is not None
+
+    await backend.release_slot("llm", second)
+    await backend.release_slot("llm", third)
+
+    # A lease that expired and was handed on must not be renewed or released by its old holder.
+    stale = await backend.acquire_slot("short", 1, 0.05)
+    await asyncio.sleep(0.1)
+    fresh = await backend.acquire_slot("short", 1, 5.0)
+    assert stale and fresh
+    await backend.renew_slot("short", stale, 5.0)
+    await backend.release_slot("short", stale)
+    assert await backend.acquire_slot("short", 1, 5.0) is None
+    await backend.release_slot("short", fresh)
+
+    budget = GlobalConcurrencyBudget(backend, "budget", 1, ttl_seconds=5.0)
+    active = 0
+    peak = 0
+
+    async def call() -> None:
+        nonlocal active, peak
+        async with budget.slot():
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+
+    await asyncio.gather(*(call() for _ in range(4)))
+    assert peak == 1
+
+
+def test_sqlite_backend_shares_limits_between_instances(tmp_path) -> None:
+    async def run() -> None:
+        await _exercise(SqliteSharedState(tmp_path / "state.db"))
+        # A second instance over the same file sees the first one's counters.
+        other = SqliteSharedState(tmp_path / "state.db")
+        assert not await SharedRateLimiter(other, max_per_minute=2, burst=1).allow("user-a")
+
+    asyncio.run(run())
+
+
+def test_redis_backend_against_resp_stand_in() -> None:
+    async def run() -> None:
+        server = RespServer()
+        await server.start()
+        try:
+            await _exercise(RedisSharedState(f"redis://127.0.0.1:{server.port}/0", prefix="test"))
+        finally:
+            await server.stop()
+
+    asyncio.run(run())
+
+
+def test_unreachable_backend_fails_open() -> None:
+    async def run() -> None:
+        backend = RedisSharedState("redis://127.0.0.1:1/0")
+        assert await SharedRateLimiter(backend, max_per_minute=1, burst=0).allow("user-a")
+        async with GlobalConcurrencyBudget(backend, "llm", 1, ttl_seconds=1.0).slot():
+            pass
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("kind", ["memory", ""])
+def test_memory_backend_keeps_process_local_limiter(kind) -> None:
+    from app.services.shared_state import build_shared_state_backend
+
+    assert build_shared_state_backend(kind) is None
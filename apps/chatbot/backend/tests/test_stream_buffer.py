@@ -0,0 +1,99 @@
+import asyncio
+import json
+
+from app.services.stream_buffer import StreamBuffer
+from app.services.stream_resume import StreamRegistry, parse_last_event_id
+
+
+def _run_with_stalled_client(policy: str):
+    """Upstream emits everything before the client reads; returns (frames the client got, buffer high water)."""
+
+    async def scenario():
+        upstream_done = asyncio.Event()
+
+        async def source():
+            yield "event: meta\ndata: {}\n\n"
+            for word in ("a", "b", "c", "d", "e"):
+                yield f"id: g:{word}\ndata: {word}\n\n"
+            yield "event: done\ndata: [DONE]\n\n"
+            upstream_done.set()
+
+        stream = StreamBuffer(source(), max_frames=3, policy=policy)
+        drain = stream.drain()
+        first = asyncio.create_task(drain.__anext__())
+        # The client has not read anything yet; the upstream must still run to completion on its own.
+        await asyncio.wait_for(upstream_done.wait(), timeout=1)
+        return [await first] + [frame async for frame in drain], stream.high_water
+
+    return asyncio.run(scenario())
+
+
+def test_coalesce_merges_overflowing_deltas_and_keeps_events() -> None:
+    frames, high_water = _run_with_stalled_client("coalesce")
+    assert frames == [
+        "event: meta\ndata: {}\n\n",
+        "id: g:a\ndata: a\n\n",
+        "id: g:e\ndata: bcde\n\n",
+        "event: done\ndata: [DONE]\n\n",
+    ]
+    assert high_water == 4
+
+
+def test_drop_discards_overflowing_deltas() -> None:
+    frames, _ = _run_with_stalled_client("drop")
+    assert [frame.split("data: ")[1].strip() for frame in frames] == ["{}", "a", "b", "[DONE]"]
+
+
+def test_disconnect_keeps_events_and_reports_where_the_client_stopped() -> None:
+    frames, _ = _run_with_stalled_client("disconnect")
+    assert frames == [
+        "event: meta\ndata: {}\n\n",
+        'event: error\ndata: {"error":"slow_client","last_event_id":null}\n\n',
+    ]
+
+
+def test_disconnected_slow_client_keeps_events_and_can_resume() -> None:
+    async def scenario():
+        async def body():
+            yield 'event: meta\ndata: {"generation_id": "gen"}\n\n'
+            for word in ("a", "b", "c", "d", "e"):
+                yield f"data: {word}\n\n"
+            yield "event: done\ndata: [DONE]\n\n"
+
+        registry = StreamRegistry(grace_seconds=30, max_frames=16, max_generations=8)
+        generation = registry.start("gen", user_id=1, body=body())
+        drain = StreamBuffer(generation.follow(), max_frames=3, policy="disconnect").drain()
+        first = asyncio.create_task(drain.__anext__())
+        while not generation.done:
+            await asyncio.sleep(0)
+        frames = [await first] + [frame async for frame in drain]
+
+        error = json.loads(frames[-1].split("data: ", 1)[1])
+        last_seq = parse_last_event_id(error["last_event_id"])
+        resumed = registry.resume("gen", user_id=1, last_seq=last_seq)
+        return frames, error, [frame async for frame in resumed.follow(last_seq)]
+
+    frames, error, replayed = asyncio.run(scenario())
+    assert frames[0] == 'id: gen:0\nevent: meta\ndata: {"generation_id": "gen"}\n\n'
+    assert error == {"error": "slow_client", "last_event_id": "gen:0"}
+    assert "".join(frame.split("data: ", 1)[1].strip() for frame in replayed[:-1]) == "abcde"
+    assert replayed[-1].endswith("event: done\ndata: [DONE]\n\n")
+
+
+def test_closing_the_response_cancels_the_upstream() -> None:
+    async def scenario():
+        cancelled = asyncio.Event()
+
+        async def source():
+            try:
+                yield "data: a\n\n"
+                await asyncio.sleep(30)
+            finally:
+                cancelled.set()
+
+        drain = StreamBuffer(source(), max_frames=8).drain()
+        assert await drain.__anext__() == "data: a\n\n"
+        await drain.aclose()
+        await asyncio.wait_for(cancelled.wait(), timeout=1)
+
+    asyncio.run(scenario())
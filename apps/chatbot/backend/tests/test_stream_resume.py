@@ -0,0 +1,96 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.db import sqlite as sqlite_db
+from app.main import app
+from app.routes import chat as chat_route
+from app.services.stream_resume import ResumeGapError, StreamRegistry, parse_last_event_id
+
+
+class _StreamingLLM:
+    async def stream_chat_completions(self, messages, max_tokens, temperature=0.8):
+        for word in ("one ", "two ", "three"):
+            yield ("delta", word)
+        yield ("done", "")
+
+
+def _frames(text: str):
+    return [frame for frame in text.split("\n\n") if frame.strip()]
+
+
+def _frame_id(frame: str) -> str:
+    return next(line[len("id: "):] for line in frame.splitlines() if line.startswith("id: "))
+
+
+def test_dropped_follower_resumes_from_last_event_id() -> None:
+    async def scenario():
+        release = asyncio.Event()
+
+        async def body():
+            yield "data: a\n\n"
+            yield "data: b\n\n"
+            await release.wait()
+            yield "data: c\n\n"
+
+        registry = StreamRegistry(grace_seconds=30, max_frames=16, max_generations=8)
+        generation = registry.start("gen", user_id=1, body=body())
+
+        # The first client reads one frame and goes away; the generation keeps running.
+        first = generation.follow()
+        received = await first.__anext__()
+        await first.aclose()
+        release.set()
+
+        last_seq = parse_last_event_id(_frame_id(received))
+        resumed = registry.resume("gen", user_id=1, last_seq=last_seq)
+        assert registry.resume("gen", user_id=2, last_seq=last_seq) is None
+        return received, [frame async for frame in resumed.follow(last_seq)]
+
+    received, replayed = asyncio.run(scenario())
+    assert received == "id: gen:0\ndata: a\n\n"
+    assert replayed == ["id: gen:1\ndata: b\n\n", "id: gen:2\ndata: c\n\n"]
+
+
+def test_resume_past_the_ring_buffer_is_rejected() -> None:
+    async def scenario():
+        async def body():
+            for index in range(10):
+                yield f"data: {index}\n\n"
+
+        registry = StreamRegistry(grace_seconds=30, max_frames=4, max_generations=8)
+        generation = registry.start("gen", user_id=1, body=body())
+        assert len([frame async for frame in generation.follow(5)]) == 4
+        with pytest.raises(ResumeGapError):
+            registry.resume("gen", user_id=1, last_seq=2)
+
+    asyncio.run(scenario())
+
+
+def test_get_reconnect_replays_missed_deltas_without_regenerating(auth_headers, monkeypatch) -> None:
+    monkeypatch.setattr(chat_route, "llm_client", _StreamingLLM())
+    payload = {"conversation_id": "resume", "messages": [{"role": "user", "content": "count"}], "stream": True}
+
+    with TestClient(app) as client:
+        frames = _frames(client.post("/chat", json=payload, headers=auth_headers).text)
+        meta = json.loads(frames[0].split("data: ", 1)[1])
+        generation_id = meta["generation_id"]
+        first_delta_id = _frame_id(frames[1])
+
+        resumed = client.get(
+            f"/chat/stream/{generation_id}",
+            headers={**auth_headers, "Last-Event-ID": first_delta_id},
+        )
+        missing = client.get("/chat/stream/unknown", headers=auth_headers)
+
+    assert resumed.status_code == 200
+    assert _frames(resumed.text) == frames[2:]
+    assert frames[-1].endswith("event: done\ndata: [DONE]")
+    assert missing.status_code == 404
+    assistant_rows = sqlite_db.get_connection().execute(
+        "SELECT COUNT(*) FROM messages WHERE conversation_id = ? AND role = 'assistant'",
+        ("resume",),
+    ).fetchone()[0]
+    assert assistant_rows == 1
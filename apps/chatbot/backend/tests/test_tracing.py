@@ -0,0 +1,85 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from app.db import sqlite as sqlite_db
+from app.main import app
+from app.routes import chat as chat_route
+from app.services import tracing
+from app.services.auth import create_access_token
+from app.services.tracing import JsonlSpanExporter, NOOP_TRACE, OtlpHttpSpanExporter, Tracer
+
+
+class _CollectingExporter:
+    def __init__(self) -> None:
+        self.spans = []
+
+    def export(self, spans) -> None:
+        self.spans.extend(spans)
+
+    def flush(self, timeout=5.0) -> None:
+        return None
+
+
+class _HeaderCapturingLLM:
+    def __init__(self) -> None:
+        self.traceparent = None
+
+    async def chat_completions(self, messages, max_tokens, temperature=0.8):
+        self.traceparent = tracing.current_trace().headers().get("traceparent")
+        return {"choices": [{"message": {"content": "Hello"}}]}
+
+
+def test_unsampled_tracer_returns_noop() -> None:
+    tracer = Tracer(_CollectingExporter(), sample_rate=0.0)
+    assert tracer.start_trace("chat") is NOOP_TRACE
+
+
+def test_jsonl_exporter_writes_one_line_per_span(tmp_path) -> None:
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(JsonlSpanExporter(path), sample_rate=1.0)
+    trace = tracer.start_trace("chat")
+    with trace.span("auth"):
+        pass
+    trace.finish()
+    tracer.flush()
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["name"] for line in lines] == ["chat", "auth"]
+    assert lines[1]["parent_id"] == lines[0]["span_id"]
+    assert all(line["trace_id"] == trace.trace_id for line in lines)
+
+
+def test_otlp_encoding_carries_parent_ids() -> None:
+    trace = Tracer(_CollectingExporter(), sample_rate=1.0).start_trace("chat")
+    with trace.span("prompt_build"):
+        pass
+    trace.finish()
+    exporter = OtlpHttpSpanExporter.__new__(OtlpHttpSpanExporter)
+    exporter._service_name = "test"
+    encoded = exporter.encode(trace._spans)
+    spans = encoded["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert spans[1]["parentSpanId"] == spans[0]["spanId"]
+
+
+def test_chat_spans_and_trace_header(monkeypatch, tmp_path) -> None:
+    exporter = _CollectingExporter()
+    llm = _HeaderCapturingLLM()
+    monkeypatch.setattr(sqlite_db, "_db_path", lambda: tmp_path / "memory.db")
+    monkeypatch.setattr(chat_route, "tracer", Tracer(exporter, sample_rate=1.0))
+    monkeypatch.setattr(chat_route, "llm_client", llm)
+    client = TestClient(app)
+
+    token = create_access_token(1, "tester")
+    response = client.post(
+        "/chat",
+        json={"messages": [{"role": "user", "content": "Hello"}], "stream": False},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 200
+
+    names = [span.name for span in exporter.spans]
+    for stage in ("chat", "auth", "rate_limit", "safety_pre_llm", "prompt_build", "persistence"):
+        assert stage in names
+    assert llm.traceparent is not None
+    assert exporter.spans[0].trace_id in llm.traceparent
@@ -0,0 +1,90 @@
+import threading
+
+from fastapi.testclient import TestClient
+
+from app.db import sqlite as sqlite_db
+from app.main import app
+from app.routes import chat as chat_route
+from app.services.relationship_cache import relationship_cache
+
+
+class _GatedWritesLLM:
+    """Answers while the user-turn writes are still blocked, proving the two overlap."""
+
+    def __init__(self, release: threading.Event) -> None:
+        self.release = release
+        self.called_before_writes = None
+
+    async def chat_completions(self, messages, max_tokens, temperature=0.8):
+        self.called_before_writes = not self.release.is_set()
+        self.release.set()
+        return {"choices": [{"message": {"content": "Hello"}}]}
+
+    async def stream_chat_completions(self, messages, max_tokens, temperature=0.8):
+        self.called_before_writes = not self.release.is_set()
+        self.release.set()
+        yield ("delta", "Hel")
+        yield ("delta", "lo")
+        yield ("done", "")
+
+
+def _gate_writes(monkeypatch, release: threading.Event) -> None:
+    persist = chat_route._persist_user_turn
+
+    def gated(*args, **kwargs):
+        release.wait(timeout=5)
+        return persist(*args, **kwargs)
+
+    monkeypatch.setattr(chat_route, "_persist_user_turn", gated)
+
+
+def _roles(conversation_id: str):
+    rows = sqlite_db.get_connection().execute(
+        "SELECT role, content FROM messages WHERE conversation_id = ? ORDER BY id",
+        (conversation_id,),
+    ).fetchall()
+    return [(row["role"], row["content"]) for row in rows]
+
+
+def test_llm_call_overlaps_user_turn_writes(auth_headers, monkeypatch) -> None:
+    client = TestClient(app)
+
+    for stream in (False, True):
+        release = threading.Event()
+        dummy = _GatedWritesLLM(release)
+        monkeypatch.setattr(chat_route, "llm_client", dummy)
+        _gate_writes(monkeypatch, release)
+        conversation_id = f"overlap-{stream}"
+        payload = {
+            "conversation_id": conversation_id,
+            "messages": [{"role": "user", "content": "I love old movies"}],
+            "stream": stream,
+        }
+
+        response = client.post("/chat", json=payload, headers=auth_headers)
+
+        assert response.status_code == 200
+        assert dummy.called_before_writes is True
+        assert _roles(conversation_id) == [("user", "I love old movies"), ("assistant", "Hello")]
+        assert relationship_cache.get(conversation_id)["trust_level"] == "low"
+        assert sqlite_db.get_recent_memories(conversation_id)
+
+
+def test_failed_turn_writes_fail_the_request_in_both_modes(auth_headers, monkeypatch) -> None:
+    monkeypatch.setattr(chat_route, "llm_client", _GatedWritesLLM(threading.Event()))
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(chat_route, "_persist_user_turn", broken)
+    client = TestClient(app)
+    payload = {"conversation_id": "broken", "messages": [{"role": "user", "content": "hi"}]}
+
+    response = client.post("/chat", json={**payload, "stream": False}, headers=auth_headers)
+    assert response.status_code == 500
+    assert response.json()["detail"] == "persistence_failed"
+
+    streamed = client.post("/chat", json={**payload, "stream": True}, headers=auth_headers)
+    assert "event: error" in streamed.text
+    assert "event: done" not in streamed.text
+    assert _roles("broken") == []
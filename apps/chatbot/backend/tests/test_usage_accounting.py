@@ -0,0 +1,117 @@
+import asyncio
+from dataclasses import replace
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.db import sqlite as sqlite_db
+from app.main import app
+from app.routes import chat as chat_route
+from app.services import llm_client as llm_module
+from app.services.llm_client import LLMClient
+from app.services.resilience import LLMUnavailableError
+from bench.mock_llm import MockLLMConfig, create_app
+from shared.schemas.chat import ChatMessage
+
+
+class _MeteredLLM:
+    async def chat_completions(self, messages, max_tokens, temperature=0.8):
+        return {
+            "choices": [{"message": {"content": "Hello there"}}],
+            "usage": {
+                "prompt_tokens": 40,
+                "completion_tokens": 2,
+                "ttft_ms": 120.0,
+                "duration_ms": 120.0,
+                "backend_id": "gpu-a",
+            },
+        }
+
+
+class _FailingMidStreamLLM:
+    async def stream_chat_completions(self, messages, max_tokens, temperature=0.8):
+        yield ("delta", "a partial answer that cost real tokens ")
+        raise LLMUnavailableError("backend went away")
+
+
+def _client_against_mock(monkeypatch, api_mode: str) -> LLMClient:
+    transport = httpx.ASGITransport(app=create_app(MockLLMConfig(ttft_ms=0, tokens_per_sec=0, output_tokens=5)))
+    real_client = httpx.AsyncClient
+    monkeypatch.setattr(
+        llm_module.httpx,
+        "AsyncClient",
+        lambda **kwargs: real_client(transport=transport, **kwargs),
+    )
+    client = LLMClient()
+    client._api_mode = api_mode
+    client._base_url = "http://mock" if api_mode == "ollama" else "http://mock/v1"
+    client._backend_id = "mock"
+    return client
+
+
+@pytest.mark.parametrize("api_mode", ["ollama", "openai"])
+def test_client_reports_usage_for_stream_and_non_stream(monkeypatch, api_mode) -> None:
+    client = _client_against_mock(monkeypatch, api_mode)
+    messages = [ChatMessage(role="user", content="one two three")]
+
+    async def run():
+        response = await client.chat_completions(messages, max_tokens=16)
+        events = [event async for event in client.stream_chat_completions(messages, max_tokens=16)]
+        return response, events
+
+    response, events = asyncio.run(run())
+
+    assert response["usage"]["prompt_tokens"] == 3
+    assert response["usage"]["completion_tokens"] == 5
+    assert response["usage"]["duration_ms"] >= 0
+    kinds = [kind for kind, _ in events]
+    assert kinds[-2:] == ["usage", "done"]
+    usage = events[-2][1]
+    assert (usage.prompt_tokens, usage.completion_tokens) == (3, 5)
+    assert usage.ttft_ms is not None and usage.duration_ms >= usage.ttft_ms
+    assert usage.backend_id == "mock"
+
+
+def test_usage_is_stored_on_message_and_aggregated(owner_id, auth_headers, monkeypatch) -> None:
+    monkeypatch.setattr(chat_route, "llm_client", _MeteredLLM())
+    client = TestClient(app)
+
+    for _ in range(2):
+        response = client.post("/chat", json={"messages": [{"role": "user", "content": "hi"}]}, headers=auth_headers)
+        assert response.status_code == 200
+
+    row = sqlite_db.get_connection().execute(
+        "SELECT prompt_tokens, completion_tokens, ttft_ms, duration_ms, backend_id FROM messages WHERE id = ?",
+        (response.json()["message_id"],),
+    ).fetchone()
+    assert tuple(row) == (40, 2, 120.0, 120.0, "gpu-a")
+    usage = sqlite_db.get_user_usage(owner_id)
+    assert (usage["requests"], usage["prompt_tokens"], usage["completion_tokens"]) == (2, 80, 4)
+
+
+def test_token_quota_blocks_before_llm_call(owner_id, auth_headers, monkeypatch) -> None:
+    monkeypatch.setattr(chat_route, "llm_client", _MeteredLLM())
+    monkeypatch.setattr(chat_route, "settings", replace(chat_route.settings, user_daily_token_quota=40))
+    client = TestClient(app)
+    payload = {"messages": [{"role": "user", "content": "hi"}]}
+
+    assert client.post("/chat", json=payload, headers=auth_headers).status_code == 200
+    blocked = client.post("/chat", json=payload, headers=auth_headers)
+
+    assert blocked.status_code == 429
+    assert blocked.json()["detail"] == "token_quota_exceeded"
+    assert sqlite_db.get_user_usage(owner_id)["requests"] == 1
+
+
+def test_stream_that_fails_mid_generation_is_still_metered(owner_id, auth_headers, monkeypatch) -> None:
+    monkeypatch.setattr(chat_route, "llm_client", _FailingMidStreamLLM())
+    payload = {"messages": [{"role": "user", "content": "hi"}], "stream": True}
+
+    with TestClient(app) as client:
+        response = client.post("/chat", json=payload, headers=auth_headers)
+
+    assert "llm_unavailable" in response.text
+    usage = sqlite_db.get_user_usage(owner_id)
+    assert usage["requests"] == 1
+    assert usage["prompt_tokens"] > 0 and usage["completion_tokens"] >= 9
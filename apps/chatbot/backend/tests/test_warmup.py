@@ -0,0 +1,92 @@
+import asyncio
+from dataclasses import replace
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.db import sqlite as sqlite_db
+from app.main import app
+from app.services import llm_client as llm_module
+from app.services import warmup
+from app.services.llm_client import LLMClient
+from app.services.warmup import WarmupState, run_warmup
+from shared.schemas.chat import ChatMessage
+
+
+class _FlakyLLM:
+    def __init__(self, failures: int) -> None:
+        self.failures = failures
+        self.calls = 0
+
+    async def preload(self) -> None:
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RuntimeError("model still loading")
+
+
+def test_ready_fails_until_warmup_completes(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(sqlite_db, "_db_path", lambda: tmp_path / "memory.db")
+    state = WarmupState()
+    monkeypatch.setattr(app.state, "warmup", state)
+    client = TestClient(app)
+
+    warming = client.get("/ready")
+    assert warming.status_code == 503
+    assert warming.json()["status"] == "warming"
+    assert client.get("/health").status_code == 200
+
+    llm = _FlakyLLM(failures=2)
+    asyncio.run(run_warmup(state, llm))
+
+    ready = client.get("/ready")
+    assert ready.status_code == 200
+    assert llm.calls == 3
+    assert ready.json()["steps"]["llm_preload"]["ok"] is True
+    assert (tmp_path / "memory.db").exists()
+
+
+def test_unreachable_llm_does_not_block_readiness_past_the_deadline(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(sqlite_db, "_db_path", lambda: tmp_path / "memory.db")
+    monkeypatch.setattr(warmup, "settings", replace(warmup.settings, warmup_timeout_seconds=0.05))
+    state = WarmupState()
+
+    asyncio.run(run_warmup(state, _FlakyLLM(failures=1000)))
+
+    assert state.ready is True
+    assert state.steps["llm_preload"]["ok"] is False
+
+
+def test_preload_loads_model_and_later_calls_reuse_the_pool(monkeypatch) -> None:
+    backend = FastAPI()
+    seen = []
+
+    @backend.post("/api/chat")
+    async def ollama_chat(request: Request):
+        body = await request.json()
+        seen.append(body)
+        return {"message": {"content": "hi"}, "done": True}
+
+    transport = httpx.ASGITransport(app=backend)
+    real_client = httpx.AsyncClient
+    created = []
+
+    def pooled(**kwargs):
+        created.append(kwargs)
+        return real_client(transport=transport, **kwargs)
+
+    monkeypatch.setattr(llm_module.httpx, "AsyncClient", pooled)
+    client = LLMClient()
+    client._api_mode = "ollama"
+    client._base_url = "http://mock"
+
+    async def run() -> None:
+        await client.preload()
+        await client.chat_completions([ChatMessage(role="user", content="hi")], max_tokens=8)
+        await client.aclose()
+
+    asyncio.run(run())
+
+    assert seen[0]["messages"] == [] and seen[0]["keep_alive"] == llm_module.settings.llm_keep_alive
+    assert seen[1]["keep_alive"] == llm_module.settings.llm_keep_alive
+    assert len(created) == 1
@@ -1,5 +1,11 @@
 import type { ChatRequest, ChatResponse } from "@shared/schemas/chat";
-import type { FeedbackRequest, FeedbackResponse } from "@shared/schemas/feedback";
+import type {
+  FeedbackBatchRequest,
+  FeedbackBatchResponse,
+  FeedbackRequest,
+  FeedbackResponse
+} from "@shared/schemas/feedback";
+import type { Preferences } from "@shared/schemas/preferences";
 
 const API_BASE_URL =
   process.env.NEXT_PUBLIC_API_BASE_URL || "http://localhost:8000";
@@ -25,12 +31,17 @@ export function loadAuthToken() {
   return authToken;
 }
 
-export async function sendChat(request: ChatRequest): Promise<ChatResponse> {
+export async function sendChat(
+  request: ChatRequest,
+  idempotencyKey?: string
+): Promise<ChatResponse> {
+  // Reuse the same key when retrying a turn so the backend replays instead of regenerating.
   const response = await fetch(`${API_BASE_URL}/chat`, {
     method: "POST",
     headers: {
       "Content-Type": "application/json",
-      ...(authToken ? { Authorization: `Bearer ${authToken}` } : {})
+      ...(authToken ? { Authorization: `Bearer ${authToken}` } : {}),
+      ...(idempotencyKey ? { "Idempotency-Key": idempotencyKey } : {})
     },
     body: JSON.stringify(request)
   });
@@ -66,6 +77,25 @@ export async function sendFeedback(request: FeedbackRequest): Promise<FeedbackRe
   return (await response.json()) as FeedbackResponse;
 }
 
+export async function sendFeedbackBatch(
+  request: FeedbackBatchRequest
+): Promise<FeedbackBatchResponse> {
+  const response = await fetch(`${API_BASE_URL}/feedback/batch`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+      ...(authToken ? { Authorization: `Bearer ${authToken}` } : {})
+    },
+    body: JSON.stringify(request)
+  });
+
+  if (!response.ok) {
+    return { status: "error", accepted: 0, rejected_message_ids: [], buffered: false };
+  }
+
+  return (await response.json()) as FeedbackBatchResponse;
+}
+
 export type AuthPayload = {
   username: string;
   password: string;
@@ -107,3 +137,34 @@ export async function loginUser(payload: AuthPayload): Promise<AuthResponse | nu
 
   return (await response.json()) as AuthResponse;
 }
+
+export async function getPreferences(): Promise<Preferences | null> {
+  const response = await fetch(`${API_BASE_URL}/preferences`, {
+    headers: {
+      ...(authToken ? { Authorization: `Bearer ${authToken}` } : {})
+    }
+  });
+
+  if (!response.ok) {
+    return null;
+  }
+
+  return (await response.json()) as Preferences;
+}
+
+export async function updatePreferences(preferences: Preferences): Promise<Preferences | null> {
+  const response = await fetch(`${API_BASE_URL}/preferences`, {
+    method: "PUT",
+    headers: {
+      "Content-Type": "application/json",
+      ...(authToken ? { Authorization: `Bearer ${authToken}` } : {})
+    },
+    body: JSON.stringify(preferences)
+  });
+
+  if (!response.ok) {
+    return null;
+  }
+
+  return (await response.json()) as Preferences;
+}
@@ -26,6 +26,67 @@ class Settings:
     jwt_secret: str
     jwt_algorithm: str
     jwt_expires_minutes: int
+    trace_sample_rate: float
+    trace_exporter: str
+    trace_jsonl_path: str
+    trace_otlp_endpoint: str
+    feedback_buffered_writes: bool
+    feedback_flush_interval_ms: int
+    feedback_buffer_max_rows: int
+    history_page_size_default: int
+    history_page_size_max: int
+    history_hydrate_messages: int
+    archive_idle_days: int
+    archive_interval_seconds: int
+    archive_batch_size: int
+    archive_max_batches_per_run: int
+    archive_codec: str
+    archive_dir: str
+    archive_segment_max_mb: int
+    archive_vacuum_pages: int
+    shared_state_backend: str
+    shared_state_path: str
+    shared_state_url: str
+    llm_global_concurrency_limit: int
+    user_daily_token_quota: int
+    idempotency_ttl_seconds: int
+    idempotency_max_entries: int
+    llm_adaptive_concurrency: bool
+    llm_concurrency_min: int
+    llm_concurrency_max: int
+    llm_target_ttft_ms: float
+    llm_target_tokens_per_sec: float
+    llm_connect_timeout_seconds: float
+    llm_connect_retries: int
+    llm_retry_backoff_ms: int
+    llm_breaker_failure_threshold: int
+    llm_breaker_reset_seconds: float
+    llm_hedge_enabled: bool
+    llm_hedge_min_samples: int
+    relationship_cache_max_entries: int
+    relationship_flush_interval_ms: int
+    llm_keep_alive: str
+    warmup_enabled: bool
+    warmup_timeout_seconds: float
+    verbosity_short_max_tokens: int
+    verbosity_long_max_tokens: int
+    preferences_cache_max_entries: int
+    preferences_cache_ttl_seconds: float
+    stream_resume_grace_seconds: float
+    stream_resume_buffer_frames: int
+    stream_resume_max_generations: int
+    batch_llm_share: float
+    batch_max_concurrency: int
+    batch_max_conversations: int
+    db_shards: int
+    admin_token: str
+    profiler_max_seconds: float
+    persona_dir: str
+    default_persona_id: str
+    persona_reload_interval_seconds: float
+    stream_buffer_max_frames: int
+    stream_slow_client_policy: str
+    shared_state_pool_size: int
 
 
 def get_settings() -> Settings:
@@ -50,4 +111,65 @@ def get_settings() -> Settings:
         jwt_secret=os.getenv("JWT_SECRET", "dev-secret"),
         jwt_algorithm=os.getenv("JWT_ALGORITHM", "HS256"),
         jwt_expires_minutes=int(os.getenv("JWT_EXPIRES_MINUTES", "1440")),
+        trace_sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "0.0")),
+        trace_exporter=os.getenv("TRACE_EXPORTER", "jsonl"),
+        trace_jsonl_path=os.getenv("TRACE_JSONL_PATH", ""),
+        trace_otlp_endpoint=os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces"),
+        feedback_buffered_writes=os.getenv("FEEDBACK_BUFFERED_WRITES", "false").lower() == "true",
+        feedback_flush_interval_ms=int(os.getenv("FEEDBACK_FLUSH_INTERVAL_MS", "500")),
+        feedback_buffer_max_rows=int(os.getenv("FEEDBACK_BUFFER_MAX_ROWS", "1000")),
+        history_page_size_default=int(os.getenv("HISTORY_PAGE_SIZE_DEFAULT", "50")),
+        history_page_size_max=int(os.getenv("HISTORY_PAGE_SIZE_MAX", "200")),
+        history_hydrate_messages=int(os.getenv("HISTORY_HYDRATE_MESSAGES", "20")),
+        archive_idle_days=int(os.getenv("ARCHIVE_IDLE_DAYS", "0")),
+        archive_interval_seconds=int(os.getenv("ARCHIVE_INTERVAL_SECONDS", "3600")),
+        archive_batch_size=int(os.getenv("ARCHIVE_BATCH_SIZE", "200")),
+        archive_max_batches_per_run=int(os.getenv("ARCHIVE_MAX_BATCHES_PER_RUN", "50")),
+        archive_codec=os.getenv("ARCHIVE_CODEC", "gzip").lower(),
+        archive_dir=os.getenv("ARCHIVE_DIR", ""),
+        archive_segment_max_mb=int(os.getenv("ARCHIVE_SEGMENT_MAX_MB", "64")),
+        archive_vacuum_pages=int(os.getenv("ARCHIVE_VACUUM_PAGES", "2000")),
+        shared_state_backend=os.getenv("SHARED_STATE_BACKEND", "memory"),
+        shared_state_path=os.getenv("SHARED_STATE_PATH", ""),
+        shared_state_url=os.getenv("SHARED_STATE_URL", "redis://localhost:6379/0"),
+        llm_global_concurrency_limit=int(os.getenv("LLM_GLOBAL_CONCURRENCY_LIMIT", "0")),
+        user_daily_token_quota=int(os.getenv("USER_DAILY_TOKEN_QUOTA", "0")),
+        idempotency_ttl_seconds=int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "600")),
+        idempotency_max_entries=int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "2000")),
+        llm_adaptive_concurrency=os.getenv("LLM_ADAPTIVE_CONCURRENCY", "false").lower() == "true",
+        llm_concurrency_min=int(os.getenv("LLM_CONCURRENCY_MIN", "1")),
+        llm_concurrency_max=int(os.getenv("LLM_CONCURRENCY_MAX", "64")),
+        llm_target_ttft_ms=float(os.getenv("LLM_TARGET_TTFT_MS", "1500")),
+        llm_target_tokens_per_sec=float(os.getenv("LLM_TARGET_TOKENS_PER_SEC", "0")),
+        llm_connect_timeout_seconds=float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5")),
+        llm_connect_retries=int(os.getenv("LLM_CONNECT_RETRIES", "2")),
+        llm_retry_backoff_ms=int(os.getenv("LLM_RETRY_BACKOFF_MS", "200")),
+        llm_breaker_failure_threshold=int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5")),
+        llm_breaker_reset_seconds=float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30")),
+        llm_hedge_enabled=os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true",
+        llm_hedge_min_samples=int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20")),
+        relationship_cache_max_entries=int(os.getenv("RELATIONSHIP_CACHE_MAX_ENTRIES", "10000")),
+        relationship_flush_interval_ms=int(os.getenv("RELATIONSHIP_FLUSH_INTERVAL_MS", "2000")),
+        llm_keep_alive=os.getenv("LLM_KEEP_ALIVE", "30m"),
+        warmup_enabled=os.getenv("WARMUP_ENABLED", "true").lower() == "true",
+        warmup_timeout_seconds=float(os.getenv("WARMUP_TIMEOUT_SECONDS", "120")),
+        verbosity_short_max_tokens=int(os.getenv("VERBOSITY_SHORT_MAX_TOKENS", "160")),
+        verbosity_long_max_tokens=int(os.getenv("VERBOSITY_LONG_MAX_TOKENS", "1024")),
+        preferences_cache_max_entries=int(os.getenv("PREFERENCES_CACHE_MAX_ENTRIES", "10000")),
+        preferences_cache_ttl_seconds=float(os.getenv("PREFERENCES_CACHE_TTL_SECONDS", "60")),
+        stream_resume_grace_seconds=float(os.getenv("STREAM_RESUME_GRACE_SECONDS", "60")),
+        stream_resume_buffer_frames=int(os.getenv("STREAM_RESUME_BUFFER_FRAMES", "4096")),
+        stream_resume_max_generations=int(os.getenv("STREAM_RESUME_MAX_GENERATIONS", "1000")),
+        batch_llm_share=float(os.getenv("BATCH_LLM_SHARE", "0.5")),
+        batch_max_concurrency=int(os.getenv("BATCH_MAX_CONCURRENCY", "8")),
+        batch_max_conversations=int(os.getenv("BATCH_MAX_CONVERSATIONS", "5000")),
+        db_shards=int(os.getenv("DB_SHARDS", "1")),
+        admin_token=os.getenv("ADMIN_TOKEN", ""),
+        profiler_max_seconds=float(os.getenv("PROFILER_MAX_SECONDS", "60")),
+        persona_dir=os.getenv("PERSONA_DIR", ""),
+        default_persona_id=os.getenv("DEFAULT_PERSONA_ID", "default"),
+        persona_reload_interval_seconds=float(os.getenv("PERSONA_RELOAD_INTERVAL_SECONDS", "5")),
+        stream_buffer_max_frames=int(os.getenv("STREAM_BUFFER_MAX_FRAMES", "256")),
+        stream_slow_client_policy=os.getenv("STREAM_SLOW_CLIENT_POLICY", "coalesce"),
+        shared_state_pool_size=int(os.getenv("SHARED_STATE_POOL_SIZE", "4")),
     )
@@ -10,6 +10,7 @@ class ChatMessage(BaseModel):
 class ChatRequest(BaseModel):
     user_id: str | None = None
     conversation_id: str | None = None
+    persona_id: str | None = None
     messages: list[ChatMessage]
     stream: bool = False
 
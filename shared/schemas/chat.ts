@@ -9,6 +9,7 @@ export type ChatMessage = {
 export interface ChatRequest {
   user_id?: string;
   conversation_id?: string;
+  persona_id?: string;
   messages: ChatMessage[];
   stream?: boolean;
 }
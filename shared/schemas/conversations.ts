@@ -0,0 +1,26 @@
+export type ConversationSummary = {
+  id: string;
+  created_at: string;
+  message_count: number;
+  last_message_id?: number | null;
+};
+
+export type ConversationPage = {
+  items: ConversationSummary[];
+  next_cursor?: string | null;
+};
+
+export type HistoryMessage = {
+  id: number;
+  role: "user" | "assistant" | "system";
+  created_at: string;
+  content?: string;
+  model_name?: string;
+  safety_state?: string;
+};
+
+export type MessagePage = {
+  conversation_id: string;
+  items: HistoryMessage[];
+  next_cursor?: number;
+};
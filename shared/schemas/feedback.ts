@@ -10,3 +10,14 @@ export type FeedbackRequest = {
 export type FeedbackResponse = {
   status: "ok" | "error";
 };
+
+export type FeedbackBatchRequest = {
+  items: FeedbackRequest[];
+};
+
+export type FeedbackBatchResponse = {
+  status: "ok" | "error";
+  accepted: number;
+  rejected_message_ids: number[];
+  buffered: boolean;
+};
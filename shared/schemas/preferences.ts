@@ -0,0 +1,7 @@
+export type Verbosity = "short" | "normal" | "long";
+
+export type Preferences = {
+  verbosity?: Verbosity | null;
+  emoji_level?: "none" | "low" | "medium" | "high" | null;
+  nsfw_intensity?: "low" | "medium" | "high" | null;
+};